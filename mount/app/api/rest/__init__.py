@@ -1,10 +1,16 @@
-import time
+import asyncio
 
 from app.common import settings
+from app.common.context import AppContext
+from app.models.clan_stats import LeaderboardSort
+from app.repositories import clans_cache
+from app.repositories.clan_leaderboards import ClanLeaderboardsRepo
+from app.services import amqp
 from app.services import database
 from app.services import redis
+from app.usecases import clan_events
+from app.usecases import clan_stats
 from fastapi import FastAPI
-from fastapi import Request
 from shared_modules import logger
 
 
@@ -13,14 +19,17 @@ def init_db(api: FastAPI) -> None:
     async def startup_db() -> None:
         logger.info("Starting up database pool")
         service_database = database.ServiceDatabase(
-            read_dsn=database.dsn(
-                driver=settings.WRITE_DB_DRIVER,
-                user=settings.READ_DB_USER,
-                password=settings.READ_DB_PASS,
-                host=settings.READ_DB_HOST,
-                port=settings.READ_DB_PORT,
-                database=settings.READ_DB_NAME,
-            ),
+            read_dsns=[
+                database.dsn(
+                    driver=settings.READ_DB_DRIVER,
+                    user=settings.READ_DB_USER,
+                    password=settings.READ_DB_PASS,
+                    host=host,
+                    port=port,
+                    database=settings.READ_DB_NAME,
+                )
+                for host, port in settings.READ_DB_HOSTS
+            ],
             write_dsn=database.dsn(
                 driver=settings.WRITE_DB_DRIVER,
                 user=settings.WRITE_DB_USER,
@@ -32,6 +41,13 @@ def init_db(api: FastAPI) -> None:
             min_pool_size=settings.MIN_DB_POOL_SIZE,
             max_pool_size=settings.MAX_DB_POOL_SIZE,
             ssl=settings.DB_USE_SSL,
+            read_your_writes_window=settings.DB_READ_YOUR_WRITES_WINDOW,
+            read_timeout=settings.DB_READ_TIMEOUT,
+            replica_max_failures=settings.DB_REPLICA_MAX_FAILURES,
+            replica_eject_seconds=settings.DB_REPLICA_EJECT_SECONDS,
+            replica_health_check_interval=settings.DB_REPLICA_HEALTH_CHECK_INTERVAL,
+            slow_query_threshold=settings.DB_SLOW_QUERY_THRESHOLD,
+            stream_pool_size=settings.DB_STREAM_POOL_SIZE,
         )
         await service_database.connect()
         api.state.db = service_database
@@ -55,43 +71,94 @@ def init_redis(api: FastAPI) -> None:
         )
         await service_redis.initialize()
         api.state.redis = service_redis
+
+        api.state.invalidations_listener = asyncio.create_task(
+            service_redis.listen_for_invalidations(
+                on_invalidate=clans_cache.on_invalidation,
+                on_subscribe=clans_cache.clear_local_cache,
+            ))
         logger.info("Redis pool started up")
 
     @api.on_event("shutdown")
     async def shutdown_redis() -> None:
         logger.info("Shutting down the redis")
+        api.state.invalidations_listener.cancel()
+        try:
+            await api.state.invalidations_listener
+        except asyncio.CancelledError:
+            pass
+        del api.state.invalidations_listener
+
         await api.state.redis.close()
         del api.state.redis
         logger.info("Redis pool shut down")
 
 
-def init_middlewares(api: FastAPI) -> None:
-    # NOTE: these run bottom to top
+def init_leaderboards(api: FastAPI) -> None:
+    @api.on_event("startup")
+    async def startup_leaderboards() -> None:
+        ctx = AppContext(db=api.state.db, redis=api.state.redis)
+        if await ClanLeaderboardsRepo(ctx).count(LeaderboardSort.TOTAL_PP):
+            return
+
+        logger.info("Rebuilding clan leaderboards")
+        count = await clan_stats.rebuild_leaderboards(ctx)
+        logger.info(f"Rebuilt clan leaderboards ({count} clans)")
 
-    @api.middleware("http")
-    async def add_db_to_request(request: Request, call_next):
-        request.state.db = request.app.state.db
-        response = await call_next(request)
-        return response
 
-    @api.middleware("http")
-    async def add_redis_to_request(request: Request, call_next):
-        request.state.redis = request.app.state.redis
-        response = await call_next(request)
-        return response
+def init_events(api: FastAPI) -> None:
+    @api.on_event("startup")
+    async def startup_events() -> None:
+        logger.info("Starting up clan events publisher")
+        broker = amqp.AMQPBroker(
+            url=amqp.url(
+                user=settings.AMQP_USER,
+                password=settings.AMQP_PASS,
+                host=settings.AMQP_HOST,
+                port=settings.AMQP_PORT,
+            ),
+            exchange=settings.AMQP_EXCHANGE,
+        )
+        await broker.connect()
+        api.state.broker = broker
+
+        ctx = AppContext(db=api.state.db, redis=api.state.redis)
+        api.state.events_publisher = asyncio.create_task(
+            clan_events.run_publisher(ctx, broker,
+                                      batch_size=settings.OUTBOX_BATCH_SIZE,
+                                      poll_interval=settings.OUTBOX_POLL_INTERVAL,
+                                      max_backoff=settings.OUTBOX_MAX_BACKOFF,
+                                      publish_timeout=settings.OUTBOX_PUBLISH_TIMEOUT))
+        logger.info("Clan events publisher started up")
+
+    # NOTE: registered first, so the publisher stops before the pools it uses
+    async def shutdown_events() -> None:
+        logger.info("Shutting down clan events publisher")
+        api.state.events_publisher.cancel()
+        try:
+            await api.state.events_publisher
+        except asyncio.CancelledError:
+            pass
+        del api.state.events_publisher
+
+        await api.state.broker.disconnect()
+        del api.state.broker
+        logger.info("Clan events publisher shut down")
+
+    api.router.on_shutdown.insert(0, shutdown_events)
+
+
+def init_middlewares(api: FastAPI) -> None:
+    from .middlewares import ProcessTimeMiddleware
 
-    @api.middleware("http")
-    async def add_process_time_header(request: Request, call_next):
-        start_time = time.perf_counter_ns()
-        response = await call_next(request)
-        process_time = (time.perf_counter_ns() - start_time) / 1e6
-        response.headers["X-Process-Time"] = str(process_time)  # ms
-        return response
+    api.add_middleware(ProcessTimeMiddleware)
 
 
 def init_routes(api: FastAPI) -> None:
+    from .metrics import router as metrics_router
     from .v1 import router as v1_router
 
+    api.include_router(metrics_router)
     api.include_router(v1_router)
 
 
@@ -100,6 +167,8 @@ def init_api():
 
     init_db(api)
     init_redis(api)
+    init_leaderboards(api)
+    init_events(api)
     init_middlewares(api)
     init_routes(api)
 
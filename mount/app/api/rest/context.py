@@ -10,8 +10,8 @@ class RequestContext(Context):
 
     @property
     def db(self) -> database.ServiceDatabase:
-        return self.request.state.db
+        return self.request.app.state.db
 
     @property
     def redis(self) -> redis.ServiceRedis:
-        return self.request.state.redis
+        return self.request.app.state.redis
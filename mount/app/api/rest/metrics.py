@@ -0,0 +1,38 @@
+from fastapi import APIRouter
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client import generate_latest
+from prometheus_client import REGISTRY
+from prometheus_client.core import CounterMetricFamily
+from prometheus_client.core import GaugeMetricFamily
+
+from app.repositories import clans_cache
+
+router = APIRouter()
+
+
+class LocalCacheCollector:
+    """Reports the counters kept by the per-process clans cache."""
+
+    def collect(self):
+        cache = clans_cache.local_cache
+        yield GaugeMetricFamily("clans_local_cache_entries",
+                                "Entries in the per-process clans cache",
+                                value=len(cache))
+        yield CounterMetricFamily("clans_local_cache_hits",
+                                  "Per-process clans cache hits",
+                                  value=cache.hits)
+        yield CounterMetricFamily("clans_local_cache_misses",
+                                  "Per-process clans cache misses",
+                                  value=cache.misses)
+        yield CounterMetricFamily("clans_local_cache_evictions",
+                                  "Per-process clans cache LRU evictions",
+                                  value=cache.evictions)
+
+
+REGISTRY.register(LocalCacheCollector())
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
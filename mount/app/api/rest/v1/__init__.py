@@ -1,3 +1,14 @@
 from fastapi import APIRouter
 
+from . import admin
+from . import clan_members
+from . import clan_stats
+from . import clans
+
 router = APIRouter()
+
+# NOTE: clan_stats' /clans/leaderboard must match before /clans/{clan_id}
+router.include_router(clan_stats.router)
+router.include_router(clans.router)
+router.include_router(clan_members.router)
+router.include_router(admin.router)
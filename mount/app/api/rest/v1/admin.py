@@ -0,0 +1,136 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Request
+
+from app.api.rest.context import RequestContext
+from app.common import exports
+from app.common import imports
+from app.common import responses
+from app.common.errors import ServiceError
+from app.models.clans import ClanRecord
+from app.models.clans import CreateClan
+from app.models.clans import DisbandClans
+from app.models.clans import DisbandError
+from app.models.clans import DisbandResult
+from app.models.clans import ExportFormat
+from app.models.clans import ImportResult
+from app.models.clans import ImportRowError
+from app.models.query_stats import QueryStats
+from app.usecases import clans
+from app.usecases import query_stats
+
+router = APIRouter(tags=["Admin"])
+
+# rows written per transaction (& per multi-row statement) by bulk operations
+BULK_CHUNK_SIZE = 500
+
+
+@router.get("/admin/query-stats", response_model=list[QueryStats])
+async def get_query_stats(ctx: RequestContext = Depends()):
+    data = await query_stats.fetch_all(ctx)
+    resp = [QueryStats.from_mapping(aggregate) for aggregate in data]
+    return responses.success(resp)
+
+
+@router.delete("/admin/query-stats")
+async def reset_query_stats(ctx: RequestContext = Depends()):
+    await query_stats.reset(ctx)
+    return responses.success(None)
+
+
+@router.post("/admin/clans/import", response_model=ImportResult)
+async def import_clans(request: Request, ctx: RequestContext = Depends()):
+    """Create clans from an ndjson body, or a csv one with a header row
+    (Content-Type: text/csv); each line or record is a CreateClan.
+
+    The body is read as it's imported, BULK_CHUNK_SIZE rows at a time, each
+    chunk in its own transaction; rows which fail are reported by line.
+    """
+    if request.headers.get("content-type", "").startswith("text/csv"):
+        records = imports.csv_records(request.stream())
+    else:
+        records = imports.ndjson_records(request.stream())
+
+    created = 0
+    errors: list[ImportRowError] = []
+    chunk: list[tuple[int, CreateClan]] = []
+
+    async def import_chunk() -> None:
+        nonlocal created
+        data = await clans.bulk_create(ctx, [args.dict() for _, args in chunk])
+        for (line, _), result in zip(chunk, data):
+            if isinstance(result, ServiceError):
+                errors.append(ImportRowError(line=line, error=result,
+                                             message=None))
+            else:
+                created += 1
+        chunk.clear()
+
+    async for line, record in records:
+        try:
+            if isinstance(record, ValueError):
+                raise record
+            chunk.append((line, CreateClan.parse_obj(record)))
+        except ValueError as exc:  # incl. pydantic's ValidationError
+            errors.append(ImportRowError(line=line,
+                                         error=ServiceError.CLANS_INVALID,
+                                         message=str(exc)))
+            continue
+
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            await import_chunk()
+
+    if chunk:
+        await import_chunk()
+
+    resp = ImportResult(created=created, errors=errors)
+    return responses.success(resp)
+
+
+@router.post("/admin/clans/disband", response_model=DisbandResult)
+async def disband_clans(args: DisbandClans, ctx: RequestContext = Depends()):
+    disbanded = 0
+    errors: list[DisbandError] = []
+    for start in range(0, len(args.clan_ids), BULK_CHUNK_SIZE):
+        clan_ids = args.clan_ids[start:start + BULK_CHUNK_SIZE]
+        data = await clans.bulk_disband(ctx, clan_ids,
+                                        deactivate=args.deactivate)
+        for clan_id, result in zip(clan_ids, data):
+            if isinstance(result, ServiceError):
+                errors.append(DisbandError(clan_id=clan_id, error=result))
+            else:
+                disbanded += 1
+
+    resp = DisbandResult(disbanded=disbanded, errors=errors)
+    return responses.success(resp)
+
+
+@router.get("/admin/clans/export")
+async def export_clans(format: ExportFormat = ExportFormat.NDJSON,
+                       since: datetime | None = None,
+                       compress: bool = True,
+                       ctx: RequestContext = Depends()):
+    """Stream every clan, of any status, off a read replica; or with since,
+    only those updated after it. Gzipped unless compress is false.
+
+    Rows are encoded & sent as an unbuffered cursor reads them, so neither
+    side holds the whole table in memory.
+    """
+    rows = clans.iterate_all(ctx, status=None, since=since)
+    fields = tuple(ClanRecord.__fields__)
+    if format == ExportFormat.CSV:
+        lines = exports.csv_lines(rows, fields)
+        media_type = "text/csv"
+    else:
+        lines = exports.ndjson_lines(rows, fields)
+        media_type = "application/x-ndjson"
+
+    content = exports.chunked(lines)
+    filename = f"clans.{format.value}"
+    if compress:
+        content = exports.gzipped(content)
+        media_type = "application/gzip"
+        filename += ".gz"
+
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    return responses.stream(content, headers=headers, media_type=media_type)
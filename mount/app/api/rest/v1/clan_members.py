@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, Query
+
+from app.api.rest.context import RequestContext
+from app.common import responses
+from app.common.errors import ServiceError
+from app.models.clan_members import ClanMember, JoinClan, KickClanMember
+from app.models.clans import Clan
+from app.usecases import clan_members
+
+router = APIRouter(tags=["Clan Members"])
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 200
+
+
+@router.post("/clans/{clan_id}/members", response_model=ClanMember)
+async def join_clan(clan_id: int, args: JoinClan, ctx: RequestContext = Depends()):
+    data = await clan_members.join(ctx, clan_id, args.user_id)
+    if isinstance(data, ServiceError):
+        return responses.failure(data, "Failed to join clan")
+
+    resp = ClanMember.project(data)
+    return responses.success(resp)
+
+
+# NOTE: must be registered before /clans/{clan_id}/members
+@router.get("/clans/members/batch", response_model=list[ClanMember | None])
+async def get_clan_members_batch(user_ids: list[int] = Query(..., max_items=MAX_BATCH_SIZE),
+                                 ctx: RequestContext = Depends()):
+    data = await clan_members.fetch_many(ctx, user_ids)
+    resp = [ClanMember.project(member) if member is not None else None
+            for member in data]
+    return responses.success(resp)
+
+
+@router.get("/clans/{clan_id}/members", response_model=list[ClanMember])
+async def get_clan_members(clan_id: int,
+                           after: int | None = Query(None, ge=0),
+                           limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                           ctx: RequestContext = Depends()):
+    data = await clan_members.fetch_all(ctx, clan_id, after=after, limit=limit)
+    if isinstance(data, ServiceError):
+        return responses.failure(data, "Failed to get clan members")
+
+    resp = [ClanMember.project(member) for member in data]
+    return responses.success(resp)
+
+
+@router.delete("/clans/{clan_id}/members/{user_id}", response_model=ClanMember)
+async def leave_clan(clan_id: int, user_id: int, ctx: RequestContext = Depends()):
+    data = await clan_members.leave(ctx, clan_id, user_id)
+    if isinstance(data, ServiceError):
+        return responses.failure(data, "Failed to leave clan")
+
+    resp = ClanMember.project(data)
+    return responses.success(resp)
+
+
+@router.post("/clans/{clan_id}/members/{user_id}/kick", response_model=ClanMember)
+async def kick_clan_member(clan_id: int, user_id: int, args: KickClanMember,
+                           ctx: RequestContext = Depends()):
+    data = await clan_members.kick(ctx, clan_id, user_id, args.kicked_by)
+    if isinstance(data, ServiceError):
+        return responses.failure(data, "Failed to kick clan member")
+
+    resp = ClanMember.project(data)
+    return responses.success(resp)
+
+
+@router.get("/users/{user_id}/clan", response_model=Clan)
+async def get_user_clan(user_id: int, ctx: RequestContext = Depends()):
+    data = await clan_members.fetch_user_clan(ctx, user_id)
+    if isinstance(data, ServiceError):
+        return responses.failure(data, "Failed to get user's clan")
+
+    resp = Clan.project(data)
+    return responses.success(resp)
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, Query
+
+from app.api.rest.context import RequestContext
+from app.common import responses
+from app.common.errors import ServiceError
+from app.models.clan_stats import ClanStats, LeaderboardEntry, LeaderboardSort, UpdateMemberStats
+from app.usecases import clan_stats
+
+router = APIRouter(tags=["Clan Stats"])
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+# NOTE: must be registered before /clans/{clan_id}
+@router.get("/clans/leaderboard", response_model=list[LeaderboardEntry])
+async def get_clan_leaderboard(sort: LeaderboardSort = LeaderboardSort.TOTAL_PP,
+                               page: int = Query(1, ge=1),
+                               limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                               ctx: RequestContext = Depends()):
+    data = await clan_stats.fetch_leaderboard(ctx, sort,
+                                              offset=(page - 1) * limit,
+                                              limit=limit)
+    resp = [LeaderboardEntry.project(entry) for entry in data]
+    return responses.success(resp)
+
+
+@router.get("/clans/{clan_id}/stats", response_model=ClanStats)
+async def get_clan_stats(clan_id: int, ctx: RequestContext = Depends()):
+    data = await clan_stats.fetch_one(ctx, clan_id)
+    if isinstance(data, ServiceError):
+        return responses.failure(data, "Failed to get clan stats")
+
+    resp = ClanStats.project(data)
+    return responses.success(resp)
+
+
+@router.put("/users/{user_id}/clan-stats", response_model=ClanStats)
+async def update_member_stats(user_id: int, args: UpdateMemberStats,
+                              ctx: RequestContext = Depends()):
+    data = await clan_stats.update_member_stats(ctx, user_id, args.pp,
+                                                args.ranked_score)
+    if isinstance(data, ServiceError):
+        return responses.failure(data, "Failed to update clan stats")
+
+    resp = ClanStats.project(data)
+    return responses.success(resp)
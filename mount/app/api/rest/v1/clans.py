@@ -1,13 +1,30 @@
-from fastapi import APIRouter, Depends
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, AsyncIterator, Mapping
+
+import orjson
+from fastapi import APIRouter, Depends, Query, Request
 
 from app.api.rest.context import RequestContext
 from app.common import responses
+from app.common import versions
 from app.common.errors import ServiceError
-from app.models.clans import Clan, CreateClan, UpdateClan
+from app.models import Status
+from app.models.clans import Clan, ClanChanges, ClanRecord, CreateClan, JoinMethod, UpdateClan
 from app.usecases import clans
 
 router = APIRouter(tags=["Clans"])
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 200
+
+DEFAULT_SEARCH_PAGE_SIZE = 25
+MAX_SEARCH_PAGE_SIZE = 100
+# deep pages of a ranked search get slower; nobody reads them anyway
+MAX_SEARCH_PAGE = 20
+
 
 # https://osuakatsuki.atlassian.net/browse/V2-20
 @router.post("/clans", response_model=Clan)
@@ -21,27 +38,136 @@ async def create_clan(args: CreateClan, ctx: RequestContext = Depends()):
     if isinstance(data, ServiceError):
         return responses.failure(data, "Failed to create clan")
 
-    resp = Clan.from_mapping(data)
+    resp = Clan.project(data)
+    return responses.success(resp)
+
+
+# NOTE: must be registered before /clans/{clan_id}
+@router.get("/clans/batch", response_model=list[Clan | None])
+async def get_clans_batch(ids: list[int] = Query(..., max_items=MAX_BATCH_SIZE),
+                          ctx: RequestContext = Depends()):
+    data = await clans.fetch_many(ctx, ids)
+    resp = [Clan.project(clan) if clan is not None else None
+            for clan in data]
+    return responses.success(resp)
+
+
+# NOTE: must be registered before /clans/{clan_id}
+@router.get("/clans/search", response_model=list[Clan])
+async def search_clans(q: str = Query(..., min_length=1, max_length=32),
+                       page: int = Query(1, ge=1, le=MAX_SEARCH_PAGE),
+                       limit: int = Query(DEFAULT_SEARCH_PAGE_SIZE, ge=1,
+                                          le=MAX_SEARCH_PAGE_SIZE),
+                       ctx: RequestContext = Depends()):
+    data = await clans.search(ctx, q.strip(),
+                              offset=(page - 1) * limit,
+                              limit=limit)
+    resp = [Clan.project(clan) for clan in data]
+    return responses.success(resp)
+
+
+# NOTE: must be registered before /clans/{clan_id}
+@router.get("/clans/changes", response_model=ClanChanges)
+async def get_clan_changes(since: datetime | None = None,
+                           cursor: str | None = None,
+                           limit: int = Query(DEFAULT_PAGE_SIZE, ge=1,
+                                              le=MAX_PAGE_SIZE),
+                           ctx: RequestContext = Depends()):
+    """Clans changed after since, oldest change first, incl. disbanded ones;
+    poll again with the returned cursor (which supersedes since) for the
+    changes after those."""
+    after_clan_id = None
+    if cursor is not None:
+        position = _decode_cursor(cursor)
+        if position is None:
+            return responses.failure(ServiceError.CLANS_INVALID_CURSOR,
+                                     "Failed to get clan changes")
+        since, after_clan_id = position
+
+    data = await clans.fetch_changes(ctx, since, after_clan_id, limit)
+
+    if data:
+        cursor = _encode_cursor(data[-1]["updated_at"], data[-1]["clan_id"])
+    elif since is not None:
+        cursor = _encode_cursor(since, after_clan_id)
+
+    resp = {
+        "clans": [ClanRecord.project(clan) for clan in data],
+        "cursor": cursor,
+    }
     return responses.success(resp)
 
 
+def _encode_cursor(updated_at: datetime, clan_id: int | None) -> str:
+    raw = f"{updated_at.isoformat()},{clan_id if clan_id is not None else ''}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int | None] | None:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        updated_at, _, clan_id = raw.partition(",")
+        return (datetime.fromisoformat(updated_at),
+                int(clan_id) if clan_id else None)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
 # https://osuakatsuki.atlassian.net/browse/V2-21
 @router.get("/clans/{clan_id}", response_model=Clan)
-async def get_clan(clan_id: int, ctx: RequestContext = Depends()):
+async def get_clan(clan_id: int, request: Request,
+                   ctx: RequestContext = Depends()):
+    # a client polling an unchanged clan needn't have it fetched at all
+    version = await clans.fetch_version(ctx, clan_id)
+    if version is not None and versions.is_fresh(request.headers, version):
+        return responses.not_modified(version.headers())
+
     data = await clans.fetch_one(ctx, clan_id)
     if isinstance(data, ServiceError):
         return responses.failure(data, "Failed to get clan")
 
-    resp = Clan.from_mapping(data)
-    return responses.success(resp)
+    version = clans.version_of(data)
+    if versions.is_fresh(request.headers, version):
+        return responses.not_modified(version.headers())
+
+    resp = Clan.project(data)
+    return responses.success(resp, headers=version.headers())
 
 
 # https://osuakatsuki.atlassian.net/browse/V2-113
 @router.get("/clans", response_model=list[Clan])
-async def get_clans(ctx: RequestContext = Depends()):
-    data = await clans.fetch_all(ctx)
-    resp = [Clan.from_mapping(clan) for clan in data]
-    return responses.success(resp)
+async def get_clans(request: Request,
+                    owner: int | None = None,
+                    join_method: JoinMethod | None = None,
+                    status: Status = Status.ACTIVE,
+                    after: int | None = Query(None, ge=0),
+                    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                    stream: bool = False,
+                    ctx: RequestContext = Depends()):
+    if stream:
+        # ndjson straight off the read pool; unbounded unless a limit is given
+        rows = clans.iterate_all(ctx, owner=owner, join_method=join_method,
+                                 status=status, after=after, limit=limit)
+        return responses.stream(_ndjson_lines(rows))
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    version = await clans.fetch_list_version(ctx, owner=owner,
+                                             join_method=join_method,
+                                             status=status, after=after,
+                                             limit=limit)
+    if version is not None and versions.is_fresh(request.headers, version):
+        return responses.not_modified(version.headers())
+
+    data = await clans.fetch_all(ctx, owner=owner, join_method=join_method,
+                                 status=status, after=after, limit=limit)
+    resp = [Clan.project(clan) for clan in data]
+    headers = version.headers() if version is not None else None
+    return responses.success(resp, headers=headers)
+
+
+async def _ndjson_lines(rows: AsyncIterator[Mapping[str, Any]]) -> AsyncIterator[bytes]:
+    async for row in rows:
+        yield orjson.dumps(Clan.project(row)) + b"\n"
 
 
 # https://osuakatsuki.atlassian.net/browse/V2-64
@@ -52,7 +178,7 @@ async def partial_update_clan(clan_id: int, args: UpdateClan,
     if isinstance(data, ServiceError):
         return responses.failure(data, "Failed to update clan")
 
-    resp = Clan.from_mapping(data)
+    resp = Clan.project(data)
     return responses.success(resp)
 
 
@@ -63,5 +189,5 @@ async def disband_clan(clan_id: int, ctx: RequestContext = Depends()):
     if isinstance(data, ServiceError):
         return responses.failure(data, "Failed to disband clan")
 
-    resp = Clan.from_mapping(data)
+    resp = Clan.project(data)
     return responses.success(resp)
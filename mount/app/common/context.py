@@ -15,3 +15,19 @@ class Context(ABC):
     @abstractmethod
     def redis(self) -> redis.ServiceRedis:
         ...
+
+
+class AppContext(Context):
+    """Context for work done outside of a request, e.g. on startup."""
+
+    def __init__(self, db: database.ServiceDatabase, redis: redis.ServiceRedis) -> None:
+        self._db = db
+        self._redis = redis
+
+    @property
+    def db(self) -> database.ServiceDatabase:
+        return self._db
+
+    @property
+    def redis(self) -> redis.ServiceRedis:
+        return self._redis
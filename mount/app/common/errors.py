@@ -7,3 +7,10 @@ class ServiceError(str, Enum):
     CLANS_ALREADY_IN_CLAN = 'clans.already_in_clan'
     CLANS_NAME_EXISTS = 'clans.name_exists'
     CLANS_TAG_EXISTS = 'clans.tag_exists'
+    CLANS_INVALID = 'clans.invalid'
+    CLANS_INVALID_CURSOR = 'clans.invalid_cursor'
+
+    CLAN_MEMBERS_NOT_FOUND = 'clan_members.not_found'
+    CLAN_MEMBERS_CLAN_CLOSED = 'clan_members.clan_closed'
+    CLAN_MEMBERS_NOT_OWNER = 'clan_members.not_owner'
+    CLAN_MEMBERS_OWNER_CANNOT_LEAVE = 'clan_members.owner_cannot_leave'
@@ -0,0 +1,71 @@
+"""Encodings of streamed rows, for exports of whole tables.
+
+Rows are encoded one at a time as they're read, so memory use stays flat
+however many there are; they're sent in CHUNK_SIZE blocks rather than one
+write per row.
+"""
+import csv
+import io
+import zlib
+from datetime import datetime
+from typing import Any
+from typing import AsyncIterator
+from typing import Mapping
+from typing import Sequence
+
+import orjson
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def ndjson_lines(rows: AsyncIterator[Mapping[str, Any]],
+                       fields: Sequence[str]) -> AsyncIterator[bytes]:
+    async for row in rows:
+        yield orjson.dumps({k: row[k] for k in fields}) + b"\n"
+
+
+def _csv_value(value: Any) -> Any:
+    # as in the ndjson; str() would drop the T
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def csv_lines(rows: AsyncIterator[Mapping[str, Any]],
+                    fields: Sequence[str]) -> AsyncIterator[bytes]:
+    """A header row, then one record per row; nulls are empty fields."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(fields)
+    async for row in rows:
+        writer.writerow([_csv_value(row[k]) for k in fields])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def chunked(lines: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    async for line in lines:
+        buffer += line
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if buffer:
+        yield bytes(buffer)
+
+
+async def gzipped(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # wbits=31 writes a gzip header & trailer, i.e. a .gz file
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
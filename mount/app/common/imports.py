@@ -0,0 +1,84 @@
+"""Decodings of streamed request bodies, for imports of many rows.
+
+Records are parsed as the body arrives, so memory use stays flat however
+big it is. Each is yielded with the (1-based) line it starts on, or with a
+ValueError in its place if it can't be parsed, so one bad record doesn't
+fail the rest.
+"""
+import csv
+from typing import Any
+from typing import AsyncIterator
+
+import orjson
+
+
+async def lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """The lines of a body, each with its line ending (if it has one)."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            yield line + b"\n"
+
+    if buffer:
+        yield buffer
+
+
+async def ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, Any]]:
+    """One json value per line; blank lines are skipped."""
+    number = 0
+    async for line in lines(chunks):
+        number += 1
+        if not line.strip():
+            continue
+
+        try:
+            yield number, orjson.loads(line)
+        except orjson.JSONDecodeError as exc:
+            yield number, ValueError(f"Invalid json: {exc}")
+
+
+async def csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, Any]]:
+    """A header row, then one dict per record; empty fields are None, as
+    csv has no nulls. Quoted fields may span lines."""
+    header = None
+    record = b""
+    start = number = 0
+    async for line in lines(chunks):
+        number += 1
+        if not record:
+            if not line.strip():
+                continue
+            start = number
+
+        record += line
+        # quotes inside a quoted field are doubled, so a record which ends
+        # inside one has an odd number of them so far
+        if record.count(b'"') % 2:
+            continue
+
+        raw, record = record, b""
+        try:
+            # only the record's own line ending is dropped; those inside
+            # its quoted fields are part of their values
+            fields = next(csv.reader([raw.decode().removesuffix("\n")
+                                                 .removesuffix("\r")],
+                                     strict=True))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            yield start, ValueError(f"Invalid csv: {exc}")
+            continue
+
+        if header is None:
+            header = fields
+            continue
+
+        if len(fields) != len(header):
+            yield start, ValueError(f"Expected {len(header)} fields, "
+                                    f"got {len(fields)}")
+            continue
+
+        yield start, {k: v or None for k, v in zip(header, fields)}
+
+    if record:
+        yield start, ValueError("Invalid csv: unterminated quoted field")
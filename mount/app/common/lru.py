@@ -0,0 +1,72 @@
+import functools
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+# longer queries are usually generated (e.g. bulk inserts), unlikely to be
+# seen again, and would only push the hot ones out of a cache
+MAX_CACHED_QUERY_LENGTH = 4096
+
+
+class LRUCache(Generic[T]):
+    """A bounded, in-process cache evicting the least recently used entry.
+
+    Entries also expire after `ttl` seconds, which bounds how stale they can
+    get if an invalidation is ever missed. A maxsize of 0 disables caching.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, T]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> T | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: T) -> None:
+        if not self.maxsize:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def cache_by_query(fn: Callable[[str], T]) -> Callable[[str], T]:
+    """Memoize fn, a pure function of a query's text; repositories build
+    the same handful of queries over & over. Long queries aren't cached."""
+    cached = functools.lru_cache(maxsize=1024)(fn)
+
+    @functools.wraps(fn)
+    def wrapper(query: str) -> T:
+        if len(query) > MAX_CACHED_QUERY_LENGTH:
+            return fn(query)
+        return cached(query)
+
+    return wrapper
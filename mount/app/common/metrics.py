@@ -0,0 +1,52 @@
+from prometheus_client import Gauge
+from prometheus_client import Histogram
+
+# the default buckets stop at 10s, but start too coarse for redis & pk lookups
+FAST_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request, by route template",
+    ["method", "route", "status"],
+)
+
+CLANS_REPO_QUERY_LATENCY = Histogram(
+    "clans_repo_query_duration_seconds",
+    "Time spent in database queries, by ClansRepo method",
+    ["method"],
+    buckets=FAST_BUCKETS,
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pool connection",
+    ["pool", "host"],
+    buckets=FAST_BUCKETS,
+)
+
+DB_POOL_CONNECTIONS_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Pool connections currently checked out",
+    ["pool", "host"],
+)
+
+DB_POOL_CONNECTIONS_MAX = Gauge(
+    "db_pool_connections_max",
+    "Maximum size of the pool; in_use / max is its saturation",
+    ["pool", "host"],
+)
+
+REDIS_COMMAND_LATENCY = Histogram(
+    "redis_command_duration_seconds",
+    "Time spent in redis round trips, by command (or pipeline)",
+    ["command"],
+    buckets=FAST_BUCKETS,
+)
+
+
+def time_query(method: str):
+    """Time the block as one of ClansRepo's database queries."""
+    return CLANS_REPO_QUERY_LATENCY.labels(method=method).time()
@@ -0,0 +1,19 @@
+import re
+
+# mysql's [[:space:]], i.e. unicode's White_Space; python's \s also takes
+# in e.g. the \x1c-\x1f separators
+_WHITESPACE_RE = re.compile("[\t\n\v\f\r \x85\xa0\u1680\u2000-\u200a"
+                            "\u2028\u2029\u202f\u205f\u3000]+")
+
+
+def normalize(value: str) -> str:
+    """Lowercase & collapse whitespace, as the `active_name` & `active_tag`
+    columns do; names & tags equal after this are the same name or tag.
+
+    Lowercased a character at a time, as mysql's LOWER() does; str.lower()
+    can make two characters of one (İ), and lowercases Σ by its position.
+    """
+    value = _WHITESPACE_RE.sub(" ", value).strip(" ")
+    if value.isascii():
+        return value.lower()
+    return "".join([char.lower()[0] for char in value])
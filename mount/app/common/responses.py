@@ -1,12 +1,41 @@
 from typing import Any
+from typing import AsyncIterator
 
+import orjson
 from app.common.errors import ServiceError
 from fastapi.responses import ORJSONResponse
+from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    raise TypeError
+
+
+class _ORJSONResponse(ORJSONResponse):
+    # orjson can't serialize pydantic models on its own
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default,
+                            option=orjson.OPT_NON_STR_KEYS)
 
 
 def success(content: Any, status_code: int = 200, headers: dict | None = None) -> ORJSONResponse:
     data = {"status": "success", "data": content}
-    return ORJSONResponse(data, status_code, headers)
+    return _ORJSONResponse(data, status_code, headers)
+
+
+def stream(content: AsyncIterator[bytes], status_code: int = 200,
+           headers: dict | None = None,
+           media_type: str = "application/x-ndjson") -> StreamingResponse:
+    return StreamingResponse(content, status_code, headers,
+                             media_type=media_type)
+
+
+def not_modified(headers: dict | None = None) -> Response:
+    return Response(status_code=304, headers=headers)
 
 
 # TODO: make this more clear on the business case?
@@ -15,4 +44,4 @@ def success(content: Any, status_code: int = 200, headers: dict | None = None) -
 def failure(error: ServiceError, message: str, status_code: int = 400,
             headers: dict | None = None) -> ORJSONResponse:
     data = {"status": "error", "error": error, "message": message}
-    return ORJSONResponse(data, status_code, headers)
+    return _ORJSONResponse(data, status_code, headers)
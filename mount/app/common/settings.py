@@ -12,6 +12,7 @@ APP_PORT = int(os.environ["APP_PORT"])
 LOG_LEVEL = int(os.environ["LOG_LEVEL"])
 
 # database
+# "mysql" goes through `databases`; "mysql+native" uses aiomysql directly
 READ_DB_DRIVER = os.environ["READ_DB_DRIVER"]
 READ_DB_USER = os.environ["READ_DB_USER"]
 READ_DB_PASS = os.environ["READ_DB_PASS"]
@@ -19,6 +20,16 @@ READ_DB_HOST = os.environ["READ_DB_HOST"]
 READ_DB_PORT = int(os.environ["READ_DB_PORT"])
 READ_DB_NAME = os.environ["READ_DB_NAME"]
 
+# comma-separated host[:port] list of read replicas, to balance reads over
+READ_DB_HOSTS = [
+    (host, int(port or READ_DB_PORT))
+    for host, _, port in (
+        entry.strip().partition(":")
+        for entry in os.environ.get("READ_DB_HOSTS", READ_DB_HOST).split(",")
+        if entry.strip()
+    )
+]
+
 WRITE_DB_DRIVER = os.environ["WRITE_DB_DRIVER"]
 WRITE_DB_USER = os.environ["WRITE_DB_USER"]
 WRITE_DB_PASS = os.environ["WRITE_DB_PASS"]
@@ -30,12 +41,49 @@ MIN_DB_POOL_SIZE = int(os.environ["MIN_DB_POOL_SIZE"])
 MAX_DB_POOL_SIZE = int(os.environ["MAX_DB_POOL_SIZE"])
 DB_USE_SSL = os.environ["DB_USE_SSL"].lower() == "true"
 
+# seconds to keep reading from the primary after a write
+DB_READ_YOUR_WRITES_WINDOW = float(os.environ.get("DB_READ_YOUR_WRITES_WINDOW", "2"))
+
+# replica reads slower than this are cancelled, & fail; unlike connection
+# errors, they don't count against the replica's health
+DB_READ_TIMEOUT = float(os.environ.get("DB_READ_TIMEOUT", "5"))
+# consecutive failures before a replica is ejected, and for how long
+DB_REPLICA_MAX_FAILURES = int(os.environ.get("DB_REPLICA_MAX_FAILURES", "3"))
+DB_REPLICA_EJECT_SECONDS = float(os.environ.get("DB_REPLICA_EJECT_SECONDS", "30"))
+DB_REPLICA_HEALTH_CHECK_INTERVAL = float(os.environ.get("DB_REPLICA_HEALTH_CHECK_INTERVAL", "5"))
+
+# queries slower than this many seconds are logged
+DB_SLOW_QUERY_THRESHOLD = float(os.environ.get("DB_SLOW_QUERY_THRESHOLD", "0.1"))
+
+# connections per host for streamed reads (e.g. exports), beside the pool
+DB_STREAM_POOL_SIZE = int(os.environ.get("DB_STREAM_POOL_SIZE", "4"))
+
 # redis
 REDIS_HOST = os.environ["REDIS_HOST"]
 REDIS_PORT = int(os.environ["REDIS_PORT"])
 
+CLANS_CACHE_TTL = int(os.environ.get("CLANS_CACHE_TTL", "300"))  # seconds
+CLANS_CACHE_NEGATIVE_TTL = int(os.environ.get("CLANS_CACHE_NEGATIVE_TTL", "30"))
+
+# per-process cache in front of redis; 0 disables it
+CLANS_LOCAL_CACHE_SIZE = int(os.environ.get("CLANS_LOCAL_CACHE_SIZE", "1024"))
+CLANS_LOCAL_CACHE_TTL = float(os.environ.get("CLANS_LOCAL_CACHE_TTL", "10"))  # seconds
+
+# the change feed holds back clans updated more recently than this, so a
+# write which commits late (or reaches the replica late) isn't skipped by
+# consumers who have already paged past its updated_at
+CLANS_CHANGES_SETTLE_TIME = float(os.environ.get("CLANS_CHANGES_SETTLE_TIME", "5"))  # seconds
+
 # rabbitmq
 AMQP_HOST = os.environ["AMQP_HOST"]
 AMQP_PORT = int(os.environ["AMQP_PORT"])
 AMQP_USER = os.environ["AMQP_USER"]
 AMQP_PASS = os.environ["AMQP_PASS"]
+AMQP_EXCHANGE = os.environ.get("AMQP_EXCHANGE", "clans")
+
+# clan events outbox
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", "1"))  # seconds
+OUTBOX_MAX_BACKOFF = float(os.environ.get("OUTBOX_MAX_BACKOFF", "30"))
+# a batch not confirmed by the broker in this long is retried
+OUTBOX_PUBLISH_TIMEOUT = float(os.environ.get("OUTBOX_PUBLISH_TIMEOUT", "10"))  # seconds
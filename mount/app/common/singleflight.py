@@ -0,0 +1,40 @@
+import asyncio
+import contextvars
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into a single call.
+
+    The first caller for a key starts the call; anyone asking for the same
+    key while it's in flight awaits that call's result instead of making
+    their own. A caller being cancelled doesn't cancel the shared call.
+
+    The shared call runs in an empty context, not its first caller's: it
+    mustn't see context vars such as that caller's database transaction.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = contextvars.Context().run(asyncio.ensure_future, fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+        # retrieve the exception, in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,48 @@
+"""Validators for HTTP conditional requests (RFC 7232)."""
+from datetime import datetime
+from datetime import timezone
+from email.utils import format_datetime
+from email.utils import parsedate_to_datetime
+from typing import Mapping, NamedTuple
+
+
+class Version(NamedTuple):
+    etag: str
+    # naive datetimes are utc, like the database's
+    last_modified: datetime
+
+    def headers(self) -> dict[str, str]:
+        return {
+            "ETag": f'"{self.etag}"',
+            "Last-Modified": format_datetime(_utc(self.last_modified),
+                                             usegmt=True),
+        }
+
+
+def _utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def is_fresh(headers: Mapping[str, str], version: Version) -> bool:
+    """Whether the client's copy is current, so a 304 will do."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        # takes precedence over If-Modified-Since; weak comparison
+        etag = f'"{version.etag}"'
+        return any(tag.strip() in ("*", etag, f"W/{etag}")
+                   for tag in if_none_match.split(","))
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+        # http dates have no sub-second part
+        last_modified = _utc(version.last_modified).replace(microsecond=0)
+        return last_modified <= _utc(since)
+
+    return False
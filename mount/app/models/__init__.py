@@ -13,6 +13,10 @@ class Status(str, Enum):
 T = TypeVar('T', bound=type['BaseModel'])
 
 
+# field names by model, so project() needn't look them up per row
+_projected_fields: dict[type, tuple[str, ...]] = {}
+
+
 class BaseModel(_pydantic_BaseModel):
     class Config:
         anystr_strip_whitespace = True
@@ -20,3 +24,17 @@ class BaseModel(_pydantic_BaseModel):
     @classmethod
     def from_mapping(cls: T, mapping: Mapping[str, Any]) -> T:
         return cls(**{k: mapping[k] for k in cls.__fields__})
+
+    @classmethod
+    def project(cls, mapping: Mapping[str, Any]) -> dict[str, Any]:
+        """The model's fields of a trusted mapping (e.g. a row we read from
+        our own database), as a plain dict for the response.
+
+        Unlike from_mapping, nothing is validated or converted, so the
+        mapping's values must already have the fields' types; the tests
+        check that both serialize the same.
+        """
+        fields = _projected_fields.get(cls)
+        if fields is None:
+            fields = _projected_fields[cls] = tuple(cls.__fields__)
+        return {k: mapping[k] for k in fields}
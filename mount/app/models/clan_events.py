@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class ClanEventType(str, Enum):
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DISBANDED = 'disbanded'
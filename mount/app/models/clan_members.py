@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from . import BaseModel
+
+
+#
+# Input
+#
+class JoinClan(BaseModel):
+    user_id: int
+
+
+class KickClanMember(BaseModel):
+    kicked_by: int
+
+
+#
+# Output
+#
+class ClanMember(BaseModel):
+    clan_id: int
+    user_id: int
+    joined_at: datetime
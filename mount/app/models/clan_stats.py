@@ -0,0 +1,43 @@
+from datetime import datetime
+from enum import Enum
+
+from pydantic import Field
+
+from . import BaseModel
+
+
+class LeaderboardSort(str, Enum):
+    TOTAL_PP = 'total_pp'
+    AVG_PP = 'avg_pp'
+    RANKED_SCORE = 'ranked_score'
+
+
+#
+# Input
+#
+class UpdateMemberStats(BaseModel):
+    pp: float = Field(..., ge=0)
+    ranked_score: int = Field(..., ge=0)
+
+
+#
+# Output
+#
+class ClanStats(BaseModel):
+    clan_id: int
+    member_count: int
+    total_pp: float
+    avg_pp: float
+    ranked_score: int
+    updated_at: datetime
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    clan_id: int
+    name: str
+    tag: str
+    member_count: int
+    total_pp: float
+    avg_pp: float
+    ranked_score: int
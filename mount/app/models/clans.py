@@ -3,7 +3,10 @@ from enum import Enum
 
 from pydantic import Field
 
+from app.common.errors import ServiceError
+
 from . import BaseModel
+from . import Status
 
 
 class JoinMethod(str, Enum):
@@ -13,6 +16,11 @@ class JoinMethod(str, Enum):
     CLOSED = 'closed'
 
 
+class ExportFormat(str, Enum):
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+
+
 #
 # Input
 #
@@ -32,6 +40,12 @@ class UpdateClan(BaseModel):
     join_method: JoinMethod | None
 
 
+class DisbandClans(BaseModel):
+    clan_ids: list[int] = Field(..., min_items=1, max_items=10000)
+    # keep their members & stats, so they can be restored
+    deactivate: bool = False
+
+
 #
 # Output
 #
@@ -43,3 +57,36 @@ class Clan(BaseModel):
     owner: int
     created_at: datetime
     updated_at: datetime
+
+
+class ClanRecord(Clan):
+    """A clan as it's stored, whatever its status; e.g. for exports."""
+    join_method: JoinMethod
+    status: Status
+
+
+class ClanChanges(BaseModel):
+    clans: list[ClanRecord]
+    # where the next poll carries on from; unchanged if nothing changed
+    cursor: str | None
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: ServiceError
+    message: str | None
+
+
+class ImportResult(BaseModel):
+    created: int
+    errors: list[ImportRowError]
+
+
+class DisbandError(BaseModel):
+    clan_id: int
+    error: ServiceError
+
+
+class DisbandResult(BaseModel):
+    disbanded: int
+    errors: list[DisbandError]
@@ -0,0 +1,13 @@
+from . import BaseModel
+
+
+#
+# Output
+#
+class QueryStats(BaseModel):
+    fingerprint: str
+    calls: int
+    slow_calls: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
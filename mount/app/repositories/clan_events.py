@@ -0,0 +1,107 @@
+from typing import Any, Mapping
+
+from app.common.context import Context
+from app.models.clan_events import ClanEventType
+from app.repositories.query_builder import ValuesList
+from app.repositories.query_builder import WhereClause
+
+
+class ClanEventsRepo:
+    """The transactional outbox of clan events.
+
+    Events are written in the same transaction as the change they describe,
+    and deleted once they've been published.
+    """
+
+    READ_PARAMS = """\
+        event_id, clan_id, event_type, payload, created_at
+    """
+
+    def __init__(self, ctx: Context) -> None:
+        self.ctx = ctx
+
+    async def create(self, clan_id: int, event_type: ClanEventType,
+                     payload: str) -> None:
+        query = """\
+            INSERT INTO clan_events (clan_id, event_type, payload)
+                 VALUES (:clan_id, :event_type, :payload)
+        """
+        params = {
+            "clan_id": clan_id,
+            "event_type": event_type,
+            "payload": payload,
+        }
+        await self.ctx.db.execute(query, params)
+
+    async def create_many(self, events: list[tuple[int, ClanEventType, str]]) -> None:
+        """Insert (clan_id, event_type, payload) events in one statement."""
+        if not events:
+            return
+
+        values = ValuesList(("clan_id", "event_type", "payload"))
+        for clan_id, event_type, payload in events:
+            values.append({
+                "clan_id": clan_id,
+                "event_type": event_type,
+                "payload": payload,
+            })
+
+        query = f"""\
+            INSERT INTO clan_events {values}
+        """
+        await self.ctx.db.execute(query, values.params)
+
+    async def claim_pending(self, limit: int, lease: float) -> list[Mapping[str, Any]]:
+        """Claim the oldest events which nobody holds a claim on, for `lease`
+        seconds; events locked by another publisher's claim are skipped
+        rather than waited on.
+
+        Call this in a transaction of its own, committed before the events
+        are published; its locks hold up every insert into the outbox.
+        """
+        query = f"""\
+            SELECT {self.READ_PARAMS}
+              FROM clan_events
+             WHERE claimed_until IS NULL OR claimed_until < NOW()
+          ORDER BY event_id
+             LIMIT :limit
+               FOR UPDATE SKIP LOCKED
+        """
+        params = {
+            "limit": limit,
+        }
+        events = await self.ctx.db.fetch_all(query, params, primary=True)
+        if not events:
+            return events
+
+        where = WhereClause().is_in("event_id",
+                                    [event["event_id"] for event in events])
+        query = f"""\
+            UPDATE clan_events
+               SET claimed_until = NOW() + INTERVAL :lease SECOND
+                  {where}
+        """
+        params = {
+            "lease": lease,
+            **where.params,
+        }
+        await self.ctx.db.execute(query, params)
+        return events
+
+    async def release_many(self, event_ids: list[int]) -> None:
+        """Drop the claims on events, e.g. which failed to publish."""
+        where = WhereClause().is_in("event_id", event_ids)
+        query = f"""\
+            UPDATE clan_events
+               SET claimed_until = NULL
+                  {where}
+        """
+        await self.ctx.db.execute(query, where.params)
+
+    async def delete_many(self, event_ids: list[int]) -> None:
+        where = WhereClause().is_in("event_id", event_ids)
+        query = f"""\
+            DELETE FROM clan_events
+                  {where}
+        """
+        await self.ctx.db.execute(query, where.params)
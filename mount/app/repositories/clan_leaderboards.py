@@ -0,0 +1,92 @@
+from typing import Any, Mapping
+
+from app.common.context import Context
+from app.models.clan_stats import LeaderboardSort
+
+STATS_FIELDS = ("member_count", "total_pp", "ranked_score")
+
+
+def _leaderboard_key(sort: LeaderboardSort) -> str:
+    return f"clans:leaderboard:{sort.value}"
+
+
+def _stats_key(clan_id: int) -> str:
+    return f"clans:stats:{clan_id}"
+
+
+class ClanLeaderboardsRepo:
+    """Ranked clan stats, kept in one redis sorted set per sort order.
+
+    Each clan's aggregates sit in a hash next to the sorted sets, so a page
+    is a ZREVRANGE plus one pipelined HGETALL per clan on it.
+    """
+
+    def __init__(self, ctx: Context) -> None:
+        self.ctx = ctx
+
+    async def update(self, stats: Mapping[str, Any]) -> None:
+        await self.update_many([stats])
+
+    async def update_many(self, stats: list[Mapping[str, Any]]) -> None:
+        pipe = self.ctx.redis.pipeline(transaction=False)
+        for clan_stats in stats:
+            clan_id = clan_stats["clan_id"]
+            member_count = clan_stats["member_count"]
+            avg_pp = clan_stats["total_pp"] / member_count if member_count else 0
+
+            pipe.hset(_stats_key(clan_id),
+                      mapping={k: clan_stats[k] for k in STATS_FIELDS})
+            pipe.zadd(_leaderboard_key(LeaderboardSort.TOTAL_PP),
+                      {clan_id: clan_stats["total_pp"]})
+            pipe.zadd(_leaderboard_key(LeaderboardSort.AVG_PP),
+                      {clan_id: avg_pp})
+            pipe.zadd(_leaderboard_key(LeaderboardSort.RANKED_SCORE),
+                      {clan_id: clan_stats["ranked_score"]})
+        await pipe.execute()
+
+    async def count(self, sort: LeaderboardSort) -> int:
+        return await self.ctx.redis.zcard(_leaderboard_key(sort))
+
+    async def remove(self, clan_id: int) -> None:
+        await self.remove_many([clan_id])
+
+    async def remove_many(self, clan_ids: list[int]) -> None:
+        if not clan_ids:
+            return
+
+        pipe = self.ctx.redis.pipeline(transaction=False)
+        pipe.delete(*(_stats_key(clan_id) for clan_id in clan_ids))
+        for sort in LeaderboardSort:
+            pipe.zrem(_leaderboard_key(sort), *clan_ids)
+        await pipe.execute()
+
+    async def fetch_page(self, sort: LeaderboardSort,
+                         offset: int, limit: int) -> list[dict[str, Any]]:
+        clan_ids = await self.ctx.redis.zrevrange(_leaderboard_key(sort),
+                                                  offset, offset + limit - 1)
+        if not clan_ids:
+            return []
+
+        pipe = self.ctx.redis.pipeline(transaction=False)
+        for clan_id in clan_ids:
+            pipe.hmget(_stats_key(int(clan_id)), STATS_FIELDS)
+        rows = await pipe.execute()
+
+        entries = []
+        for rank, (clan_id, row) in enumerate(zip(clan_ids, rows),
+                                              start=offset + 1):
+            member_count, total_pp, ranked_score = row
+            if member_count is None:
+                continue
+
+            member_count = int(member_count)
+            total_pp = float(total_pp)
+            entries.append({
+                "rank": rank,
+                "clan_id": int(clan_id),
+                "member_count": member_count,
+                "total_pp": total_pp,
+                "avg_pp": total_pp / member_count if member_count else 0,
+                "ranked_score": int(ranked_score),
+            })
+        return entries
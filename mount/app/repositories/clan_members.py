@@ -0,0 +1,146 @@
+from typing import Any, Mapping
+
+from app.common.context import Context
+from app.repositories.query_builder import ValuesList
+from app.repositories.query_builder import WhereClause
+
+
+class ClanMembersRepo:
+    READ_PARAMS = """\
+        clan_id, user_id, joined_at,
+        pp, ranked_score
+    """
+
+    def __init__(self, ctx: Context) -> None:
+        self.ctx = ctx
+
+    async def create(self, clan_id: int, user_id: int) -> Mapping[str, Any]:
+        query = f"""\
+            INSERT INTO clan_members (clan_id, user_id)
+                 VALUES (:clan_id, :user_id)
+              RETURNING {self.READ_PARAMS}
+        """
+        params = {
+            "clan_id": clan_id,
+            "user_id": user_id,
+        }
+        member = await self.ctx.db.fetch_one(query, params)
+        assert member is not None
+        return member
+
+    async def create_many(self, members: list[tuple[int, int]]) -> None:
+        """Insert (clan_id, user_id) memberships in one statement."""
+        if not members:
+            return
+
+        values = ValuesList(("clan_id", "user_id"))
+        for clan_id, user_id in members:
+            values.append({"clan_id": clan_id, "user_id": user_id})
+
+        query = f"""\
+            INSERT INTO clan_members {values}
+        """
+        await self.ctx.db.execute(query, values.params)
+
+    async def fetch_one(self,
+                        clan_id: int | None = None,
+                        user_id: int | None = None,
+                        for_update: bool = False) -> Mapping[str, Any] | None:
+        where = (WhereClause()
+                 .equals("clan_id", clan_id)
+                 .equals("user_id", user_id))
+        query = f"""\
+            SELECT {self.READ_PARAMS}
+              FROM clan_members
+             {where}
+             {"FOR UPDATE" if for_update else ""}
+        """
+        member = await self.ctx.db.fetch_one(query, where.params)
+        return member
+
+    async def fetch_many(self, user_ids: list[int]) -> list[Mapping[str, Any] | None]:
+        """Fetch the memberships of users, in input order, with None for
+        users who aren't in a clan."""
+        unique_ids = list(dict.fromkeys(user_ids))
+        if not unique_ids:
+            return []
+
+        where = WhereClause().is_in("user_id", unique_ids)
+        query = f"""\
+            SELECT {self.READ_PARAMS}
+              FROM clan_members
+             {where}
+        """
+        members = await self.ctx.db.fetch_all(query, where.params)
+
+        by_user_id = {member["user_id"]: member for member in members}
+        return [by_user_id.get(user_id) for user_id in user_ids]
+
+    async def fetch_all(self,
+                        clan_id: int,
+                        after: int | None = None,
+                        limit: int | None = None) -> list[Mapping[str, Any]]:
+        where = (WhereClause()
+                 .equals("clan_id", clan_id)
+                 .greater_than("user_id", after, param="after"))
+        params = where.params
+
+        # keyset pagination along the (clan_id, user_id) primary key
+        limit_clause = ""
+        if limit is not None:
+            limit_clause = "LIMIT :limit"
+            params["limit"] = limit
+
+        query = f"""\
+            SELECT {self.READ_PARAMS}
+              FROM clan_members
+             {where}
+          ORDER BY user_id
+             {limit_clause}
+        """
+        members = await self.ctx.db.fetch_all(query, params)
+        return members
+
+    async def update_stats(self, user_id: int, pp: float, ranked_score: int) -> None:
+        query = """\
+            UPDATE clan_members
+               SET pp = :pp,
+                   ranked_score = :ranked_score
+             WHERE user_id = :user_id
+        """
+        params = {
+            "user_id": user_id,
+            "pp": pp,
+            "ranked_score": ranked_score,
+        }
+        await self.ctx.db.execute(query, params)
+
+    async def delete(self, clan_id: int, user_id: int) -> None:
+        query = """\
+            DELETE FROM clan_members
+                  WHERE clan_id = :clan_id
+                    AND user_id = :user_id
+        """
+        params = {
+            "clan_id": clan_id,
+            "user_id": user_id,
+        }
+        await self.ctx.db.execute(query, params)
+
+    async def delete_all(self, clan_id: int) -> None:
+        query = """\
+            DELETE FROM clan_members
+                  WHERE clan_id = :clan_id
+        """
+        params = {
+            "clan_id": clan_id,
+        }
+        await self.ctx.db.execute(query, params)
+
+    async def delete_all_many(self, clan_ids: list[int]) -> None:
+        where = WhereClause().is_in("clan_id", clan_ids)
+        query = f"""\
+            DELETE FROM clan_members
+                  {where}
+        """
+        await self.ctx.db.execute(query, where.params)
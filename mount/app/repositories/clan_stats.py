@@ -0,0 +1,133 @@
+from typing import Any, Mapping
+
+from app.common.context import Context
+from app.models import Status
+from app.repositories.query_builder import ValuesList
+from app.repositories.query_builder import WhereClause
+
+
+class ClanStatsRepo:
+    READ_PARAMS = """\
+        clan_id, member_count, total_pp,
+        IF(member_count > 0, total_pp / member_count, 0) AS avg_pp,
+        ranked_score, updated_at
+    """
+
+    def __init__(self, ctx: Context) -> None:
+        self.ctx = ctx
+
+    async def create(self, clan_id: int, member_count: int = 0) -> Mapping[str, Any]:
+        query = f"""\
+            INSERT INTO clan_stats (clan_id, member_count)
+                 VALUES (:clan_id, :member_count)
+              RETURNING {self.READ_PARAMS}
+        """
+        params = {
+            "clan_id": clan_id,
+            "member_count": member_count,
+        }
+        stats = await self.ctx.db.fetch_one(query, params)
+        assert stats is not None
+        return stats
+
+    async def create_many(self, clan_ids: list[int],
+                          member_count: int = 0) -> list[Mapping[str, Any]]:
+        if not clan_ids:
+            return []
+
+        values = ValuesList(("clan_id", "member_count"))
+        for clan_id in clan_ids:
+            values.append({"clan_id": clan_id, "member_count": member_count})
+
+        query = f"""\
+            INSERT INTO clan_stats {values}
+              RETURNING {self.READ_PARAMS}
+        """
+        stats = await self.ctx.db.fetch_all(query, values.params)
+        return stats
+
+    async def fetch_one(self, clan_id: int) -> Mapping[str, Any] | None:
+        query = f"""\
+            SELECT {self.READ_PARAMS}
+              FROM clan_stats
+             WHERE clan_id = :clan_id
+        """
+        params = {
+            "clan_id": clan_id,
+        }
+        stats = await self.ctx.db.fetch_one(query, params)
+        return stats
+
+    async def fetch_all(self,
+                        after: int | None = None,
+                        limit: int | None = None,
+                        status: Status | None = None) -> list[Mapping[str, Any]]:
+        """With status, only the stats of clans with that status."""
+        where = WhereClause().greater_than("clan_id", after, param="after")
+        if status is not None:
+            where.condition("""EXISTS (SELECT 1 FROM clans
+                                        WHERE clans.clan_id = clan_stats.clan_id
+                                          AND clans.status = :status)""",
+                            status=status)
+        params = where.params
+
+        limit_clause = ""
+        if limit is not None:
+            limit_clause = "LIMIT :limit"
+            params["limit"] = limit
+
+        query = f"""\
+            SELECT {self.READ_PARAMS}
+              FROM clan_stats
+             {where}
+          ORDER BY clan_id
+             {limit_clause}
+        """
+        stats = await self.ctx.db.fetch_all(query, params)
+        return stats
+
+    async def apply_delta(self, clan_id: int,
+                          member_count: int = 0,
+                          total_pp: float = 0,
+                          ranked_score: int = 0) -> Mapping[str, Any] | None:
+        """The stats after the delta, and whether they're `ranked`, i.e.
+        whether their clan is active, as this statement sees it."""
+        query = f"""\
+            UPDATE clan_stats
+               SET member_count = member_count + :member_count,
+                   total_pp = total_pp + :total_pp,
+                   ranked_score = ranked_score + :ranked_score,
+                   updated_at = CURRENT_TIMESTAMP
+             WHERE clan_id = :clan_id
+         RETURNING {self.READ_PARAMS},
+                   EXISTS (SELECT 1 FROM clans
+                            WHERE clans.clan_id = clan_stats.clan_id
+                              AND clans.status = :status) AS ranked
+        """
+        params = {
+            "clan_id": clan_id,
+            "status": Status.ACTIVE,
+            "member_count": member_count,
+            "total_pp": total_pp,
+            "ranked_score": ranked_score,
+        }
+        stats = await self.ctx.db.fetch_one(query, params)
+        return stats
+
+    async def delete(self, clan_id: int) -> None:
+        query = """\
+            DELETE FROM clan_stats
+                  WHERE clan_id = :clan_id
+        """
+        params = {
+            "clan_id": clan_id,
+        }
+        await self.ctx.db.execute(query, params)
+
+    async def delete_many(self, clan_ids: list[int]) -> None:
+        where = WhereClause().is_in("clan_id", clan_ids)
+        query = f"""\
+            DELETE FROM clan_stats
+                  {where}
+        """
+        await self.ctx.db.execute(query, where.params)
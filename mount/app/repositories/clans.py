@@ -1,8 +1,41 @@
-from typing import Any, Mapping
+import re
+from datetime import datetime
+from datetime import timezone
+from typing import Any, AsyncIterator, Mapping
 
+from app.common import metrics
+from app.common import settings
 from app.common.context import Context
+from app.common.normalization import normalize
+from app.common.singleflight import SingleFlight
+from app.common.versions import Version
 from app.models import Status
 from app.models.clans import JoinMethod
+from app.repositories.clans_cache import ClansCache
+from app.repositories.clans_cache import version_of
+from app.repositories.query_builder import ValuesList
+from app.repositories.query_builder import WhereClause
+
+# shared by every request in this process
+_inflight = SingleFlight()
+
+# mariadb's fulltext index holds whole words of at least innodb_ft_min_token_size
+FULLTEXT_MIN_TOKEN_SIZE = 3
+
+# operators of fulltext boolean mode, & like's wildcards
+_BOOLEAN_OPERATORS_RE = re.compile(r'[+\-<>()~*@"]')
+_LIKE_WILDCARDS_RE = re.compile(r"([\\%_])")
+
+
+def _name_and_tag_lookup(name: str | None, tag: str | None,
+                         status: Status | None) -> tuple[str, str | None, str, str | None]:
+    """The columns to match a name & tag against, and the values to match."""
+    if status != Status.ACTIVE:
+        return "name", name, "tag", tag
+
+    # active clans' names & tags are matched normalized, by a unique index
+    return ("active_name", normalize(name) if name is not None else None,
+            "active_tag", normalize(tag) if tag is not None else None)
 
 
 class ClansRepo:
@@ -14,6 +47,7 @@ class ClansRepo:
 
     def __init__(self, ctx: Context) -> None:
         self.ctx = ctx
+        self.cache = ClansCache(ctx)
 
     async def create(self,
                      name: str,
@@ -35,60 +69,379 @@ class ClansRepo:
             "join_method": join_method,
             "status": status,
         }
-        clan = await self.ctx.db.fetch_one(query, params)
+        with metrics.time_query("create"):
+            clan = await self.ctx.db.fetch_one(query, params)
         assert clan is not None
+        await self.ctx.db.after_commit(lambda: self.cache.invalidate(clan))
         return clan
 
+    async def create_many(self, clans: list[Mapping[str, Any]]) -> list[Mapping[str, Any]]:
+        """Insert active clans in one statement; all or none of them are
+        created. The created clans are returned in no particular order."""
+        if not clans:
+            return []
+
+        values = ValuesList(("name", "tag", "description", "owner",
+                             "join_method", "status"))
+        for clan in clans:
+            values.append({
+                "name": clan["name"],
+                "tag": clan["tag"],
+                "description": clan["description"],
+                "owner": clan["owner"],
+                "join_method": clan["join_method"],
+                "status": Status.ACTIVE,
+            })
+
+        query = f"""\
+            INSERT INTO clans {values}
+              RETURNING {self.READ_PARAMS}
+        """
+        with metrics.time_query("create_many"):
+            created = await self.ctx.db.fetch_all(query, values.params)
+        await self.ctx.db.after_commit(lambda: self.cache.invalidate_many(created))
+        return created
+
     async def fetch_one(self,
                         clan_id: int | None = None,
                         tag: str | None = None,
                         name: str | None = None,
                         owner: int | None = None,
-                        status: Status | None = Status.ACTIVE) -> Mapping[str, Any] | None:
+                        status: Status | None = Status.ACTIVE,
+                        for_update: bool = False) -> Mapping[str, Any] | None:
+        # only single-key lookups of active clans go through the cache;
+        # locking reads must see the row as it is in the primary, & reads in
+        # a transaction must see its writes (which mustn't be cached yet)
+        cacheable = (status == Status.ACTIVE and owner is None and
+                     [clan_id, tag, name].count(None) == 2 and
+                     not for_update and not self.ctx.db.in_transaction())
+        if not cacheable:
+            return await self._fetch_one(clan_id, tag, name, owner, status,
+                                         for_update)
+
+        lookup = await self.cache.fetch_one(clan_id, tag, name)
+        if lookup.hit:
+            return lookup.clan
+
+        # concurrent misses for the same clan share one query & cache fill
+        primary = lookup.recently_written
+        key = ("fetch_one", clan_id,
+               normalize(tag) if tag is not None else None,
+               normalize(name) if name is not None else None,
+               primary)
+        return await _inflight.do(key, lambda: self._fetch_one_and_cache(clan_id, tag, name, primary))
+
+    async def _fetch_one_and_cache(self,
+                                   clan_id: int | None = None,
+                                   tag: str | None = None,
+                                   name: str | None = None,
+                                   primary: bool = False) -> Mapping[str, Any] | None:
+        clan = await self._fetch_one(clan_id, tag, name, primary=primary)
+        await self.cache.store(clan, clan_id, tag, name)
+        return clan
+
+    async def _fetch_one(self,
+                         clan_id: int | None = None,
+                         tag: str | None = None,
+                         name: str | None = None,
+                         owner: int | None = None,
+                         status: Status | None = Status.ACTIVE,
+                         for_update: bool = False,
+                         primary: bool = False) -> Mapping[str, Any] | None:
+        name_column, name, tag_column, tag = _name_and_tag_lookup(name, tag, status)
+        where = (WhereClause()
+                 .equals("clan_id", clan_id)
+                 .equals(name_column, name, param="name")
+                 .equals(tag_column, tag, param="tag")
+                 .equals("owner", owner)
+                 .equals("status", status))
         query = f"""\
             SELECT {self.READ_PARAMS}
               FROM clans
-             WHERE clan_id = COALESCE(:clan_id, clan_id)
-               AND name = COALESCE(:name, name)
-               AND tag = COALESCE(:tag, tag)
-               AND owner = COALESCE(:owner, owner)
-               AND status = COALESCE(:status, status)
+             {where}
+             {"FOR UPDATE" if for_update else ""}
         """
-        params = {
-            "clan_id": clan_id,
-            "tag": tag,
-            "name": name,
-            "owner": owner,
-            "status": status,
-        }
-        clan = await self.ctx.db.fetch_one(query, params)
+        with metrics.time_query("fetch_one"):
+            clan = await self.ctx.db.fetch_one(query, where.params, primary=primary)
         return clan
 
+    async def fetch_version(self, clan_id: int) -> Version | None:
+        """The cached version of an active clan, or None if it isn't cached."""
+        return await self.cache.fetch_version(clan_id)
+
+    @staticmethod
+    def version_of(clan: Mapping[str, Any]) -> Version:
+        """A clan's version, as fetch_version() would find it once cached."""
+        return version_of(clan)
+
+    async def fetch_list_version(self) -> Version | None:
+        return await self.cache.fetch_list_version()
+
+    async def fetch_many(self, clan_ids: list[int]) -> list[Mapping[str, Any] | None]:
+        """Fetch active clans by id, in input order, with None for misses."""
+        unique_ids = list(dict.fromkeys(clan_ids))
+        if not unique_ids:
+            return []
+
+        # as in fetch_one, a transaction reads its own writes, uncached
+        cacheable = not self.ctx.db.in_transaction()
+        found: dict[int, Mapping[str, Any] | None] = {}
+        recently_written = False
+        if cacheable:
+            found, recently_written = await self.cache.fetch_many(unique_ids)
+
+        missing = [clan_id for clan_id in unique_ids if clan_id not in found]
+        if missing:
+            where = (WhereClause()
+                     .is_in("clan_id", missing)
+                     .equals("status", Status.ACTIVE))
+            query = f"""\
+                SELECT {self.READ_PARAMS}
+                  FROM clans
+                 {where}
+            """
+            with metrics.time_query("fetch_many"):
+                clans = await self.ctx.db.fetch_all(query, where.params,
+                                                    primary=recently_written)
+
+            fetched: dict[int, Mapping[str, Any] | None] = dict.fromkeys(missing)
+            fetched.update((clan["clan_id"], clan) for clan in clans)
+            if cacheable:
+                await self.cache.store_many(fetched)
+            found.update(fetched)
+
+        return [found[clan_id] for clan_id in clan_ids]
+
     async def fetch_all(self,
                         clan_id: int | None = None,
                         tag: str | None = None,
                         name: str | None = None,
                         owner: int | None = None,
-                        status: Status | None = Status.ACTIVE) -> list[Mapping[str, Any]]:
+                        join_method: JoinMethod | None = None,
+                        status: Status | None = Status.ACTIVE,
+                        after: int | None = None,
+                        limit: int | None = None) -> list[Mapping[str, Any]]:
+        query, params = self._fetch_all_query(clan_id, tag, name, owner,
+                                              join_method, status, after,
+                                              limit)
+        with metrics.time_query("fetch_all"):
+            clans = await self.ctx.db.fetch_all(query, params)
+        return clans
+
+    async def iterate_all(self,
+                          owner: int | None = None,
+                          join_method: JoinMethod | None = None,
+                          status: Status | None = Status.ACTIVE,
+                          after: int | None = None,
+                          limit: int | None = None,
+                          since: datetime | None = None) -> AsyncIterator[Mapping[str, Any]]:
+        query, params = self._fetch_all_query(owner=owner,
+                                              join_method=join_method,
+                                              status=status,
+                                              after=after,
+                                              limit=limit,
+                                              since=since)
+        async for clan in self.ctx.db.iterate(query, params):
+            yield clan
+
+    def _fetch_all_query(self,
+                         clan_id: int | None = None,
+                         tag: str | None = None,
+                         name: str | None = None,
+                         owner: int | None = None,
+                         join_method: JoinMethod | None = None,
+                         status: Status | None = Status.ACTIVE,
+                         after: int | None = None,
+                         limit: int | None = None,
+                         since: datetime | None = None) -> tuple[str, dict[str, Any]]:
+        name_column, name, tag_column, tag = _name_and_tag_lookup(name, tag, status)
+        where = (WhereClause()
+                 .equals("clan_id", clan_id)
+                 .equals(name_column, name, param="name")
+                 .equals(tag_column, tag, param="tag")
+                 .equals("owner", owner)
+                 .equals("join_method", join_method)
+                 .equals("status", status)
+                 .greater_than("updated_at", since, param="since")
+                 .greater_than("clan_id", after, param="after"))
+        params = where.params
+
+        # keyset pagination on clan_id; never an OFFSET scan
+        limit_clause = ""
+        if limit is not None:
+            limit_clause = "LIMIT :limit"
+            params["limit"] = limit
+
         query = f"""\
             SELECT {self.READ_PARAMS}
               FROM clans
-             WHERE clan_id = COALESCE(:clan_id, clan_id)
-               AND name = COALESCE(:name, name)
-               AND tag = COALESCE(:tag, tag)
-               AND owner = COALESCE(:owner, owner)
-               AND status = COALESCE(:status, status)
+             {where}
+          ORDER BY clan_id
+             {limit_clause}
         """
-        params = {
-            "clan_id": clan_id,
-            "tag": tag,
-            "name": name,
-            "owner": owner,
-            "status": status,
+        return query, params
+
+    async def fetch_changes(self,
+                            since: datetime | None = None,
+                            after_clan_id: int | None = None,
+                            limit: int = 100) -> list[Mapping[str, Any]]:
+        """Clans of any status updated after since, in (updated_at, clan_id)
+        order. With after_clan_id, (since, after_clan_id) is a position in
+        that order; clans updated at since itself with greater ids follow it.
+
+        Each page is a range scan of clans_updated_at_clan_id_index. Clans
+        updated in the last CLANS_CHANGES_SETTLE_TIME seconds are left for
+        a later page.
+        """
+        if since is not None and since.tzinfo is not None:
+            # updated_at is naive utc; the driver would drop an offset
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+
+        where = WhereClause()
+        if since is not None and after_clan_id is not None:
+            where.after_position(("updated_at", "clan_id"),
+                                 (since, after_clan_id))
+        else:
+            where.greater_than("updated_at", since, param="since")
+
+        where.condition("updated_at < NOW() - INTERVAL :settle_time SECOND",
+                        settle_time=settings.CLANS_CHANGES_SETTLE_TIME)
+        params = where.params | {
+            "limit": limit,
         }
-        clans = await self.ctx.db.fetch_all(query, params)
+
+        query = f"""\
+            SELECT {self.READ_PARAMS}
+              FROM clans
+             {where}
+          ORDER BY updated_at, clan_id
+             LIMIT :limit
+        """
+        with metrics.time_query("fetch_changes"):
+            clans = await self.ctx.db.fetch_all(query, params)
+        return clans
+
+    async def search(self, term: str, offset: int,
+                     limit: int) -> list[Mapping[str, Any]]:
+        """Active clans whose name or tag contains term, case-insensitively.
+
+        Exact matches rank first, then prefixes, then fulltext relevance.
+        """
+        words = [word for word in _BOOLEAN_OPERATORS_RE.sub(" ", term).split()
+                 if len(word) >= FULLTEXT_MIN_TOKEN_SIZE]
+        escaped = _LIKE_WILDCARDS_RE.sub(r"\\\1", term)
+        params: dict[str, Any] = {
+            "term": term,
+            "prefix": escaped + "%",
+            "substring": "%" + escaped + "%",
+            "status": Status.ACTIVE,
+            "offset": offset,
+            "limit": limit,
+        }
+
+        if words:
+            # the index only has whole words, so it ranks those (& words they
+            # prefix); a substring within a word is found by the like alone
+            params["words"] = " ".join(f"{word}*" for word in words)
+            match = "MATCH (name, tag) AGAINST (:words IN BOOLEAN MODE)"
+        else:
+            match = "0"
+
+        query = f"""\
+            SELECT {self.READ_PARAMS}
+              FROM clans
+             WHERE (name LIKE :substring OR tag LIKE :substring)
+               AND status = :status
+          ORDER BY tag = :term DESC,
+                   name = :term DESC,
+                   tag LIKE :prefix DESC,
+                   name LIKE :prefix DESC,
+                   {match} DESC,
+                   clan_id
+             LIMIT :limit
+            OFFSET :offset
+        """
+        with metrics.time_query("search"):
+            clans = await self.ctx.db.fetch_all(query, params)
         return clans
 
+    async def fetch_conflicts(self,
+                              name: str | None = None,
+                              tag: str | None = None,
+                              owner: int | None = None,
+                              exclude_clan_id: int | None = None) -> set[str]:
+        """Find which of name, tag & owner are already taken by an active clan.
+
+        One round trip; each predicate is a probe of an `active_*` unique index.
+        """
+        candidates = {
+            "owner": owner,
+            "name": normalize(name) if name is not None else None,
+            "tag": normalize(tag) if tag is not None else None,
+        }
+        candidates = {k: v for k, v in candidates.items() if v is not None}
+        if not candidates:
+            return set()
+
+        taken = ", ".join(f"MAX(active_{k} = :{k}) AS {k}_taken"
+                          for k in candidates)
+        matches = " OR ".join(f"active_{k} = :{k}" for k in candidates)
+        params: dict[str, Any] = dict(candidates)
+
+        exclude_clause = ""
+        if exclude_clan_id is not None:
+            exclude_clause = "AND clan_id != :exclude_clan_id"
+            params["exclude_clan_id"] = exclude_clan_id
+
+        query = f"""\
+            SELECT {taken}
+              FROM clans
+             WHERE ({matches})
+               {exclude_clause}
+        """
+        with metrics.time_query("fetch_conflicts"):
+            row = await self.ctx.db.fetch_one(query, params)
+        if row is None:
+            return set()
+
+        return {k for k in candidates if row[f"{k}_taken"]}
+
+    async def fetch_taken(self,
+                          names: list[str],
+                          tags: list[str],
+                          owners: list[int]) -> dict[str, set[Any]]:
+        """Find which of many names, tags & owners are already taken by
+        active clans; names & tags are returned normalized.
+
+        fetch_conflicts for a batch, in one round trip.
+        """
+        candidates = {
+            "owner": set(owners),
+            "name": {normalize(name) for name in names},
+            "tag": {normalize(tag) for tag in tags},
+        }
+        taken: dict[str, set[Any]] = {k: set() for k in candidates}
+
+        # each is a probe of an `active_*` unique index, merged by mysql
+        matches = WhereClause()
+        for k, values in candidates.items():
+            matches.is_in(f"active_{k}", values, param=k)
+        where = WhereClause().any_of(matches)
+
+        query = f"""\
+            SELECT active_owner, active_name, active_tag
+              FROM clans
+             {where}
+        """
+        with metrics.time_query("fetch_taken"):
+            rows = await self.ctx.db.fetch_all(query, where.params)
+
+        for row in rows:
+            for k, values in candidates.items():
+                if row[f"active_{k}"] in values:
+                    taken[k].add(row[f"active_{k}"])
+        return taken
+
     async def partial_update(self, clan_id: int, **updates) -> Mapping[str, Any]:
         query = f"""\
             UPDATE clans
@@ -111,8 +464,10 @@ class ClansRepo:
             "join_method": None,
             "status": None,
         } | updates
-        clan = await self.ctx.db.fetch_one(query, params)
+        with metrics.time_query("partial_update"):
+            clan = await self.ctx.db.fetch_one(query, params)
         assert clan is not None
+        await self.ctx.db.after_commit(lambda: self.cache.invalidate(clan))
         return clan
 
     async def disband(self, clan_id: int) -> Mapping[str, Any]:
@@ -127,6 +482,44 @@ class ClansRepo:
             "clan_id": clan_id,
             "new_status": Status.DELETED,
         }
-        clan = await self.ctx.db.fetch_one(query, params)
+        with metrics.time_query("disband"):
+            clan = await self.ctx.db.fetch_one(query, params)
         assert clan is not None
+        await self.ctx.db.after_commit(lambda: self.cache.invalidate(clan))
         return clan
+
+    async def lock_many(self, clan_ids: list[int]) -> list[Mapping[str, Any]]:
+        """Fetch & lock the active clans among clan_ids, in one query."""
+        where = (WhereClause()
+                 .is_in("clan_id", clan_ids)
+                 .equals("status", Status.ACTIVE))
+        query = f"""\
+            SELECT {self.READ_PARAMS}
+              FROM clans
+             {where}
+          ORDER BY clan_id
+               FOR UPDATE
+        """
+        with metrics.time_query("lock_many"):
+            clans = await self.ctx.db.fetch_all(query, where.params)
+        return clans
+
+    async def disband_many(self, clan_ids: list[int],
+                           new_status: Status = Status.DELETED) -> list[Mapping[str, Any]]:
+        """Set the status of many clans in one statement; disbands them by
+        default, but they may be deactivated instead."""
+        where = WhereClause().is_in("clan_id", clan_ids)
+        query = f"""\
+            UPDATE clans
+                SET status = :new_status,
+                    updated_at = CURRENT_TIMESTAMP
+              {where}
+            RETURNING {self.READ_PARAMS}
+        """
+        params = where.params | {
+            "new_status": new_status,
+        }
+        with metrics.time_query("disband_many"):
+            clans = await self.ctx.db.fetch_all(query, params)
+        await self.ctx.db.after_commit(lambda: self.cache.invalidate_many(clans))
+        return clans
@@ -0,0 +1,323 @@
+import hashlib
+import uuid
+from datetime import datetime
+from typing import Any, Mapping, NamedTuple
+
+import orjson
+
+from app.common import settings
+from app.common.context import Context
+from app.common.lru import LRUCache
+from app.common.normalization import normalize
+from app.common.versions import Version
+
+# stored in place of a clan (or clan id) for lookups which found nothing
+NEGATIVE = b"-"
+
+# stored in place of a clan (or clan id) that was just written; until it
+# expires, lookups read from the primary as replicas may not have the write
+WRITTEN = b"!"
+
+CACHED_FIELDS = (
+    "clan_id", "name", "tag", "description",
+    "owner", "join_method", "status",
+    "created_at", "updated_at",
+)
+
+
+# changed on every write to any clan; the validator for listings of clans
+LIST_VERSION_KEY = "clans:list:version"
+# set for the read-your-writes window after a write, as listings read from a
+# lagging replica could still predate it
+LIST_WRITTEN_KEY = "clans:list:written"
+
+# in-process L1 in front of redis, shared by every request in this process;
+# holds the same keys, evicted on invalidations published by any process
+local_cache: LRUCache[Any] = LRUCache(settings.CLANS_LOCAL_CACHE_SIZE,
+                                      settings.CLANS_LOCAL_CACHE_TTL)
+
+# bumped on every invalidation; a fill which raced one is dropped, as what
+# it read from redis may predate the write
+_generation = 0
+
+
+def _id_key(clan_id: int) -> str:
+    return f"clans:id:{clan_id}"
+
+
+# names & tags are unique once normalized, so they're looked up that way
+def _tag_key(tag: str) -> str:
+    return f"clans:tag:{normalize(tag)}"
+
+
+def _name_key(name: str) -> str:
+    return f"clans:name:{normalize(name)}"
+
+
+def _version_key(clan_id: int) -> str:
+    return f"clans:version:{clan_id}"
+
+
+def _invalidation_key(clan_id: int) -> str:
+    return f"clans:{clan_id}"
+
+
+def on_invalidation(key: str) -> None:
+    global _generation
+
+    prefix, _, clan_id = key.partition(":")
+    if prefix != "clans":
+        return
+
+    _generation += 1
+    local_cache.pop(_id_key(int(clan_id)))
+
+
+def clear_local_cache() -> None:
+    global _generation
+
+    _generation += 1
+    local_cache.clear()
+
+
+def _serialize(clan: Mapping[str, Any]) -> bytes:
+    return orjson.dumps({k: clan[k] for k in CACHED_FIELDS})
+
+
+def _version(raw: bytes, updated_at: datetime) -> Version:
+    return Version(hashlib.blake2b(raw, digest_size=8).hexdigest(), updated_at)
+
+
+def version_of(clan: Mapping[str, Any]) -> Version:
+    return _version(_serialize(clan), clan["updated_at"])
+
+
+def _encode_version(version: Version) -> str:
+    return f"{version.etag}:{version.last_modified.isoformat()}"
+
+
+def _decode_version(raw: bytes) -> Version:
+    etag, _, last_modified = raw.decode().partition(":")
+    return Version(etag, datetime.fromisoformat(last_modified))
+
+
+def _new_list_version() -> str:
+    return _encode_version(Version(uuid.uuid4().hex[:16],
+                                   datetime.utcnow().replace(microsecond=0)))
+
+
+def _deserialize(raw: bytes) -> dict[str, Any]:
+    clan = orjson.loads(raw)
+    clan["created_at"] = datetime.fromisoformat(clan["created_at"])
+    clan["updated_at"] = datetime.fromisoformat(clan["updated_at"])
+    return clan
+
+
+# NOTE: stores are all SET NX; they only ever follow a miss, and must not
+# overwrite a WRITTEN marker set while the clan was being read
+
+
+def _store_clan(pipe: Any, clan: Mapping[str, Any]) -> None:
+    raw = _serialize(clan)
+    pipe.set(_id_key(clan["clan_id"]), raw,
+             ex=settings.CLANS_CACHE_TTL, nx=True)
+    pipe.set(_version_key(clan["clan_id"]),
+             _encode_version(_version(raw, clan["updated_at"])),
+             ex=settings.CLANS_CACHE_TTL, nx=True)
+    pipe.set(_tag_key(clan["tag"]), clan["clan_id"],
+             ex=settings.CLANS_CACHE_TTL, nx=True)
+    pipe.set(_name_key(clan["name"]), clan["clan_id"],
+             ex=settings.CLANS_CACHE_TTL, nx=True)
+
+
+class CacheLookup(NamedTuple):
+    hit: bool
+    clan: Mapping[str, Any] | None = None
+    # a miss on a clan written within the read-your-writes window
+    recently_written: bool = False
+
+
+MISS = CacheLookup(hit=False)
+
+
+class ClansCache:
+    """Read-through cache of active clans, keyed by clan id, tag and name.
+
+    Tag and name entries only point at a clan id; a pointer is trusted only
+    if the clan it points at still has that tag or name, so renaming a clan
+    just needs its id entry invalidated.
+
+    Clans found in redis are also kept in `local_cache`; it never holds
+    "not found"s, so only updates & disbands need evicting from it.
+    """
+
+    def __init__(self, ctx: Context) -> None:
+        self.ctx = ctx
+
+    async def fetch_one(self,
+                        clan_id: int | None = None,
+                        tag: str | None = None,
+                        name: str | None = None) -> CacheLookup:
+        """A hit with no clan is a cached "not found"."""
+        generation = _generation
+
+        key = None
+        if clan_id is None:
+            key = _tag_key(tag) if tag is not None else _name_key(name)  # type: ignore
+            clan_id = local_cache.get(key)
+            if clan_id is None:
+                pointer = await self.ctx.redis.get(key)
+                if pointer is None:
+                    return MISS
+                if pointer == WRITTEN:
+                    return CacheLookup(hit=False, recently_written=True)
+                if pointer == NEGATIVE:
+                    return CacheLookup(hit=True)
+
+                clan_id = int(pointer)
+
+        clan = local_cache.get(_id_key(clan_id))
+        if clan is None:
+            raw = await self.ctx.redis.get(_id_key(clan_id))
+            if raw is None:
+                return MISS
+            if raw == WRITTEN:
+                return CacheLookup(hit=False, recently_written=True)
+            if raw == NEGATIVE:
+                # a stale pointer's target may have been disbanded since
+                return CacheLookup(hit=True) if key is None else MISS
+
+            clan = _deserialize(raw)
+            if generation == _generation:
+                local_cache.set(_id_key(clan_id), clan)
+
+        if tag is not None and normalize(clan["tag"]) != normalize(tag):
+            return MISS
+        if name is not None and normalize(clan["name"]) != normalize(name):
+            return MISS
+
+        if key is not None and generation == _generation:
+            local_cache.set(key, clan_id)
+
+        return CacheLookup(hit=True, clan=clan)
+
+    async def fetch_many(self, clan_ids: list[int]) -> tuple[dict[int, Mapping[str, Any] | None], bool]:
+        """Returns the cached clans (or cached "not found"s) among clan_ids,
+        and whether any of the others were recently written."""
+        generation = _generation
+
+        hits: dict[int, Mapping[str, Any] | None] = {}
+        for clan_id in clan_ids:
+            clan = local_cache.get(_id_key(clan_id))
+            if clan is not None:
+                hits[clan_id] = clan
+
+        remote_ids = [clan_id for clan_id in clan_ids if clan_id not in hits]
+        if not remote_ids:
+            return hits, False
+
+        raws = await self.ctx.redis.mget([_id_key(clan_id) for clan_id in remote_ids])
+
+        recently_written = False
+        for clan_id, raw in zip(remote_ids, raws):
+            if raw is None:
+                continue
+            if raw == WRITTEN:
+                recently_written = True
+                continue
+            if raw == NEGATIVE:
+                hits[clan_id] = None
+                continue
+
+            hits[clan_id] = clan = _deserialize(raw)
+            if generation == _generation:
+                local_cache.set(_id_key(clan_id), clan)
+        return hits, recently_written
+
+    async def fetch_version(self, clan_id: int) -> Version | None:
+        """The version of an active clan, if it's cached; much cheaper to
+        check a client's copy against than the clan itself."""
+        clan = local_cache.get(_id_key(clan_id))
+        if clan is not None:
+            return version_of(clan)
+
+        raw = await self.ctx.redis.get(_version_key(clan_id))
+        if raw is None or raw == WRITTEN:
+            return None
+        return _decode_version(raw)
+
+    async def fetch_list_version(self) -> Version | None:
+        """The version of all clans, changed by any write; None while it
+        can't be trusted."""
+        raw, written = await self.ctx.redis.mget([LIST_VERSION_KEY,
+                                                  LIST_WRITTEN_KEY])
+        if written is not None:
+            return None
+        if raw is None:
+            # e.g. after a flush; listings get validators from the next read
+            await self.ctx.redis.set(LIST_VERSION_KEY, _new_list_version(),
+                                     nx=True)
+            return None
+        return _decode_version(raw)
+
+    async def store(self, clan: Mapping[str, Any] | None,
+                    clan_id: int | None = None,
+                    tag: str | None = None,
+                    name: str | None = None) -> None:
+        pipe = self.ctx.redis.pipeline(transaction=False)
+        if clan is None:
+            if clan_id is not None:
+                key = _id_key(clan_id)
+            elif tag is not None:
+                key = _tag_key(tag)
+            else:
+                key = _name_key(name)  # type: ignore
+            pipe.set(key, NEGATIVE, ex=settings.CLANS_CACHE_NEGATIVE_TTL,
+                     nx=True)
+        else:
+            _store_clan(pipe, clan)
+        await pipe.execute()
+
+    async def store_many(self, clans: dict[int, Mapping[str, Any] | None]) -> None:
+        pipe = self.ctx.redis.pipeline(transaction=False)
+        for clan_id, clan in clans.items():
+            if clan is None:
+                pipe.set(_id_key(clan_id), NEGATIVE,
+                         ex=settings.CLANS_CACHE_NEGATIVE_TTL, nx=True)
+            else:
+                _store_clan(pipe, clan)
+        await pipe.execute()
+
+    async def invalidate(self, clan: Mapping[str, Any]) -> None:
+        await self.invalidate_many([clan])
+
+    async def invalidate_many(self, clans: list[Mapping[str, Any]]) -> None:
+        if not clans:
+            return
+
+        # also replaces any cached "not found" for the clans' current tags & names
+        keys = []
+        invalidation_keys = []
+        for clan in clans:
+            keys += (_id_key(clan["clan_id"]),
+                     _version_key(clan["clan_id"]),
+                     _tag_key(clan["tag"]),
+                     _name_key(clan["name"]))
+
+            invalidation_key = _invalidation_key(clan["clan_id"])
+            on_invalidation(invalidation_key)
+            invalidation_keys.append(invalidation_key)
+
+        pipe = self.ctx.redis.pipeline(transaction=False)
+        pipe.set(LIST_VERSION_KEY, _new_list_version())
+
+        window = settings.DB_READ_YOUR_WRITES_WINDOW
+        if not window:
+            pipe.delete(*keys)
+        else:
+            for key in (*keys, LIST_WRITTEN_KEY):
+                pipe.set(key, WRITTEN, px=int(window * 1000))
+        await pipe.execute()
+
+        # other processes evict them from their local caches
+        await self.ctx.redis.publish_invalidations(invalidation_keys)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from typing import Any
+from typing import Iterable
+from typing import Mapping
+from typing import Sequence
+
+
+class WhereClause:
+    """Composes a WHERE clause from only the predicates that were supplied.
+
+    Filters passed as `None` are left out of the query entirely, rather than
+    compiled to `col = COALESCE(:col, col)`, so MySQL can use an index on the
+    columns that are actually being filtered on.
+    """
+
+    def __init__(self) -> None:
+        self.conditions: list[str] = []
+        self.params: dict[str, Any] = {}
+
+    def _add(self, column: str, operator: str, value: Any,
+             param: str | None) -> WhereClause:
+        param = param or column
+        self.conditions.append(f"{column} {operator} :{param}")
+        self.params[param] = value
+        return self
+
+    def equals(self, column: str, value: Any | None,
+               param: str | None = None) -> WhereClause:
+        if value is None:
+            return self
+        return self._add(column, "=", value, param)
+
+    def greater_than(self, column: str, value: Any | None,
+                     param: str | None = None) -> WhereClause:
+        if value is None:
+            return self
+        return self._add(column, ">", value, param)
+
+    def is_in(self, column: str, values: Iterable[Any] | None,
+              param: str | None = None) -> WhereClause:
+        if values is None:
+            return self
+
+        param = param or column
+        placeholders = []
+        for idx, value in enumerate(values):
+            key = f"{param}_{idx}"
+            placeholders.append(f":{key}")
+            self.params[key] = value
+
+        if not placeholders:
+            # an empty IN () is a syntax error in mysql
+            self.conditions.append("FALSE")
+        else:
+            self.conditions.append(f"{column} IN ({', '.join(placeholders)})")
+        return self
+
+    def after_position(self, columns: Sequence[str],
+                       position: Sequence[Any] | None,
+                       param: str = "after") -> WhereClause:
+        """Rows after position in (*columns) order, for keyset pagination.
+
+        Spelled out as `a >= :a AND (a > :a OR b > :b)` rather than a row
+        comparison, which mysql can't use an index on `(a, b)` for.
+        """
+        if position is None:
+            return self
+
+        keys = [f"{param}_{idx}" for idx in range(len(columns))]
+        for key, value in zip(keys, position):
+            self.params[key] = value
+
+        # (a, b, c) > (:a, :b, :c), as (a > :a OR (a = :a AND (b, c) > ...))
+        after = f"{columns[-1]} > :{keys[-1]}"
+        for column, key in zip(reversed(columns[:-1]), reversed(keys[:-1])):
+            after = f"({column} > :{key} OR ({column} = :{key} AND {after}))"
+
+        if len(columns) > 1:
+            # bounds the range of the index that's scanned
+            self.conditions.append(f"{columns[0]} >= :{keys[0]}")
+        self.conditions.append(after)
+        return self
+
+    def condition(self, sql: str, **params: Any) -> WhereClause:
+        """Add a condition the other methods can't express, such as a
+        subquery; params are the values of its :params."""
+        self.conditions.append(sql)
+        self.params |= params
+        return self
+
+    def any_of(self, clause: WhereClause) -> WhereClause:
+        """Add one condition: that any of clause's conditions holds."""
+        if clause.conditions:
+            self.conditions.append(f"({' OR '.join(clause.conditions)})")
+            self.params |= clause.params
+        return self
+
+    def __str__(self) -> str:
+        if not self.conditions:
+            return ""
+
+        return "WHERE " + "\n               AND ".join(self.conditions)
+
+
+class ValuesList:
+    """Composes the rows of a multi-row INSERT, so a batch of rows is
+    written in one statement rather than one round trip each."""
+
+    def __init__(self, columns: Sequence[str]) -> None:
+        self.columns = tuple(columns)
+        self.rows: list[str] = []
+        self.params: dict[str, Any] = {}
+
+    def append(self, row: Mapping[str, Any]) -> ValuesList:
+        idx = len(self.rows)
+        placeholders = []
+        for column in self.columns:
+            key = f"{column}_{idx}"
+            placeholders.append(f":{key}")
+            self.params[key] = row[column]
+
+        self.rows.append(f"({', '.join(placeholders)})")
+        return self
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __str__(self) -> str:
+        return (f"({', '.join(self.columns)})\n"
+                "                 VALUES " + ",\n                        ".join(self.rows))
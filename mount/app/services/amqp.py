@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Sequence
+
+import aio_pika
+
+from app.services.broker import Message
+from app.services.broker import ServiceBroker
+
+
+class AMQPBroker(ServiceBroker):
+    """Publishes persistent messages to a durable topic exchange, waiting
+    on publisher confirms."""
+
+    def __init__(self, url: str, exchange: str) -> None:
+        self.url = url
+        self.exchange_name = exchange
+        self._connection: aio_pika.abc.AbstractRobustConnection | None = None
+        self._exchange: aio_pika.abc.AbstractExchange | None = None
+
+    async def connect(self) -> None:
+        self._connection = await aio_pika.connect_robust(self.url)
+        channel = await self._connection.channel(publisher_confirms=True)
+        self._exchange = await channel.declare_exchange(
+            self.exchange_name, aio_pika.ExchangeType.TOPIC, durable=True)
+
+    async def disconnect(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+        self._connection = None
+        self._exchange = None
+
+    async def publish_many(self, messages: Sequence[Message]) -> None:
+        assert self._exchange is not None
+
+        await asyncio.gather(*(
+            self._exchange.publish(
+                aio_pika.Message(
+                    body=message.body,
+                    message_id=message.message_id,
+                    content_type="application/json",
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                ),
+                routing_key=message.routing_key,
+            )
+            for message in messages
+        ))
+
+
+def url(user: str, password: str, host: str, port: int) -> str:
+    return f"amqp://{user}:{password}@{host}:{port}/"
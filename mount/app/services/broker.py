@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from abc import ABC
+from abc import abstractmethod
+from types import TracebackType
+from typing import NamedTuple
+from typing import Sequence
+from typing import Type
+
+
+class Message(NamedTuple):
+    routing_key: str
+    body: bytes
+    message_id: str
+
+
+class ServiceBroker(ABC):
+    async def __aenter__(self) -> ServiceBroker:
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type: Type[BaseException] | None,
+                        exc_value: BaseException | None,
+                        traceback: TracebackType | None) -> None:
+        await self.disconnect()
+
+    async def connect(self) -> None:
+        ...
+
+    async def disconnect(self) -> None:
+        ...
+
+    @abstractmethod
+    async def publish_many(self, messages: Sequence[Message]) -> None:
+        """Publish messages, returning once the broker has accepted all of
+        them; raises if any weren't."""
+        ...
+
+
+class InMemoryBroker(ServiceBroker):
+    """Stand-in broker for tests, which keeps what's published in a list."""
+
+    def __init__(self) -> None:
+        self.messages: list[Message] = []
+
+    async def publish_many(self, messages: Sequence[Message]) -> None:
+        self.messages.extend(messages)
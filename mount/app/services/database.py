@@ -1,18 +1,146 @@
 from __future__ import annotations
 
+import asyncio
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from contextlib import contextmanager
+from contextvars import ContextVar
 from types import TracebackType
 from typing import Any
+from typing import AsyncContextManager
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
+from typing import Iterator
 from typing import Mapping
+from typing import Sequence
 from typing import Type
+from typing import TypeVar
+from typing import Union
 
+from app.common import metrics
+from app.services import mysql
+from app.services.query_stats import QueryStatsRecorder
 from databases import Database
-from databases.core import Transaction
+from databases.core import Connection as DatabasesConnection
+from shared_modules import logger
 
+T = TypeVar("T")
 
-def _create_pool(dsn: str, min_pool_size: int, max_pool_size: int, ssl: bool) -> Database:
+# pools are either `databases`', or native aiomysql ones for DRIVER=mysql+native
+Pool = Union[Database, mysql.Pool]
+Connection = Union[DatabasesConnection, mysql.Connection]
+
+
+# https://dev.mysql.com/doc/mysql-errors/8.0/en/server-error-reference.html#error_er_dup_entry
+ER_DUP_ENTRY = 1062
+
+# https://dev.mysql.com/doc/mysql-errors/8.0/en/client-error-reference.html
+CR_CONNECTION_ERRORS = {
+    2002,  # CR_CONNECTION_ERROR
+    2003,  # CR_CONN_HOST_ERROR
+    2006,  # CR_SERVER_GONE_ERROR
+    2013,  # CR_SERVER_LOST
+    2055,  # CR_SERVER_LOST_EXTENDED
+}
+
+# mysql prefixes the key with the table name, mariadb doesn't
+_DUP_ENTRY_KEY_RE = re.compile(r"for key '(?:[^']*\.)?([^'.]+)'")
+
+
+class UniqueViolationError(Exception):
+    def __init__(self, constraint: str) -> None:
+        super().__init__(constraint)
+        self.constraint = constraint
+
+
+@contextmanager
+def _translate_errors() -> Iterator[None]:
+    try:
+        yield
+    except Exception as exc:
+        # driver agnostic; both pymysql & asyncmy use (errno, message) args
+        if len(exc.args) == 2 and exc.args[0] == ER_DUP_ENTRY:
+            match = _DUP_ENTRY_KEY_RE.search(str(exc.args[1]))
+            if match is not None:
+                raise UniqueViolationError(match.group(1)) from exc
+        raise
+
+
+def _is_unavailable(exc: BaseException) -> bool:
+    """Whether exc means the server couldn't be reached, rather than that
+    the query itself failed (or was just slow, and timed out)."""
+    if isinstance(exc, OSError) and not isinstance(exc, asyncio.TimeoutError):
+        return True
+    return bool(exc.args) and exc.args[0] in CR_CONNECTION_ERRORS
+
+
+def _host(dsn: str) -> str:
+    # for logs & metrics; keeps the credentials out of them
+    return dsn.rpartition("@")[2]
+
+
+def _pool_usage(pool: Pool) -> tuple[int, int]:
+    """Connections checked out of the pool, and its maximum size."""
+    if isinstance(pool, mysql.Pool):
+        raw_pool = pool.raw
+    else:
+        # databases doesn't expose its pool; the mysql backend keeps it here
+        raw_pool = getattr(pool._backend, "_pool", None)
+    if raw_pool is None:
+        return 0, 0
+    return raw_pool.size - raw_pool.freesize, raw_pool.maxsize
+
+
+def _watch_pool(pool: Pool, label: str, host: str) -> None:
+    metrics.DB_POOL_CONNECTIONS_IN_USE.labels(label, host).set_function(
+        lambda: _pool_usage(pool)[0])
+    metrics.DB_POOL_CONNECTIONS_MAX.labels(label, host).set_function(
+        lambda: _pool_usage(pool)[1])
+
+
+@asynccontextmanager
+async def _connection(pool: Pool) -> AsyncIterator[Connection]:
+    """A connection from the pool; closed instead of being returned to it
+    if a query is cancelled or times out, as the rest of its result would
+    still be unread, and read by the next query made on the connection."""
+    async with pool.connection() as connection:
+        try:
+            yield connection
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            # mysql.Connection does this itself as it's released
+            if isinstance(connection, DatabasesConnection):
+                connection.raw_connection.close()
+            raise
+
+
+@asynccontextmanager
+async def _checkout(pool: Pool, label: str, host: str) -> AsyncIterator[Connection]:
+    """Check a connection out of the pool, timing how long that takes."""
+    start = time.perf_counter()
+    async with _connection(pool) as connection:
+        metrics.DB_POOL_CHECKOUT_WAIT.labels(label, host).observe(
+            time.perf_counter() - start)
+        yield connection
+
+
+def _create_pool(dsn: str, min_pool_size: int, max_pool_size: int, ssl: bool) -> Pool:
+    if dsn.startswith(f"{mysql.DRIVER}://"):
+        return mysql.Pool(dsn, min_pool_size, max_pool_size, ssl)
     return Database(url=dsn, min_size=min_pool_size, max_size=max_pool_size, ssl=ssl)
 
 
+def _create_stream_pool(dsn: str, pool: Pool, max_pool_size: int, ssl: bool) -> mysql.Pool:
+    """The pool iterate() streams rows from. Native pools stream off their
+    own connections; `databases` buffers whole results, so its pools get a
+    small native one alongside, connecting only as streams need it."""
+    if isinstance(pool, mysql.Pool):
+        return pool
+    return mysql.Pool(dsn, 0, max_pool_size, ssl)
+
+
 def dsn(
     driver: str,
     user: str,
@@ -24,18 +152,94 @@ def dsn(
     return f"{driver}://{user}:{password}@{host}:{port}/{database}"
 
 
+class _Replica:
+    def __init__(self, dsn: str, pool: Pool, stream_pool: mysql.Pool) -> None:
+        self.dsn = dsn
+        self.host = _host(dsn)
+        self.pool = pool
+        self.stream_pool = stream_pool
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    def checkout(self) -> AsyncContextManager[Connection]:
+        return _checkout(self.pool, "read", self.host)
+
+    def checkout_stream(self) -> AsyncContextManager[Connection]:
+        return _checkout(self.stream_pool, "stream", self.host)
+
+    def is_healthy(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    def record_failure(self, max_failures: int, eject_seconds: float) -> None:
+        self.failures += 1
+        if self.failures >= max_failures:
+            if self.is_healthy(time.monotonic()):
+                logger.warning(f"Ejecting read replica {self.host} "
+                               f"after {self.failures} failures")
+            self.ejected_until = time.monotonic() + eject_seconds
+
+
 class ServiceDatabase:
-    def __init__(self, read_dsn: str, write_dsn: str,
+    def __init__(self, read_dsns: Sequence[str], write_dsn: str,
                  min_pool_size: int, max_pool_size: int,
-                 ssl: bool) -> None:
-        self.read_pool = _create_pool(read_dsn,
-                                      min_pool_size,
-                                      max_pool_size,
-                                      ssl)
+                 ssl: bool, read_your_writes_window: float = 0,
+                 read_timeout: float | None = None,
+                 replica_max_failures: int = 3,
+                 replica_eject_seconds: float = 30,
+                 replica_health_check_interval: float = 5,
+                 slow_query_threshold: float = 0.1,
+                 stream_pool_size: int = 4) -> None:
+        self.replicas = []
+        for read_dsn in read_dsns:
+            pool = _create_pool(read_dsn, min_pool_size, max_pool_size, ssl)
+            stream_pool = _create_stream_pool(read_dsn, pool, stream_pool_size, ssl)
+            self.replicas.append(_Replica(read_dsn, pool, stream_pool))
+
         self.write_pool = _create_pool(write_dsn,
                                        min_pool_size,
                                        max_pool_size,
                                        ssl)
+        self.write_stream_pool = _create_stream_pool(write_dsn,
+                                                     self.write_pool,
+                                                     stream_pool_size,
+                                                     ssl)
+        self.write_host = _host(write_dsn)
+
+        _watch_pool(self.write_pool, "write", self.write_host)
+        for replica in self.replicas:
+            _watch_pool(replica.pool, "read", replica.host)
+        for pool, stream_pool, host in self._stream_pools():
+            if stream_pool is not pool:
+                _watch_pool(stream_pool, "stream", host)
+
+        # set for the duration of a transaction() block in the current task
+        self._transaction: ContextVar[Connection | None] = ContextVar(
+            "transaction", default=None)
+        self._after_commit: ContextVar[list[Callable[[], Awaitable[None]]] | None] = ContextVar(
+            "after_commit", default=None)
+
+        # after writing, the current task's reads go to the primary for
+        # this many seconds, so they can't miss the write on a lagging replica
+        self.read_your_writes_window = read_your_writes_window
+        self._primary_until: ContextVar[float] = ContextVar(
+            "primary_until", default=0.0)
+
+        # replicas are ejected after replica_max_failures consecutive
+        # connection errors, and probed until they recover; reads fall back
+        # to the primary while none are healthy. Reads slower than
+        # read_timeout fail, but a slow query doesn't mean a replica is down
+        self.read_timeout = read_timeout
+        self.replica_max_failures = replica_max_failures
+        self.replica_eject_seconds = replica_eject_seconds
+        self.replica_health_check_interval = replica_health_check_interval
+        self._health_check_task: asyncio.Task | None = None
+
+        self.query_stats = QueryStatsRecorder(slow_query_threshold)
 
     async def __aenter__(self) -> ServiceDatabase:
         await self.connect()
@@ -46,33 +250,264 @@ class ServiceDatabase:
                         traceback:  TracebackType | None) -> None:
         await self.disconnect()
 
-    async def transaction(self) -> Transaction:
-        return await self.write_pool.transaction()
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """Run the block on a single write pool connection, in a transaction.
+
+        Reads made inside the block use that connection too, so they see the
+        transaction's own writes and can take row locks with FOR UPDATE.
+        Nested blocks become savepoints.
+        """
+        connection = self._transaction.get()
+        if connection is not None:
+            async with connection.transaction():
+                yield
+            return
+
+        callbacks: list[Callable[[], Awaitable[None]]] = []
+        async with self._checkout_write() as connection:
+            transaction_token = self._transaction.set(connection)
+            callbacks_token = self._after_commit.set(callbacks)
+            try:
+                async with connection.transaction():
+                    yield
+            finally:
+                self._after_commit.reset(callbacks_token)
+                self._transaction.reset(transaction_token)
+
+        self._wrote()
+        for callback in callbacks:
+            await callback()
+
+    def in_transaction(self) -> bool:
+        """Whether this task is inside a transaction() block."""
+        return self._transaction.get() is not None
+
+    async def after_commit(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """Run callback once the current transaction commits; right away if
+        there isn't one. Nothing is run if the transaction rolls back."""
+        callbacks = self._after_commit.get()
+        if callbacks is None:
+            await callback()
+        else:
+            callbacks.append(callback)
+
+    def _wrote(self) -> None:
+        if self.read_your_writes_window:
+            self._primary_until.set(time.monotonic() +
+                                    self.read_your_writes_window)
+
+    def _reads_pinned(self) -> bool:
+        return time.monotonic() < self._primary_until.get()
+
+    def _pick_replica(self) -> _Replica | None:
+        """The healthy replica with the fewest queries in flight, if any."""
+        now = time.monotonic()
+        healthy = [replica for replica in self.replicas
+                   if replica.is_healthy(now)]
+        if not healthy:
+            return None
+
+        least = min(replica.outstanding for replica in healthy)
+        return random.choice([replica for replica in healthy
+                              if replica.outstanding == least])
+
+    @contextmanager
+    def _timed(self, query: str, values: dict | list | None) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            # execute_many's values are a list of rows; name the first's params
+            if isinstance(values, list):
+                values = values[0] if values else None
+            self.query_stats.record(query, values, elapsed)
+
+    async def _read(self, query: str, values: dict | None, primary: bool,
+                    query_fn: Callable[[Connection], Awaitable[T]]) -> T:
+        with self._timed(query, values):
+            return await self._read_with_fallback(primary, query_fn)
+
+    async def _read_with_fallback(self, primary: bool,
+                                  query_fn: Callable[[Connection], Awaitable[T]]) -> T:
+        connection = self._transaction.get()
+        if connection is not None:
+            async with connection:
+                return await query_fn(connection)
+
+        replica = None
+        if not (primary or self._reads_pinned()):
+            replica = self._pick_replica()
+
+        if replica is not None:
+            replica.outstanding += 1
+            try:
+                async with replica.checkout() as connection:
+                    result = await asyncio.wait_for(query_fn(connection),
+                                                    self.read_timeout)
+            except Exception as exc:
+                if not _is_unavailable(exc):
+                    raise
+                replica.record_failure(self.replica_max_failures,
+                                       self.replica_eject_seconds)
+                # fall through to the primary
+            else:
+                replica.record_success()
+                return result
+            finally:
+                replica.outstanding -= 1
+
+        async with self._checkout_write() as connection:
+            return await query_fn(connection)
+
+    def _checkout_write(self) -> AsyncContextManager[Connection]:
+        return _checkout(self.write_pool, "write", self.write_host)
+
+    def _checkout_write_stream(self) -> AsyncContextManager[Connection]:
+        return _checkout(self.write_stream_pool, "stream", self.write_host)
+
+    def _write_connection(self) -> AsyncContextManager[Connection]:
+        return self._transaction.get() or self._checkout_write()
+
+    async def _check_replicas(self) -> None:
+        while True:
+            await asyncio.sleep(self.replica_health_check_interval)
+
+            for replica in self.replicas:
+                if not replica.failures:
+                    continue
+
+                try:
+                    async with _connection(replica.pool) as connection:
+                        await asyncio.wait_for(connection.fetch_val("SELECT 1"),
+                                               self.read_timeout)
+                except Exception as exc:
+                    # unlike a real query, SELECT 1 is only slow if the
+                    # replica is in trouble
+                    if not (_is_unavailable(exc) or
+                            isinstance(exc, asyncio.TimeoutError)):
+                        # e.g. a bad grant; keep probing the other replicas,
+                        # & this one again next time
+                        logger.error(f"Failed to probe read replica "
+                                     f"{replica.host}: {exc!r}")
+                        continue
+                    replica.record_failure(self.replica_max_failures,
+                                           self.replica_eject_seconds)
+                else:
+                    if not replica.is_healthy(time.monotonic()):
+                        logger.info(f"Read replica {replica.host} recovered")
+                    replica.record_success()
+
+    def _stream_pools(self) -> list[tuple[Pool, mysql.Pool, str]]:
+        """Each pool, with the pool streams use in its place & their host."""
+        return [(replica.pool, replica.stream_pool, replica.host)
+                for replica in self.replicas] + \
+               [(self.write_pool, self.write_stream_pool, self.write_host)]
+
+    def _pools(self) -> list[Pool]:
+        pools: list[Pool] = []
+        for pool, stream_pool, _ in self._stream_pools():
+            pools.append(pool)
+            # native pools are their own stream pools
+            if stream_pool is not pool:
+                pools.append(stream_pool)
+        return pools
 
     async def connect(self) -> None:
-        await self.read_pool.connect()
-        await self.write_pool.connect()
+        for pool in self._pools():
+            await pool.connect()
+
+        # the schema & queries are mariadb's (e.g. RETURNING); mysql would
+        # fail on them one request at a time, so fail here instead
+        version = await self.fetch_val("SELECT VERSION()", primary=True)
+        if "mariadb" not in str(version).lower():
+            await self.disconnect()
+            raise RuntimeError(f"MariaDB is required, the database is {version}")
+
+        if self.replicas:
+            self._health_check_task = asyncio.create_task(self._check_replicas())
 
     async def disconnect(self) -> None:
-        await self.read_pool.disconnect()
-        await self.write_pool.disconnect()
+        if self._health_check_task is not None:
+            self._health_check_task.cancel()
+            self._health_check_task = None
+
+        for pool in self._pools():
+            await pool.disconnect()
 
-    async def fetch_one(self, query: str, values: dict | None = None) -> Mapping[str, Any] | None:
-        async with self.read_pool.connection() as connection:
-            return await connection.fetch_one(query, values)  # type: ignore
+    async def fetch_one(self, query: str, values: dict | None = None,
+                        primary: bool = False) -> Mapping[str, Any] | None:
+        async def query_fn(connection: Connection) -> Mapping[str, Any] | None:
+            with _translate_errors():
+                return await connection.fetch_one(query, values)  # type: ignore
 
-    async def fetch_all(self, query: str, values: dict | None = None) -> list[Mapping[str, Any]]:
-        async with self.read_pool.connection() as connection:
-            return await connection.fetch_all(query, values)  # type: ignore
+        return await self._read(query, values, primary, query_fn)
 
-    async def fetch_val(self, query: str, values: dict | None = None) -> Any:
-        async with self.read_pool.connection() as connection:
+    async def fetch_all(self, query: str, values: dict | None = None,
+                        primary: bool = False) -> list[Mapping[str, Any]]:
+        async def query_fn(connection: Connection) -> list[Mapping[str, Any]]:
+            # e.g. a multi-row INSERT ... RETURNING
+            with _translate_errors():
+                return await connection.fetch_all(query, values)  # type: ignore
+
+        return await self._read(query, values, primary, query_fn)
+
+    async def fetch_val(self, query: str, values: dict | None = None,
+                        primary: bool = False) -> Any:
+        async def query_fn(connection: Connection) -> Any:
             return await connection.fetch_val(query, values)  # type: ignore
 
+        return await self._read(query, values, primary, query_fn)
+
+    async def iterate(self, query: str, values: dict | None = None,
+                      primary: bool = False) -> AsyncIterator[Mapping[str, Any]]:
+        """Stream a query's rows, off a connection of the stream pools.
+
+        In a transaction, rows are read off its connection instead; on a
+        `databases` one, they're then buffered whole before the first.
+        """
+        # rows may already have been yielded, so a failing replica can't be
+        # retried on the primary here; it only counts against the replica
+        connection = self._transaction.get()
+        replica = None
+        if connection is None and not (primary or self._reads_pinned()):
+            replica = self._pick_replica()
+
+        if replica is None:
+            async with (connection or self._checkout_write_stream()) as connection:
+                async for row in connection.iterate(query, values):  # type: ignore
+                    yield row
+            return
+
+        replica.outstanding += 1
+        try:
+            async with replica.checkout_stream() as connection:
+                async for row in connection.iterate(query, values):  # type: ignore
+                    yield row
+        except Exception as exc:
+            if _is_unavailable(exc):
+                replica.record_failure(self.replica_max_failures,
+                                       self.replica_eject_seconds)
+            raise
+        else:
+            replica.record_success()
+        finally:
+            replica.outstanding -= 1
+
     async def execute(self, query: str, values: dict | None = None) -> Any:
-        async with self.write_pool.connection() as connection:
-            return await connection.execute(query, values)  # type: ignore
+        async with self._write_connection() as connection:
+            with self._timed(query, values), _translate_errors():
+                result = await connection.execute(query, values)  # type: ignore
+
+        if self._transaction.get() is None:
+            self._wrote()
+        return result
 
     async def execute_many(self, query: str, values: list) -> None:
-        async with self.write_pool.connection() as connection:
-            return await connection.execute_many(query, values)
+        async with self._write_connection() as connection:
+            with self._timed(query, values), _translate_errors():
+                await connection.execute_many(query, values)
+
+        if self._transaction.get() is None:
+            self._wrote()
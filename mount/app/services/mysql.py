@@ -0,0 +1,254 @@
+"""A mysql pool on aiomysql directly, for when the `databases` layer's
+per-query sqlalchemy compilation & row wrapping are too costly.
+
+Pools & connections quack like `databases.Database` & its connections,
+but only as far as `ServiceDatabase` uses them.
+"""
+from __future__ import annotations
+
+import asyncio
+import re
+import ssl
+import uuid
+from types import TracebackType
+from typing import Any
+from typing import AsyncIterator
+from typing import Mapping
+from typing import NamedTuple
+from typing import Type
+from urllib.parse import unquote
+from urllib.parse import urlsplit
+
+import aiomysql
+from app.common.lru import cache_by_query
+
+# e.g. READ_DB_DRIVER=mysql+native; the part before the + is the database
+# for everything else, such as migrations
+DRIVER = "mysql+native"
+
+# as sqlalchemy's text(); a :name that isn't part of a :: or \: escape
+_BIND_PARAM_RE = re.compile(r"(?<![:\w\\]):(\w+)(?!:)")
+
+ITERATE_BATCH_SIZE = 500
+
+
+class CompiledQuery(NamedTuple):
+    sql: str
+    params: tuple[str, ...]
+
+
+@cache_by_query
+def compile_query(query: str) -> CompiledQuery:
+    """Converts a query with :name params to the driver's %(name)s style."""
+    params: dict[str, None] = {}
+
+    def replace(match: re.Match) -> str:
+        params[match.group(1)] = None
+        return f"%({match.group(1)})s"
+
+    # the driver formats the query with %, so literal %s must be doubled
+    sql = _BIND_PARAM_RE.sub(replace, query.replace("%", "%%"))
+    return CompiledQuery(sql.replace("\\:", ":"), tuple(params))
+
+
+def _bind(query: str, values: Mapping[str, Any] | None) -> tuple[str, dict[str, Any]]:
+    compiled = compile_query(query)
+    values = values or {}
+    try:
+        args = {param: values[param] for param in compiled.params}
+    except KeyError as exc:
+        raise ValueError(f"Missing value for query param {exc}") from None
+    return compiled.sql, args
+
+
+def _rows(cursor: aiomysql.Cursor, rows: Any) -> list[dict[str, Any]]:
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in rows]
+
+
+async def iterate(raw: aiomysql.Connection, query: str,
+                  values: Mapping[str, Any] | None = None) -> AsyncIterator[dict[str, Any]]:
+    """Stream a query's rows off a raw connection with an unbuffered cursor;
+    rows are read from the server as they're consumed, so memory use doesn't
+    grow with the result. The connection can't run anything else until the
+    iteration is done (or closed, which drains the rest)."""
+    sql, args = _bind(query, values)
+    async with raw.cursor(aiomysql.SSCursor) as cursor:
+        await cursor.execute(sql, args)
+        columns = [column[0] for column in cursor.description]
+        while True:
+            rows = await cursor.fetchmany(ITERATE_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(columns, row))
+
+
+class Pool:
+    def __init__(self, dsn: str, min_size: int, max_size: int,
+                 ssl: bool) -> None:
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.ssl = ssl
+        self.raw: aiomysql.Pool | None = None
+
+    async def connect(self) -> None:
+        url = urlsplit(self.dsn)
+        self.raw = await aiomysql.create_pool(
+            host=url.hostname,
+            port=url.port or 3306,
+            user=unquote(url.username or ""),
+            password=unquote(url.password or ""),
+            db=url.path.lstrip("/"),
+            minsize=self.min_size,
+            maxsize=self.max_size,
+            ssl=ssl.create_default_context() if self.ssl else None,
+            # as databases; transactions are begun explicitly
+            autocommit=True,
+        )
+
+    async def disconnect(self) -> None:
+        assert self.raw is not None, "Pool is not connected"
+        self.raw.close()
+        await self.raw.wait_closed()
+        self.raw = None
+
+    def connection(self) -> Connection:
+        return Connection(self)
+
+
+class Connection:
+    """Holds a pool connection while entered; re-entrant, so a transaction
+    can keep its connection across the queries made in it."""
+
+    def __init__(self, pool: Pool) -> None:
+        self.pool = pool
+        self.raw: aiomysql.Connection | None = None
+        self._depth = 0
+        # queries on one connection must not interleave
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self) -> Connection:
+        if self._depth == 0:
+            assert self.pool.raw is not None, "Pool is not connected"
+            self.raw = await self.pool.raw.acquire()
+        self._depth += 1
+        return self
+
+    async def __aexit__(self, exc_type: Type[BaseException] | None,
+                        exc_value: BaseException | None,
+                        traceback: TracebackType | None) -> None:
+        self._depth -= 1
+        if self._depth:
+            return
+
+        assert self.pool.raw is not None and self.raw is not None
+        raw, self.raw = self.raw, None
+        if exc_type is not None and issubclass(exc_type, (asyncio.CancelledError,
+                                                          asyncio.TimeoutError)):
+            # interrupted mid-query; the rest of its result is still unread
+            raw.close()
+        self.pool.raw.release(raw)
+
+    def _cursor(self, cursor_class: type = aiomysql.Cursor) -> Any:
+        assert self.raw is not None, "Connection is not acquired"
+        return self.raw.cursor(cursor_class)
+
+    async def fetch_one(self, query: str, values: Mapping[str, Any] | None = None) -> dict[str, Any] | None:
+        sql, args = _bind(query, values)
+        async with self._lock, self._cursor() as cursor:
+            await cursor.execute(sql, args)
+            row = await cursor.fetchone()
+            if row is None:
+                return None
+            return _rows(cursor, [row])[0]
+
+    async def fetch_all(self, query: str, values: Mapping[str, Any] | None = None) -> list[dict[str, Any]]:
+        sql, args = _bind(query, values)
+        async with self._lock, self._cursor() as cursor:
+            await cursor.execute(sql, args)
+            return _rows(cursor, await cursor.fetchall())
+
+    async def fetch_val(self, query: str, values: Mapping[str, Any] | None = None) -> Any:
+        sql, args = _bind(query, values)
+        async with self._lock, self._cursor() as cursor:
+            await cursor.execute(sql, args)
+            row = await cursor.fetchone()
+            return None if row is None else row[0]
+
+    async def iterate(self, query: str, values: Mapping[str, Any] | None = None) -> AsyncIterator[dict[str, Any]]:
+        assert self.raw is not None, "Connection is not acquired"
+        async with self._lock:
+            async for row in iterate(self.raw, query, values):
+                yield row
+
+    async def execute(self, query: str, values: Mapping[str, Any] | None = None) -> Any:
+        sql, args = _bind(query, values)
+        async with self._lock, self._cursor() as cursor:
+            await cursor.execute(sql, args)
+            # as databases
+            if cursor.lastrowid == 0:
+                return cursor.rowcount
+            return cursor.lastrowid
+
+    async def execute_many(self, query: str, values: list[Mapping[str, Any]]) -> None:
+        if not values:
+            return
+
+        compiled = compile_query(query)
+        args = [{param: row[param] for param in compiled.params}
+                for row in values]
+        async with self._lock, self._cursor() as cursor:
+            # batches INSERT ... VALUES rows into multi-row statements
+            await cursor.executemany(compiled.sql, args)
+
+    def transaction(self) -> Transaction:
+        return Transaction(self)
+
+
+class Transaction:
+    """A transaction on the connection, or a savepoint if it's already in
+    one; committed if the block succeeds, rolled back otherwise."""
+
+    def __init__(self, connection: Connection) -> None:
+        self.connection = connection
+        self._savepoint: str | None = None
+
+    async def _execute(self, statement: str) -> None:
+        async with self.connection._lock, self.connection._cursor() as cursor:
+            await cursor.execute(statement)
+
+    async def __aenter__(self) -> Transaction:
+        await self.connection.__aenter__()
+        raw = self.connection.raw
+        assert raw is not None
+
+        try:
+            if raw.get_transaction_status():
+                self._savepoint = f"SAVEPOINT_{uuid.uuid4().hex}"
+                await self._execute(f"SAVEPOINT {self._savepoint}")
+            else:
+                await raw.begin()
+        except BaseException as exc:
+            await self.connection.__aexit__(type(exc), exc, exc.__traceback__)
+            raise
+        return self
+
+    async def __aexit__(self, exc_type: Type[BaseException] | None,
+                        exc_value: BaseException | None,
+                        traceback: TracebackType | None) -> None:
+        raw = self.connection.raw
+        assert raw is not None
+        try:
+            if self._savepoint is not None:
+                if exc_type is None:
+                    await self._execute(f"RELEASE SAVEPOINT {self._savepoint}")
+                else:
+                    await self._execute(f"ROLLBACK TO SAVEPOINT {self._savepoint}")
+            elif exc_type is None:
+                await raw.commit()
+            else:
+                await raw.rollback()
+        finally:
+            await self.connection.__aexit__(exc_type, exc_value, traceback)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import functools
+import os
+import re
+import sys
+from dataclasses import dataclass
+
+from app.common.lru import cache_by_query
+from shared_modules import logger
+
+_PARAM_RE = re.compile(r":\w+")
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST_RE = re.compile(r"\bVALUES\s*(\([\s?,]*\))(?:\s*,\s*\([\s?,]*\))*",
+                             re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# frames in these files are the database layer itself, never a call site
+_SKIPPED_FILES = (
+    os.path.abspath(__file__).rsplit(os.sep, 1)[0],  # app/services
+    os.path.dirname(os.path.abspath(functools.__file__)),  # the stdlib
+)
+
+
+@cache_by_query
+def fingerprint(query: str) -> str:
+    """Normalize a query so every call to it, whatever its parameters,
+    maps to the same text: values become `?`, IN lists collapse & so do
+    the rows of multi-row INSERTs."""
+    query = _PARAM_RE.sub("?", query)
+    query = _STRING_RE.sub("?", query)
+    query = _NUMBER_RE.sub("?", query)
+    query = _IN_LIST_RE.sub("IN (...)", query)
+    query = _VALUES_LIST_RE.sub(r"VALUES \1, ...", query)
+    return _WHITESPACE_RE.sub(" ", query).strip()
+
+
+def _redact(values: dict | None) -> dict[str, str]:
+    # parameter values may be user data; log only their types
+    return {k: type(v).__name__ for k, v in (values or {}).items()}
+
+
+def _call_site() -> str:
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if not filename.startswith(_SKIPPED_FILES):
+            return f"{filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back  # type: ignore
+    return "unknown"
+
+
+@dataclass
+class QueryAggregate:
+    fingerprint: str
+    calls: int = 0
+    slow_calls: int = 0
+    total_time: float = 0
+    max_time: float = 0
+
+
+class QueryStatsRecorder:
+    """Per-fingerprint aggregates of query timings, for this process.
+
+    Queries slower than `slow_query_threshold` seconds are also logged.
+    """
+
+    # an unbounded set of fingerprints would be a bug (e.g. values pasted into
+    # the sql), but shouldn't become a memory leak as well
+    MAX_FINGERPRINTS = 1000
+
+    def __init__(self, slow_query_threshold: float) -> None:
+        self.slow_query_threshold = slow_query_threshold
+        self._aggregates: dict[str, QueryAggregate] = {}
+
+    def record(self, query: str, values: dict | None, elapsed: float) -> None:
+        key = fingerprint(query)
+        aggregate = self._aggregates.get(key)
+        if aggregate is None and len(self._aggregates) < self.MAX_FINGERPRINTS:
+            aggregate = self._aggregates[key] = QueryAggregate(key)
+
+        slow = elapsed >= self.slow_query_threshold
+        if aggregate is not None:
+            aggregate.calls += 1
+            aggregate.slow_calls += slow
+            aggregate.total_time += elapsed
+            aggregate.max_time = max(aggregate.max_time, elapsed)
+
+        # past the cap a query goes unaggregated, but never unlogged
+        if slow:
+            logger.warning(f"Slow query ({elapsed * 1000:.1f}ms) "
+                           f"from {_call_site()}: {key} "
+                           f"params={_redact(values)}")
+
+    def snapshot(self) -> list[QueryAggregate]:
+        """Aggregates, most total time first."""
+        return sorted(self._aggregates.values(),
+                      key=lambda aggregate: aggregate.total_time,
+                      reverse=True)
+
+    def reset(self) -> None:
+        self._aggregates.clear()
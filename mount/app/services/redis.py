@@ -1,5 +1,67 @@
+import asyncio
+from typing import Any
+from typing import Callable
+
 from aioredis import StrictRedis
+from aioredis.client import Pipeline
+from app.common import metrics
+from shared_modules import logger
+
+# carries the keys of entries that in-process caches should evict
+INVALIDATION_CHANNEL = "invalidations"
+
+
+class ServicePipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True) -> list[Any]:
+        with metrics.REDIS_COMMAND_LATENCY.labels(command="PIPELINE").time():
+            return await super().execute(raise_on_error)
 
 
 class ServiceRedis(StrictRedis):
-    ...
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        with metrics.REDIS_COMMAND_LATENCY.labels(command=args[0]).time():
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True,
+                 shard_hint: str | None = None) -> ServicePipeline:
+        return ServicePipeline(self.connection_pool, self.response_callbacks,
+                               transaction, shard_hint)
+
+    async def publish_invalidation(self, key: str) -> None:
+        await self.publish(INVALIDATION_CHANNEL, key)
+
+    async def publish_invalidations(self, keys: list[str]) -> None:
+        if len(keys) == 1:
+            await self.publish_invalidation(keys[0])
+            return
+
+        pipe = self.pipeline(transaction=False)
+        for key in keys:
+            pipe.publish(INVALIDATION_CHANNEL, key)
+        await pipe.execute()
+
+    async def listen_for_invalidations(self,
+                                       on_invalidate: Callable[[str], None],
+                                       on_subscribe: Callable[[], None],
+                                       retry_interval: float = 1) -> None:
+        """Call on_invalidate with each invalidated key, until cancelled.
+
+        Messages sent while unsubscribed are lost, so on_subscribe is called
+        on each (re)subscription; it should drop everything cached.
+        """
+        while True:
+            pubsub = self.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                on_subscribe()
+
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        on_invalidate(message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning(f"Lost invalidations subscription: {exc!r}")
+                await asyncio.sleep(retry_interval)
+            finally:
+                await pubsub.close()
@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Mapping
+
+import orjson
+from app.common.context import Context
+from app.models.clan_events import ClanEventType
+from app.repositories.clan_events import ClanEventsRepo
+from app.services.broker import Message
+from app.services.broker import ServiceBroker
+from shared_modules import logger
+
+EVENT_FIELDS = (
+    "clan_id", "name", "tag", "description",
+    "owner", "join_method", "status",
+    "created_at", "updated_at",
+)
+
+# set when this process commits an event, so the publisher needn't wait out
+# its poll interval; events committed by other processes are found by polling
+_pending = asyncio.Event()
+
+
+async def _notify() -> None:
+    _pending.set()
+
+
+async def record(ctx: Context, event_type: ClanEventType,
+                 clan: Mapping[str, Any]) -> None:
+    """Add an event to the outbox; call this inside the transaction making
+    the change, so the event is published if and only if it commits."""
+    repo = ClanEventsRepo(ctx)
+
+    payload = _payload(event_type, datetime.utcnow(), clan)
+    await repo.create(clan["clan_id"], event_type, payload)
+    await ctx.db.after_commit(_notify)
+
+
+async def record_many(ctx: Context, event_type: ClanEventType,
+                      clans: list[Mapping[str, Any]]) -> None:
+    """record() for a batch of clans, in one statement."""
+    repo = ClanEventsRepo(ctx)
+    if not clans:
+        return
+
+    occurred_at = datetime.utcnow()
+    await repo.create_many([(clan["clan_id"], event_type,
+                             _payload(event_type, occurred_at, clan))
+                            for clan in clans])
+    await ctx.db.after_commit(_notify)
+
+
+def _payload(event_type: ClanEventType, occurred_at: datetime,
+             clan: Mapping[str, Any]) -> str:
+    return orjson.dumps({
+        "event_type": event_type,
+        "occurred_at": occurred_at,
+        "clan": {k: clan[k] for k in EVENT_FIELDS},
+    }).decode()
+
+
+async def publish_pending(ctx: Context, broker: ServiceBroker, limit: int,
+                          timeout: float) -> int:
+    """Publish & delete up to `limit` of the oldest events; returns how many.
+
+    Events are claimed in a short transaction, and published after it's
+    committed; holding its locks while waiting on the broker would stall
+    every change to a clan, as none can add its event to the outbox.
+
+    Claims last twice the publish `timeout`, then lapse, so events whose
+    publisher died are published by another; they're published at least
+    once, and in order unless several publishers run.
+    """
+    repo = ClanEventsRepo(ctx)
+
+    async with ctx.db.transaction():
+        events = await repo.claim_pending(limit, lease=timeout * 2)
+    if not events:
+        return 0
+
+    event_ids = [event["event_id"] for event in events]
+    try:
+        await asyncio.wait_for(broker.publish_many([
+            Message(routing_key=f"clans.{event['event_type']}",
+                    body=event["payload"].encode(),
+                    message_id=str(event["event_id"]))
+            for event in events
+        ]), timeout)
+    except Exception:
+        # retried in order on the next attempt, not once the claims lapse
+        await repo.release_many(event_ids)
+        raise
+
+    await repo.delete_many(event_ids)
+    return len(events)
+
+
+async def run_publisher(ctx: Context, broker: ServiceBroker,
+                        batch_size: int, poll_interval: float,
+                        max_backoff: float, publish_timeout: float) -> None:
+    """Drain the outbox until cancelled.
+
+    Batches are published one at a time, so a slow broker slows the drain
+    rather than piling up unconfirmed messages; failures back off
+    exponentially, leaving the events in the outbox to be retried.
+    """
+    backoff = poll_interval
+    while True:
+        _pending.clear()
+        try:
+            published = await publish_pending(ctx, broker, batch_size,
+                                              publish_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.error(f"Failed to publish clan events: {exc!r}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+            continue
+
+        backoff = poll_interval
+        if published == batch_size:
+            continue  # more are likely waiting
+
+        try:
+            await asyncio.wait_for(_pending.wait(), poll_interval)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,131 @@
+from typing import Any, Mapping
+
+from app.common.context import Context
+from app.common.errors import ServiceError
+from app.models.clans import JoinMethod
+from app.repositories.clan_members import ClanMembersRepo
+from app.repositories.clans import ClansRepo
+from app.services.database import UniqueViolationError
+from app.usecases import clan_stats
+
+CONSTRAINT_ERRORS = {
+    "PRIMARY": ServiceError.CLANS_ALREADY_IN_CLAN,
+    "clan_members_user_id_uindex": ServiceError.CLANS_ALREADY_IN_CLAN,
+}
+
+
+async def join(ctx: Context, clan_id: int, user_id: int) -> Mapping[str, Any] | ServiceError:
+    clans_repo = ClansRepo(ctx)
+    members_repo = ClanMembersRepo(ctx)
+
+    # NOTE: always lock the clan before its members, so joins, leaves &
+    # disbands of the same clan serialize without deadlocking
+    try:
+        async with ctx.db.transaction():
+            clan = await clans_repo.fetch_one(clan_id=clan_id, for_update=True)
+            if not clan:
+                return ServiceError.CLANS_NOT_FOUND
+
+            # requests & invites are approved upstream; only closed clans refuse here
+            if clan["join_method"] == JoinMethod.CLOSED:
+                return ServiceError.CLAN_MEMBERS_CLAN_CLOSED
+
+            if await members_repo.fetch_one(user_id=user_id):
+                return ServiceError.CLANS_ALREADY_IN_CLAN
+
+            member = await members_repo.create(clan_id, user_id)
+            await clan_stats.apply_delta(ctx, clan_id, member_count=1)
+    except UniqueViolationError as exc:
+        if exc.constraint not in CONSTRAINT_ERRORS:
+            raise
+        return CONSTRAINT_ERRORS[exc.constraint]
+
+    return member
+
+
+async def leave(ctx: Context, clan_id: int, user_id: int) -> Mapping[str, Any] | ServiceError:
+    clans_repo = ClansRepo(ctx)
+    members_repo = ClanMembersRepo(ctx)
+
+    async with ctx.db.transaction():
+        clan = await clans_repo.fetch_one(clan_id=clan_id, for_update=True)
+        if clan and clan["owner"] == user_id:
+            return ServiceError.CLAN_MEMBERS_OWNER_CANNOT_LEAVE
+
+        member = await members_repo.fetch_one(clan_id=clan_id, user_id=user_id,
+                                              for_update=True)
+        if not member:
+            return ServiceError.CLAN_MEMBERS_NOT_FOUND
+
+        await members_repo.delete(clan_id, user_id)
+        await clan_stats.apply_delta(ctx, clan_id,
+                                     member_count=-1,
+                                     total_pp=-member["pp"],
+                                     ranked_score=-member["ranked_score"])
+
+    return member
+
+
+async def kick(ctx: Context, clan_id: int, user_id: int,
+               kicked_by: int) -> Mapping[str, Any] | ServiceError:
+    clans_repo = ClansRepo(ctx)
+    members_repo = ClanMembersRepo(ctx)
+
+    async with ctx.db.transaction():
+        clan = await clans_repo.fetch_one(clan_id=clan_id, for_update=True)
+        if not clan:
+            return ServiceError.CLANS_NOT_FOUND
+
+        if clan["owner"] != kicked_by:
+            return ServiceError.CLAN_MEMBERS_NOT_OWNER
+
+        if clan["owner"] == user_id:
+            return ServiceError.CLAN_MEMBERS_OWNER_CANNOT_LEAVE
+
+        member = await members_repo.fetch_one(clan_id=clan_id, user_id=user_id,
+                                              for_update=True)
+        if not member:
+            return ServiceError.CLAN_MEMBERS_NOT_FOUND
+
+        await members_repo.delete(clan_id, user_id)
+        await clan_stats.apply_delta(ctx, clan_id,
+                                     member_count=-1,
+                                     total_pp=-member["pp"],
+                                     ranked_score=-member["ranked_score"])
+
+    return member
+
+
+async def fetch_all(ctx: Context, clan_id: int,
+                    after: int | None = None,
+                    limit: int | None = None) -> list[Mapping[str, Any]] | ServiceError:
+    clans_repo = ClansRepo(ctx)
+    members_repo = ClanMembersRepo(ctx)
+
+    clan = await clans_repo.fetch_one(clan_id=clan_id)
+    if not clan:
+        return ServiceError.CLANS_NOT_FOUND
+
+    members = await members_repo.fetch_all(clan_id, after=after, limit=limit)
+    return members
+
+
+async def fetch_user_clan(ctx: Context, user_id: int) -> Mapping[str, Any] | ServiceError:
+    clans_repo = ClansRepo(ctx)
+    members_repo = ClanMembersRepo(ctx)
+
+    member = await members_repo.fetch_one(user_id=user_id)
+    if not member:
+        return ServiceError.CLAN_MEMBERS_NOT_FOUND
+
+    clan = await clans_repo.fetch_one(clan_id=member["clan_id"])
+    if not clan:
+        return ServiceError.CLANS_NOT_FOUND
+
+    return clan
+
+
+async def fetch_many(ctx: Context, user_ids: list[int]) -> list[Mapping[str, Any] | None]:
+    members_repo = ClanMembersRepo(ctx)
+    members = await members_repo.fetch_many(user_ids)
+    return members
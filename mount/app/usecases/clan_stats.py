@@ -0,0 +1,141 @@
+from typing import Any, Mapping
+
+from app.common.context import Context
+from app.common.errors import ServiceError
+from app.models import Status
+from app.models.clan_stats import LeaderboardSort
+from app.repositories.clan_leaderboards import ClanLeaderboardsRepo
+from app.repositories.clan_members import ClanMembersRepo
+from app.repositories.clan_stats import ClanStatsRepo
+from app.repositories.clans import ClansRepo
+
+REBUILD_BATCH_SIZE = 1000
+
+
+async def initialize(ctx: Context, clan_id: int, member_count: int = 0) -> Mapping[str, Any]:
+    repo = ClanStatsRepo(ctx)
+    leaderboards = ClanLeaderboardsRepo(ctx)
+
+    stats = await repo.create(clan_id, member_count)
+    await ctx.db.after_commit(lambda: leaderboards.update(stats))
+    return stats
+
+
+async def initialize_many(ctx: Context, clan_ids: list[int],
+                          member_count: int = 0) -> list[Mapping[str, Any]]:
+    repo = ClanStatsRepo(ctx)
+    leaderboards = ClanLeaderboardsRepo(ctx)
+
+    stats = await repo.create_many(clan_ids, member_count)
+    await ctx.db.after_commit(lambda: leaderboards.update_many(stats))
+    return stats
+
+
+async def apply_delta(ctx: Context, clan_id: int,
+                      member_count: int = 0,
+                      total_pp: float = 0,
+                      ranked_score: int = 0) -> Mapping[str, Any] | None:
+    repo = ClanStatsRepo(ctx)
+    leaderboards = ClanLeaderboardsRepo(ctx)
+
+    if not (member_count or total_pp or ranked_score):
+        return await repo.fetch_one(clan_id)
+
+    stats = await repo.apply_delta(clan_id, member_count, total_pp, ranked_score)
+    # deactivated clans keep their stats, but aren't ranked; the clan's
+    # status is read by the update itself, in this transaction
+    if stats is not None and stats["ranked"]:
+        await ctx.db.after_commit(lambda: leaderboards.update(stats))  # type: ignore
+    return stats
+
+
+async def remove(ctx: Context, clan_id: int) -> None:
+    repo = ClanStatsRepo(ctx)
+    leaderboards = ClanLeaderboardsRepo(ctx)
+
+    await repo.delete(clan_id)
+    await ctx.db.after_commit(lambda: leaderboards.remove(clan_id))
+
+
+async def remove_many(ctx: Context, clan_ids: list[int]) -> None:
+    repo = ClanStatsRepo(ctx)
+    leaderboards = ClanLeaderboardsRepo(ctx)
+
+    await repo.delete_many(clan_ids)
+    await ctx.db.after_commit(lambda: leaderboards.remove_many(clan_ids))
+
+
+async def unrank_many(ctx: Context, clan_ids: list[int]) -> None:
+    """Take clans off the leaderboards, keeping their stats; e.g. as
+    they're deactivated."""
+    leaderboards = ClanLeaderboardsRepo(ctx)
+
+    await ctx.db.after_commit(lambda: leaderboards.remove_many(clan_ids))
+
+
+async def update_member_stats(ctx: Context, user_id: int, pp: float,
+                              ranked_score: int) -> Mapping[str, Any] | ServiceError:
+    members_repo = ClanMembersRepo(ctx)
+
+    # the member row lock serializes concurrent events for the same user,
+    # so each delta is taken against the stats it actually replaces
+    async with ctx.db.transaction():
+        member = await members_repo.fetch_one(user_id=user_id, for_update=True)
+        if not member:
+            return ServiceError.CLAN_MEMBERS_NOT_FOUND
+
+        await members_repo.update_stats(user_id, pp, ranked_score)
+
+        stats = await apply_delta(ctx, member["clan_id"],
+                                  total_pp=pp - member["pp"],
+                                  ranked_score=ranked_score - member["ranked_score"])
+        if stats is None:
+            return ServiceError.CLANS_NOT_FOUND
+
+    return stats
+
+
+async def fetch_one(ctx: Context, clan_id: int) -> Mapping[str, Any] | ServiceError:
+    repo = ClanStatsRepo(ctx)
+    stats = await repo.fetch_one(clan_id)
+    if not stats:
+        return ServiceError.CLANS_NOT_FOUND
+
+    return stats
+
+
+async def fetch_leaderboard(ctx: Context, sort: LeaderboardSort,
+                            offset: int, limit: int) -> list[Mapping[str, Any]]:
+    clans_repo = ClansRepo(ctx)
+    leaderboards = ClanLeaderboardsRepo(ctx)
+
+    entries = await leaderboards.fetch_page(sort, offset, limit)
+
+    # names & tags come from the clan cache; no scan of the clans table
+    clans = await clans_repo.fetch_many([entry["clan_id"] for entry in entries])
+
+    leaderboard = []
+    for entry, clan in zip(entries, clans):
+        if clan is None:
+            continue
+        leaderboard.append(entry | {"name": clan["name"], "tag": clan["tag"]})
+    return leaderboard
+
+
+async def rebuild_leaderboards(ctx: Context) -> int:
+    repo = ClanStatsRepo(ctx)
+    leaderboards = ClanLeaderboardsRepo(ctx)
+
+    count = 0
+    after = None
+    while True:
+        batch = await repo.fetch_all(after=after, limit=REBUILD_BATCH_SIZE,
+                                     status=Status.ACTIVE)
+        if not batch:
+            break
+
+        await leaderboards.update_many(batch)
+
+        count += len(batch)
+        after = batch[-1]["clan_id"]
+    return count
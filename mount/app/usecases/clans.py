@@ -1,9 +1,40 @@
-from typing import Any, Mapping
+import hashlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Mapping
 
 from app.common.context import Context
 from app.common.errors import ServiceError
+from app.common.normalization import normalize
+from app.common.versions import Version
+from app.models import Status
+from app.models.clan_events import ClanEventType
 from app.models.clans import JoinMethod
+from app.repositories.clan_members import ClanMembersRepo
 from app.repositories.clans import ClansRepo
+from app.services.database import UniqueViolationError
+from app.usecases import clan_events
+from app.usecases import clan_stats
+
+# the order here decides which error wins when several fields conflict
+CONFLICT_ERRORS = {
+    "owner": ServiceError.CLANS_ALREADY_IN_CLAN,
+    "name": ServiceError.CLANS_NAME_EXISTS,
+    "tag": ServiceError.CLANS_TAG_EXISTS,
+}
+
+CONSTRAINT_ERRORS = {
+    "clans_active_owner_uindex": ServiceError.CLANS_ALREADY_IN_CLAN,
+    "clans_active_name_uindex": ServiceError.CLANS_NAME_EXISTS,
+    "clans_active_tag_uindex": ServiceError.CLANS_TAG_EXISTS,
+    "clan_members_user_id_uindex": ServiceError.CLANS_ALREADY_IN_CLAN,
+}
+
+
+def _conflict_error(conflicts: set[str]) -> ServiceError | None:
+    for field, error in CONFLICT_ERRORS.items():
+        if field in conflicts:
+            return error
+    return None
 
 
 async def create(ctx: Context,
@@ -13,20 +44,92 @@ async def create(ctx: Context,
                  owner: int,
                  join_method: JoinMethod) -> Mapping[str, Any] | ServiceError:
     repo = ClansRepo(ctx)
+    members_repo = ClanMembersRepo(ctx)
 
-    if await repo.fetch_one(owner=owner):
-        return ServiceError.CLANS_ALREADY_IN_CLAN
+    # the unique indexes catch anything that races past the checks below;
+    # raising out of the transaction rolls back anything already written
+    try:
+        async with ctx.db.transaction():
+            conflicts = await repo.fetch_conflicts(name=name, tag=tag, owner=owner)
+            error = _conflict_error(conflicts)
+            if error is not None:
+                return error
 
-    if await repo.fetch_one(name=name):
-        return ServiceError.CLANS_NAME_EXISTS
+            if await members_repo.fetch_one(user_id=owner):
+                return ServiceError.CLANS_ALREADY_IN_CLAN
 
-    if await repo.fetch_one(tag=tag):
-        return ServiceError.CLANS_TAG_EXISTS
+            clan = await repo.create(name, tag, description, owner, join_method)
+            await members_repo.create(clan["clan_id"], owner)
+            await clan_stats.initialize(ctx, clan["clan_id"], member_count=1)
+            await clan_events.record(ctx, ClanEventType.CREATED, clan)
+    except UniqueViolationError as exc:
+        if exc.constraint not in CONSTRAINT_ERRORS:
+            raise
+        return CONSTRAINT_ERRORS[exc.constraint]
 
-    clan = await repo.create(name, tag, description, owner, join_method)
     return clan
 
 
+async def bulk_create(ctx: Context,
+                      rows: list[Mapping[str, Any]]) -> list[Mapping[str, Any] | ServiceError]:
+    """Create many clans as create() would, in one transaction.
+
+    Each row gets the clan created from it, or the error create() would
+    have returned for it; a row conflicting with an earlier one in the
+    batch gets the same error as if that one already existed.
+    """
+    repo = ClansRepo(ctx)
+    members_repo = ClanMembersRepo(ctx)
+
+    results: list[Mapping[str, Any] | ServiceError] = [ServiceError.CLANS_CANNOT_CREATE] * len(rows)
+    try:
+        async with ctx.db.transaction():
+            # every row's uniqueness checked at once, rather than row by row
+            taken = await repo.fetch_taken(names=[row["name"] for row in rows],
+                                           tags=[row["tag"] for row in rows],
+                                           owners=[row["owner"] for row in rows])
+            members = await members_repo.fetch_many([row["owner"] for row in rows])
+            taken["owner"].update(member["user_id"] for member in members
+                                  if member is not None)
+
+            valid = []
+            for idx, row in enumerate(rows):
+                keys = {
+                    "owner": row["owner"],
+                    "name": normalize(row["name"]),
+                    "tag": normalize(row["tag"]),
+                }
+                conflicts = {k for k, v in keys.items() if v in taken[k]}
+                error = _conflict_error(conflicts)
+                if error is not None:
+                    results[idx] = error
+                    continue
+
+                for k, v in keys.items():
+                    taken[k].add(v)
+                valid.append(idx)
+
+            created = await repo.create_many([rows[idx] for idx in valid])
+            clan_ids = [clan["clan_id"] for clan in created]
+            await members_repo.create_many([(clan["clan_id"], clan["owner"])
+                                            for clan in created])
+            await clan_stats.initialize_many(ctx, clan_ids, member_count=1)
+            await clan_events.record_many(ctx, ClanEventType.CREATED, created)
+    except UniqueViolationError as exc:
+        if exc.constraint not in CONSTRAINT_ERRORS:
+            raise
+        # raced a concurrent write; one at a time, each row gets its own error
+        return [await create(ctx, row["name"], row["tag"], row["description"],
+                             row["owner"], row["join_method"])
+                for row in rows]
+
+    # tags are unique, so they tell which clan came from which row
+    by_tag = {normalize(clan["tag"]): clan for clan in created}
+    for idx in valid:
+        results[idx] = by_tag[normalize(rows[idx]["tag"])]
+    return results
+
+
 async def fetch_one(ctx: Context, clan_id: int) -> Mapping[str, Any] | ServiceError:
     repo = ClansRepo(ctx)
     clan = await repo.fetch_one(clan_id=clan_id)
@@ -36,43 +139,202 @@ async def fetch_one(ctx: Context, clan_id: int) -> Mapping[str, Any] | ServiceEr
     return clan
 
 
-async def fetch_all(ctx: Context) -> list[Mapping[str, Any]]:
+async def fetch_version(ctx: Context, clan_id: int) -> Version | None:
+    """The version of an active clan, if it can be found without fetching
+    the clan itself."""
+    repo = ClansRepo(ctx)
+    version = await repo.fetch_version(clan_id)
+    return version
+
+
+def version_of(clan: Mapping[str, Any]) -> Version:
+    return ClansRepo.version_of(clan)
+
+
+async def fetch_list_version(ctx: Context, **filters: Any) -> Version | None:
+    """The version of a listing of clans; changes on any write to a clan."""
+    repo = ClansRepo(ctx)
+    version = await repo.fetch_list_version()
+    if version is None:
+        return None
+
+    # the same clans listed with other filters are a different resource
+    key = f"{version.etag}|{sorted(filters.items())}".encode()
+    return Version(hashlib.blake2b(key, digest_size=8).hexdigest(),
+                   version.last_modified)
+
+
+async def fetch_many(ctx: Context, clan_ids: list[int]) -> list[Mapping[str, Any] | None]:
+    repo = ClansRepo(ctx)
+    clans = await repo.fetch_many(clan_ids)
+    return clans
+
+
+async def fetch_all(ctx: Context,
+                    owner: int | None = None,
+                    join_method: JoinMethod | None = None,
+                    status: Status | None = Status.ACTIVE,
+                    after: int | None = None,
+                    limit: int | None = None) -> list[Mapping[str, Any]]:
+    repo = ClansRepo(ctx)
+    clans = await repo.fetch_all(owner=owner,
+                                 join_method=join_method,
+                                 status=status,
+                                 after=after,
+                                 limit=limit)
+    return clans
+
+
+async def fetch_changes(ctx: Context,
+                        since: datetime | None = None,
+                        after_clan_id: int | None = None,
+                        limit: int = 100) -> list[Mapping[str, Any]]:
+    """Clans changed since a point in the change feed, incl. disbanded ones."""
     repo = ClansRepo(ctx)
-    clans = await repo.fetch_all()
+    clans = await repo.fetch_changes(since, after_clan_id, limit)
     return clans
 
 
+async def search(ctx: Context, term: str, offset: int,
+                 limit: int) -> list[Mapping[str, Any]]:
+    repo = ClansRepo(ctx)
+    if not term:
+        return []
+
+    clans = await repo.search(term, offset=offset, limit=limit)
+    return clans
+
+
+async def iterate_all(ctx: Context,
+                      owner: int | None = None,
+                      join_method: JoinMethod | None = None,
+                      status: Status | None = Status.ACTIVE,
+                      after: int | None = None,
+                      limit: int | None = None,
+                      since: datetime | None = None) -> AsyncIterator[Mapping[str, Any]]:
+    repo = ClansRepo(ctx)
+    async for clan in repo.iterate_all(owner=owner,
+                                       join_method=join_method,
+                                       status=status,
+                                       after=after,
+                                       limit=limit,
+                                       since=since):
+        yield clan
+
+
 async def partial_update(ctx: Context,
                          clan_id: int,
                          **kwargs: Any | None) -> Mapping[str, Any] | ServiceError:
     repo = ClansRepo(ctx)
+    members_repo = ClanMembersRepo(ctx)
 
-    clan = await repo.fetch_one(clan_id=clan_id)
-    if not clan:
-        return ServiceError.CLANS_NOT_FOUND
+    try:
+        async with ctx.db.transaction():
+            clan = await repo.fetch_one(clan_id=clan_id, for_update=True)
+            if not clan:
+                return ServiceError.CLANS_NOT_FOUND
 
-    if not kwargs:
-        return clan
+            if not kwargs:
+                return clan
 
-    new_tag = kwargs.get("tag")
-    new_name = kwargs.get("name")
+            conflicts = await repo.fetch_conflicts(name=kwargs.get("name"),
+                                                   tag=kwargs.get("tag"),
+                                                   owner=kwargs.get("owner"),
+                                                   exclude_clan_id=clan_id)
+            error = _conflict_error(conflicts)
+            if error is not None:
+                return error
 
-    if new_tag and await repo.fetch_one(tag=new_tag):
-        return ServiceError.CLANS_TAG_EXISTS
+            old_owner = clan["owner"]
+            new_owner = kwargs.get("owner")
+            if new_owner is not None and new_owner != old_owner:
+                error = await _transfer_ownership(ctx, clan_id, old_owner,
+                                                  new_owner)  # type: ignore
+                if error is not None:
+                    return error
 
-    if new_name and await repo.fetch_one(name=new_name):
-        return ServiceError.CLANS_NAME_EXISTS
+            clan = await repo.partial_update(clan_id, **kwargs)
+            await clan_events.record(ctx, ClanEventType.UPDATED, clan)
+    except UniqueViolationError as exc:
+        if exc.constraint not in CONSTRAINT_ERRORS:
+            raise
+        return CONSTRAINT_ERRORS[exc.constraint]
 
-    clan = await repo.partial_update(clan_id, **kwargs)
     return clan
 
 
+async def _transfer_ownership(ctx: Context, clan_id: int, old_owner: int,
+                              new_owner: int) -> ServiceError | None:
+    """Make the new owner a member (if they aren't one) & the old one leave."""
+    members_repo = ClanMembersRepo(ctx)
+
+    new_owner_member = await members_repo.fetch_one(user_id=new_owner,
+                                                    for_update=True)
+    if new_owner_member and new_owner_member["clan_id"] != clan_id:
+        return ServiceError.CLANS_ALREADY_IN_CLAN
+
+    old_owner_member = await members_repo.fetch_one(clan_id=clan_id,
+                                                    user_id=old_owner,
+                                                    for_update=True)
+
+    if not new_owner_member:
+        await members_repo.create(clan_id, new_owner)
+
+    if old_owner_member:
+        await members_repo.delete(clan_id, old_owner)
+        await clan_stats.apply_delta(ctx, clan_id,
+                                     member_count=-1 if new_owner_member else 0,
+                                     total_pp=-old_owner_member["pp"],
+                                     ranked_score=-old_owner_member["ranked_score"])
+    elif not new_owner_member:
+        await clan_stats.apply_delta(ctx, clan_id, member_count=1)
+
+    return None
+
+
 async def disband(ctx: Context, clan_id: int) -> Mapping[str, Any] | ServiceError:
     repo = ClansRepo(ctx)
+    members_repo = ClanMembersRepo(ctx)
 
-    clan = await repo.fetch_one(clan_id=clan_id)
-    if not clan:
-        return ServiceError.CLANS_NOT_FOUND
+    async with ctx.db.transaction():
+        clan = await repo.fetch_one(clan_id=clan_id, for_update=True)
+        if not clan:
+            return ServiceError.CLANS_NOT_FOUND
+
+        clan = await repo.disband(clan_id)
+        await members_repo.delete_all(clan_id)
+        await clan_stats.remove(ctx, clan_id)
+        await clan_events.record(ctx, ClanEventType.DISBANDED, clan)
 
-    clan = await repo.disband(clan_id)
     return clan
+
+
+async def bulk_disband(ctx: Context, clan_ids: list[int],
+                       deactivate: bool = False) -> list[Mapping[str, Any] | ServiceError]:
+    """Disband many clans as disband() would, in one transaction; or only
+    deactivate them, keeping their members & stats (but unranked).
+
+    Each id gets the clan as it now is, or the error disband() would have
+    returned for it.
+    """
+    repo = ClansRepo(ctx)
+    members_repo = ClanMembersRepo(ctx)
+
+    async with ctx.db.transaction():
+        locked = await repo.lock_many(list(dict.fromkeys(clan_ids)))
+        found_ids = [clan["clan_id"] for clan in locked]
+
+        clans = []
+        if found_ids and deactivate:
+            clans = await repo.disband_many(found_ids, Status.DEACTIVATED)
+            await clan_stats.unrank_many(ctx, found_ids)
+            await clan_events.record_many(ctx, ClanEventType.UPDATED, clans)
+        elif found_ids:
+            clans = await repo.disband_many(found_ids)
+            await members_repo.delete_all_many(found_ids)
+            await clan_stats.remove_many(ctx, found_ids)
+            await clan_events.record_many(ctx, ClanEventType.DISBANDED, clans)
+
+    by_id = {clan["clan_id"]: clan for clan in clans}
+    return [by_id.get(clan_id, ServiceError.CLANS_NOT_FOUND)
+            for clan_id in clan_ids]
@@ -0,0 +1,21 @@
+from typing import Any, Mapping
+
+from app.common.context import Context
+
+
+async def fetch_all(ctx: Context) -> list[Mapping[str, Any]]:
+    return [
+        {
+            "fingerprint": aggregate.fingerprint,
+            "calls": aggregate.calls,
+            "slow_calls": aggregate.slow_calls,
+            "total_ms": aggregate.total_time * 1000,
+            "mean_ms": aggregate.total_time / aggregate.calls * 1000,
+            "max_ms": aggregate.max_time * 1000,
+        }
+        for aggregate in ctx.db.query_stats.snapshot()
+    ]
+
+
+async def reset(ctx: Context) -> None:
+    ctx.db.query_stats.reset()
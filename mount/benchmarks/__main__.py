@@ -0,0 +1,93 @@
+"""Benchmarks for the clans service.
+
+    python -m benchmarks micro [--output report.json]
+    python -m benchmarks seed --clans 100000
+    python -m benchmarks load --clans 100000 [--base-url URL] [--output report.json]
+    python -m benchmarks run --clans 100000 --output report.json
+    python -m benchmarks compare base.json head.json
+
+`load` & `run` expect the dataset to have been seeded with at least as many
+clans; `run` seeds it first. Without --base-url, the app runs in-process.
+"""
+import argparse
+import asyncio
+import sys
+
+from . import dataset
+from . import load
+from . import micro
+from . import report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("micro")
+
+    for command in ("seed", "load", "run"):
+        subparser = commands.add_parser(command)
+        subparser.add_argument("--clans", type=int, default=100_000)
+
+    for command in ("load", "run"):
+        subparser = commands.choices[command]
+        subparser.add_argument("--duration", type=float, default=10,
+                               help="seconds per route")
+        subparser.add_argument("--concurrency", type=int, default=32)
+        subparser.add_argument("--base-url", default=None)
+        subparser.add_argument("--only", default=None,
+                               help="only run routes whose name contains this")
+
+    for command in ("micro", "load", "run"):
+        commands.choices[command].add_argument("--output", default=None)
+
+    compare = commands.add_parser("compare")
+    compare.add_argument("base")
+    compare.add_argument("head")
+    compare.add_argument("--threshold", type=float, default=0.05)
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        print(report.compare(report.load_report(args.base),
+                             report.load_report(args.head),
+                             args.threshold))
+        return 0
+
+    if args.command in ("seed", "run"):
+        print(f"Seeding {args.clans} clans ...", flush=True)
+        inserted = asyncio.run(dataset.seed(args.clans))
+        print(f"Inserted {inserted} clans")
+        if args.command == "seed":
+            return 0
+
+    config = {}
+    micro_results = load_results = None
+    if args.command in ("micro", "run"):
+        print("Running micro-benchmarks ...", flush=True)
+        micro_results = micro.run()
+
+    if args.command in ("load", "run"):
+        config = {
+            "clans": args.clans,
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "target": args.base_url or "in-process",
+        }
+        print("Running load tests ...", flush=True)
+        load_results = asyncio.run(load.run(args.clans, args.duration,
+                                            args.concurrency,
+                                            base_url=args.base_url,
+                                            only=args.only))
+
+    result = report.create(config, micro_results, load_results)
+    print(report.format_report(result))
+    if args.output is not None:
+        report.save(result, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""The seeded benchmark dataset.
+
+Seeded clans have fixed ids, names, tags & owners derived from their index,
+so load runs can address them without asking the api first, and so a run
+against a differently sized dataset is obvious from the report.
+"""
+from app.common import settings
+from app.common.context import AppContext
+from app.models import Status
+from app.models.clans import JoinMethod
+from app.services.database import dsn
+from app.services.database import ServiceDatabase
+from app.services.redis import ServiceRedis
+from app.usecases import clan_stats
+
+# far above anything the tests or a dev database would create
+CLAN_ID_OFFSET = 100_000_000
+OWNER_OFFSET = 100_000_000
+
+INSERT_CHUNK_SIZE = 1000
+
+
+def clan_id(index: int) -> int:
+    return CLAN_ID_OFFSET + index
+
+
+def owner(index: int) -> int:
+    return OWNER_OFFSET + index
+
+
+def _clan_row(index: int) -> str:
+    # (clan_id, name, tag, description, owner, join_method, status)
+    return (f"({clan_id(index)}, 'Bench Clan {index}', 'B{index:07d}', "
+            f"'Seeded for benchmarks', {owner(index)}, "
+            f"'{JoinMethod.OPEN.value}', '{Status.ACTIVE.value}')")
+
+
+def _connect() -> tuple[ServiceDatabase, ServiceRedis]:
+    db = ServiceDatabase(
+        read_dsns=[
+            dsn(
+                driver=settings.READ_DB_DRIVER,
+                user=settings.READ_DB_USER,
+                password=settings.READ_DB_PASS,
+                host=host,
+                port=port,
+                database=settings.READ_DB_NAME,
+            )
+            for host, port in settings.READ_DB_HOSTS
+        ],
+        write_dsn=dsn(
+            driver=settings.WRITE_DB_DRIVER,
+            user=settings.WRITE_DB_USER,
+            password=settings.WRITE_DB_PASS,
+            host=settings.WRITE_DB_HOST,
+            port=settings.WRITE_DB_PORT,
+            database=settings.WRITE_DB_NAME,
+        ),
+        min_pool_size=settings.MIN_DB_POOL_SIZE,
+        max_pool_size=settings.MAX_DB_POOL_SIZE,
+        ssl=settings.DB_USE_SSL,
+    )
+    redis = ServiceRedis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+    return db, redis
+
+
+async def seed(clans: int) -> int:
+    """Make sure the first `clans` seeded clans exist, with their owners as
+    members & stats rows; returns how many had to be inserted."""
+    db, redis = _connect()
+    async with db, redis:
+        existing = await db.fetch_val(
+            "SELECT COUNT(*) FROM clans WHERE clan_id >= :offset",
+            {"offset": CLAN_ID_OFFSET}, primary=True)
+        if existing >= clans:
+            return 0
+
+        for start in range(existing, clans, INSERT_CHUNK_SIZE):
+            indexes = range(start, min(start + INSERT_CHUNK_SIZE, clans))
+
+            # multi-row INSERT IGNOREs; a few hundred times faster than the
+            # api, and safe to rerun after an interrupted seed
+            async with db.transaction():
+                await db.execute(f"""\
+                    INSERT IGNORE INTO clans (clan_id, name, tag, description,
+                                              owner, join_method, status)
+                         VALUES {", ".join(_clan_row(i) for i in indexes)}
+                """)
+                await db.execute(f"""\
+                    INSERT IGNORE INTO clan_members (clan_id, user_id)
+                         VALUES {", ".join(f"({clan_id(i)}, {owner(i)})" for i in indexes)}
+                """)
+                await db.execute(f"""\
+                    INSERT IGNORE INTO clan_stats (clan_id, member_count)
+                         VALUES {", ".join(f"({clan_id(i)}, 1)" for i in indexes)}
+                """)
+
+        await clan_stats.rebuild_leaderboards(AppContext(db=db, redis=redis))
+        return clans - existing
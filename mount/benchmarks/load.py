@@ -0,0 +1,191 @@
+"""End-to-end throughput & latency runs against every route.
+
+Runs against a live deployment given its base url, or against the app
+in-process (no uvicorn or network, but the configured mysql & redis).
+"""
+import asyncio
+import random
+import statistics
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, NamedTuple
+
+import httpx
+
+from . import dataset
+
+Request = Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+
+
+class Scenario(NamedTuple):
+    name: str
+    # makes the next request; called once per request, by one worker
+    request: Callable[[], Request]
+
+
+def _scenarios(clans: int) -> list[Scenario]:
+    rng = random.Random(0)
+    # writes create their own clans & users, unique per run
+    run_id = int(time.time()) % 1000
+    counter = iter(range(1_000_000))
+
+    def seeded() -> int:
+        return rng.randrange(clans)
+
+    def fresh() -> int:
+        return 200_000_000 + run_id * 1_000_000 + next(counter)
+
+    def get(url: str, **params: Any) -> Request:
+        return lambda client: client.get(url, params=params)
+
+    def update_clan() -> Request:
+        clan_id = dataset.clan_id(seeded())
+        body = {"description": f"Updated {rng.random()}"}
+        return lambda client: client.patch(f"/clans/{clan_id}", json=body)
+
+    def update_member_stats() -> Request:
+        user_id = dataset.owner(seeded())
+        body = {"pp": rng.uniform(0, 10_000), "ranked_score": rng.randrange(10**9)}
+        return lambda client: client.put(f"/users/{user_id}/clan-stats", json=body)
+
+    def create_and_disband() -> Request:
+        user_id = fresh()
+
+        async def request(client: httpx.AsyncClient) -> httpx.Response:
+            response = await client.post("/clans", json={
+                "name": f"Bench {user_id}",
+                "tag": f"{user_id:x}"[-8:],
+                "description": None,
+                "owner": user_id,
+                "join_method": "open",
+            })
+            if response.is_success:
+                clan_id = response.json()["data"]["clan_id"]
+                response = await client.delete(f"/clans/{clan_id}")
+            return response
+        return request
+
+    def join_and_leave() -> Request:
+        clan_id, user_id = dataset.clan_id(seeded()), fresh()
+
+        async def request(client: httpx.AsyncClient) -> httpx.Response:
+            response = await client.post(f"/clans/{clan_id}/members",
+                                         json={"user_id": user_id})
+            if response.is_success:
+                response = await client.delete(f"/clans/{clan_id}/members/{user_id}")
+            return response
+        return request
+
+    return [
+        Scenario("GET /clans/{clan_id}",
+                 lambda: get(f"/clans/{dataset.clan_id(seeded())}")),
+        Scenario("GET /clans/batch",
+                 lambda: get("/clans/batch",
+                             ids=[dataset.clan_id(seeded()) for _ in range(100)])),
+        Scenario("GET /clans",
+                 lambda: get("/clans", after=dataset.clan_id(seeded()), limit=100)),
+        Scenario("GET /clans?stream",
+                 lambda: get("/clans", after=dataset.clan_id(seeded()), limit=1000,
+                             stream="true")),
+        Scenario("GET /clans/search",
+                 lambda: get("/clans/search", q=f"{seeded():07d}"[:rng.randrange(2, 8)])),
+        Scenario("GET /clans/leaderboard",
+                 lambda: get("/clans/leaderboard", page=rng.randrange(1, 100))),
+        Scenario("GET /clans/{clan_id}/stats",
+                 lambda: get(f"/clans/{dataset.clan_id(seeded())}/stats")),
+        Scenario("GET /clans/{clan_id}/members",
+                 lambda: get(f"/clans/{dataset.clan_id(seeded())}/members")),
+        Scenario("GET /clans/members/batch",
+                 lambda: get("/clans/members/batch",
+                             user_ids=[dataset.owner(seeded()) for _ in range(100)])),
+        Scenario("GET /users/{user_id}/clan",
+                 lambda: get(f"/users/{dataset.owner(seeded())}/clan")),
+        Scenario("PATCH /clans/{clan_id}", update_clan),
+        Scenario("PUT /users/{user_id}/clan-stats", update_member_stats),
+        Scenario("POST + DELETE /clans", create_and_disband),
+        Scenario("POST + DELETE /clans/{clan_id}/members", join_and_leave),
+    ]
+
+
+def _percentile(latencies: list[float], percentile: float) -> float:
+    index = min(int(len(latencies) * percentile), len(latencies) - 1)
+    return latencies[index]
+
+
+async def _run_scenario(client: httpx.AsyncClient, scenario: Scenario,
+                        duration: float, concurrency: int) -> dict[str, float]:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            request = scenario.request()
+            start = time.perf_counter()
+            try:
+                response = await request(client)
+            except httpx.HTTPError:
+                # e.g. a timeout; one shouldn't cost the whole run
+                errors += 1
+                continue
+
+            latencies.append(time.perf_counter() - start)
+            if not response.is_success:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    results = {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+    }
+    if not latencies:
+        return results
+
+    latencies.sort()
+    return results | {
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p90_ms": _percentile(latencies, 0.90) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+@asynccontextmanager
+async def _client(base_url: str | None) -> AsyncIterator[httpx.AsyncClient]:
+    if base_url is not None:
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            yield client
+        return
+
+    from app.api.rest import init_api
+
+    api = init_api()
+    await api.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=api)
+        async with httpx.AsyncClient(transport=transport,
+                                     base_url="http://benchmark") as client:
+            yield client
+    finally:
+        await api.router.shutdown()
+
+
+async def run(clans: int, duration: float, concurrency: int,
+              base_url: str | None = None,
+              only: str | None = None) -> dict[str, dict[str, float]]:
+    results = {}
+    async with _client(base_url) as client:
+        for scenario in _scenarios(clans):
+            if only is not None and only not in scenario.name:
+                continue
+
+            print(f"  {scenario.name} ...", flush=True)
+            results[scenario.name] = await _run_scenario(client, scenario,
+                                                         duration, concurrency)
+    return results
@@ -0,0 +1,150 @@
+"""Micro-benchmarks of the per-row & per-response serialization work, of
+the per-query compilation work, and of the per-request middleware work."""
+import asyncio
+import time
+import timeit
+from datetime import datetime
+from typing import Any, Callable
+
+import orjson
+from app.api.rest.middlewares import ProcessTimeMiddleware
+from app.common import metrics
+from app.common import responses
+from app.models import Status
+from app.models.clans import Clan
+from app.models.clans import JoinMethod
+from app.repositories.clans import ClansRepo
+from app.repositories.query_builder import WhereClause
+from app.services import mysql
+from databases.backends.mysql import MySQLBackend
+from databases.core import Connection
+from fastapi import FastAPI
+from fastapi import Request
+from starlette.types import ASGIApp
+
+PAGE_SIZE = 100
+REPEATS = 5
+
+
+def _row(clan_id: int) -> dict[str, Any]:
+    # shaped like a ClansRepo row
+    now = datetime(2022, 10, 1, 12, 0, 0)
+    return {
+        "clan_id": clan_id,
+        "name": f"Bench Clan {clan_id}",
+        "tag": f"B{clan_id:07d}",
+        "description": "Seeded for benchmarks",
+        "owner": clan_id,
+        "join_method": JoinMethod.OPEN,
+        "status": Status.ACTIVE,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _point_lookup() -> tuple[str, dict[str, Any]]:
+    # as ClansRepo.fetch_one(clan_id=...)
+    where = WhereClause().equals("clan_id", 1)
+    query = f"""\
+        SELECT {ClansRepo.READ_PARAMS}
+          FROM clans
+         {where}
+    """
+    return query, where.params
+
+
+def _api(middleware: str | None) -> FastAPI:
+    api = FastAPI()
+
+    @api.get("/clans/{clan_id}")
+    async def get_clan(clan_id: int):
+        return {"clan_id": clan_id}
+
+    if middleware == "asgi":
+        api.add_middleware(ProcessTimeMiddleware)
+    elif middleware == "http":
+        # the same work, as an @app.middleware("http") does it
+        @api.middleware("http")
+        async def process_time(request: Request, call_next):
+            start_time = time.perf_counter_ns()
+            response = await call_next(request)
+            process_time = (time.perf_counter_ns() - start_time) / 1e6
+            response.headers["X-Process-Time"] = str(process_time)
+            route = request.scope.get("route")
+            metrics.REQUEST_LATENCY.labels(
+                method=request.method,
+                route=route.path if route is not None else "unmatched",
+                status=response.status_code,
+            ).observe(process_time / 1e3)
+            return response
+    return api
+
+
+def _asgi_request(app: ASGIApp) -> Callable[[], Any]:
+    """A GET of one clan, sent straight to app; no server or client."""
+    loop = asyncio.new_event_loop()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/clans/1",
+        "raw_path": b"/clans/1",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"benchmark")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("benchmark", 80),
+    }
+
+    async def receive() -> dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict[str, Any]) -> None:
+        pass
+
+    return lambda: loop.run_until_complete(app(dict(scope), receive, send))
+
+
+def _benchmarks() -> dict[str, Callable[[], Any]]:
+    row = _row(1)
+    rows = [_row(i) for i in range(PAGE_SIZE)]
+    models = [Clan.from_mapping(r) for r in rows]
+
+    # what each driver path does to a query before sending it
+    query, values = _point_lookup()
+    databases_connection = MySQLBackend("mysql://bench@localhost/bench").connection()
+
+    return {
+        "clan.from_mapping": lambda: Clan.from_mapping(row),
+        "clan.project": lambda: Clan.project(row),
+        f"clan.from_mapping x{PAGE_SIZE}": lambda: [Clan.from_mapping(r) for r in rows],
+        f"clan.project x{PAGE_SIZE}": lambda: [Clan.project(r) for r in rows],
+        f"responses.success x{PAGE_SIZE}": lambda: responses.success(models),
+        f"get_clans page x{PAGE_SIZE}": lambda: responses.success(
+            [Clan.project(r) for r in rows]),
+        f"ndjson lines x{PAGE_SIZE}": lambda: b"".join(
+            orjson.dumps(Clan.project(r)) + b"\n" for r in rows),
+        "databases compile point lookup": lambda: databases_connection._compile(
+            Connection._build_query(query, values)),
+        "native compile point lookup": lambda: mysql._bind(query, values),
+        # the difference to "no middleware" is each stack's per-request cost
+        "request, no middleware": _asgi_request(_api(None)),
+        "request, asgi middleware": _asgi_request(_api("asgi")),
+        "request, http middleware": _asgi_request(_api("http")),
+    }
+
+
+def run() -> dict[str, dict[str, float]]:
+    """Returns the best of REPEATS runs of each benchmark."""
+    results = {}
+    for name, fn in _benchmarks().items():
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=REPEATS, number=number)) / number
+        results[name] = {
+            "mean_us": best * 1e6,
+            "ops_per_sec": 1 / best,
+        }
+    return results
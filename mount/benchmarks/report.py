@@ -0,0 +1,96 @@
+"""Benchmark reports: json files meant to be compared across commits."""
+import math
+import platform
+import subprocess
+from datetime import datetime
+from typing import Any
+
+import orjson
+
+# for each metric, whether a bigger number is an improvement
+METRICS = {
+    "ops_per_sec": True,
+    "mean_us": False,
+    "rps": True,
+    "errors": False,
+    "mean_ms": False,
+    "p50_ms": False,
+    "p90_ms": False,
+    "p99_ms": False,
+}
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def create(config: dict[str, Any], micro: dict | None, load: dict | None) -> dict[str, Any]:
+    return {
+        "created_at": datetime.utcnow().isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": config,
+        "micro": micro or {},
+        "load": load or {},
+    }
+
+
+def save(report: dict[str, Any], path: str) -> None:
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+
+
+def load_report(path: str) -> dict[str, Any]:
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def format_report(report: dict[str, Any]) -> str:
+    lines = [f"commit {report['commit']} - python {report['python']} - "
+             f"{report['config']}"]
+    for section in ("micro", "load"):
+        for name, results in report[section].items():
+            metrics = "  ".join(f"{metric}={value:,.2f}"
+                                for metric, value in results.items()
+                                if metric in METRICS or metric == "requests")
+            lines.append(f"{name:<44} {metrics}")
+    return "\n".join(lines)
+
+
+def compare(base: dict[str, Any], head: dict[str, Any],
+            threshold: float = 0.05) -> str:
+    """List each metric's change from base to head, flagging those which
+    got worse by more than `threshold` (a fraction)."""
+    lines = [f"{base['commit']} -> {head['commit']}"]
+    if base["config"] != head["config"]:
+        lines.append(f"WARNING: configs differ: {base['config']} != {head['config']}")
+
+    for section in ("micro", "load"):
+        for name, head_results in head[section].items():
+            base_results = base[section].get(name)
+            if base_results is None:
+                lines.append(f"{name:<44} (new)")
+                continue
+
+            for metric, higher_is_better in METRICS.items():
+                # e.g. latencies, from a run where every request failed
+                if metric not in head_results or metric not in base_results:
+                    continue
+
+                before, after = base_results[metric], head_results[metric]
+                if before:
+                    change = (after - before) / before
+                else:
+                    # e.g. errors, from none
+                    change = math.inf if after else 0
+                regressed = -change if higher_is_better else change
+                flag = "  REGRESSION" if regressed > threshold else ""
+                lines.append(f"{name:<44} {metric:<12} {before:>12,.2f} -> "
+                             f"{after:>12,.2f} ({change:+.1%}){flag}")
+    return "\n".join(lines)
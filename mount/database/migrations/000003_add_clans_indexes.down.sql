@@ -0,0 +1,5 @@
+ALTER TABLE clans
+    DROP INDEX clans_status_clan_id_index,
+    DROP INDEX clans_owner_status_index,
+    DROP INDEX clans_tag_status_index,
+    DROP INDEX clans_name_status_index;
@@ -0,0 +1,5 @@
+ALTER TABLE clans
+    ADD INDEX clans_name_status_index (name, status),
+    ADD INDEX clans_tag_status_index (tag, status),
+    ADD INDEX clans_owner_status_index (owner, status),
+    ADD INDEX clans_status_clan_id_index (status, clan_id);
@@ -0,0 +1,2 @@
+ALTER TABLE clans
+    DROP INDEX clans_status_join_method_clan_id_index;
@@ -0,0 +1,2 @@
+ALTER TABLE clans
+    ADD INDEX clans_status_join_method_clan_id_index (status, join_method, clan_id);
@@ -0,0 +1,7 @@
+ALTER TABLE clans
+    DROP INDEX clans_active_tag_uindex,
+    DROP INDEX clans_active_name_uindex,
+    DROP INDEX clans_active_owner_uindex,
+    DROP COLUMN active_tag,
+    DROP COLUMN active_name,
+    DROP COLUMN active_owner;
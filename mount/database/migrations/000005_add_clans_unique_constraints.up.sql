@@ -0,0 +1,7 @@
+ALTER TABLE clans
+    ADD COLUMN active_owner INT GENERATED ALWAYS AS (IF(status = 'active', owner, NULL)) VIRTUAL,
+    ADD COLUMN active_name VARCHAR(32) GENERATED ALWAYS AS (IF(status = 'active', name, NULL)) VIRTUAL,
+    ADD COLUMN active_tag VARCHAR(8) GENERATED ALWAYS AS (IF(status = 'active', tag, NULL)) VIRTUAL,
+    ADD UNIQUE INDEX clans_active_owner_uindex (active_owner),
+    ADD UNIQUE INDEX clans_active_name_uindex (active_name),
+    ADD UNIQUE INDEX clans_active_tag_uindex (active_tag);
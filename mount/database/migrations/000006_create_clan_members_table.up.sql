@@ -0,0 +1,7 @@
+CREATE TABLE clan_members (
+    clan_id INT NOT NULL,
+    user_id INT NOT NULL,
+    joined_at DATETIME NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (clan_id, user_id),
+    UNIQUE INDEX clan_members_user_id_uindex (user_id)
+);
@@ -0,0 +1,4 @@
+DELETE clan_members
+  FROM clan_members
+  JOIN clans ON clans.clan_id = clan_members.clan_id
+ WHERE clan_members.user_id = clans.owner;
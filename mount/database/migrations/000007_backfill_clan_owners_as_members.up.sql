@@ -0,0 +1,4 @@
+INSERT INTO clan_members (clan_id, user_id, joined_at)
+     SELECT clan_id, owner, created_at
+       FROM clans
+      WHERE status = 'active';
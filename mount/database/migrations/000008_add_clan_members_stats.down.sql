@@ -0,0 +1,3 @@
+ALTER TABLE clan_members
+    DROP COLUMN ranked_score,
+    DROP COLUMN pp;
@@ -0,0 +1,3 @@
+ALTER TABLE clan_members
+    ADD COLUMN pp DOUBLE NOT NULL DEFAULT 0,
+    ADD COLUMN ranked_score BIGINT NOT NULL DEFAULT 0;
@@ -0,0 +1,7 @@
+CREATE TABLE clan_stats (
+    clan_id INT NOT NULL PRIMARY KEY,
+    member_count INT NOT NULL DEFAULT 0,
+    total_pp DOUBLE NOT NULL DEFAULT 0,
+    ranked_score BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT NOW()
+);
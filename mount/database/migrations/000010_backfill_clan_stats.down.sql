@@ -0,0 +1 @@
+DELETE FROM clan_stats;
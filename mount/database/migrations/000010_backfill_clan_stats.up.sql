@@ -0,0 +1,4 @@
+INSERT INTO clan_stats (clan_id, member_count, total_pp, ranked_score)
+     SELECT clan_id, COUNT(*), SUM(pp), SUM(ranked_score)
+       FROM clan_members
+   GROUP BY clan_id;
@@ -0,0 +1 @@
+DROP TABLE clan_events;
@@ -0,0 +1,7 @@
+CREATE TABLE clan_events (
+    event_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    clan_id INT NOT NULL,
+    event_type VARCHAR(16) NOT NULL,
+    payload TEXT NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT NOW()
+);
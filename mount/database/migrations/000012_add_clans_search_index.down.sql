@@ -0,0 +1,2 @@
+ALTER TABLE clans
+    DROP INDEX clans_search_index;
@@ -0,0 +1,2 @@
+ALTER TABLE clans
+    ADD FULLTEXT INDEX clans_search_index (name, tag);
@@ -0,0 +1,22 @@
+-- Fails with a duplicate entry error if two active clans' names (or tags)
+-- are equal once normalized, e.g. 'Foo  Bar' & 'foo bar'. Before running it,
+-- list any such clans, and rename or disband all but one of each group:
+--
+--   SELECT 'name' AS field, normalized, GROUP_CONCAT(clan_id) AS clan_ids
+--     FROM (SELECT clan_id, LOWER(TRIM(REGEXP_REPLACE(name, '[[:space:]]+', ' '))) AS normalized
+--             FROM clans WHERE status = 'active') AS names
+-- GROUP BY normalized HAVING COUNT(*) > 1
+--    UNION ALL
+--   SELECT 'tag', normalized, GROUP_CONCAT(clan_id)
+--     FROM (SELECT clan_id, LOWER(TRIM(REGEXP_REPLACE(tag, '[[:space:]]+', ' '))) AS normalized
+--             FROM clans WHERE status = 'active') AS tags
+-- GROUP BY normalized HAVING COUNT(*) > 1;
+ALTER TABLE clans
+    DROP INDEX clans_active_name_uindex,
+    DROP INDEX clans_active_tag_uindex,
+    DROP COLUMN active_name,
+    DROP COLUMN active_tag,
+    ADD COLUMN active_name VARCHAR(32) GENERATED ALWAYS AS (IF(status = 'active', LOWER(TRIM(REGEXP_REPLACE(name, '[[:space:]]+', ' '))), NULL)) VIRTUAL,
+    ADD COLUMN active_tag VARCHAR(8) GENERATED ALWAYS AS (IF(status = 'active', LOWER(TRIM(REGEXP_REPLACE(tag, '[[:space:]]+', ' '))), NULL)) VIRTUAL,
+    ADD UNIQUE INDEX clans_active_name_uindex (active_name),
+    ADD UNIQUE INDEX clans_active_tag_uindex (active_tag);
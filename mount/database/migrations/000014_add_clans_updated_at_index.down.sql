@@ -0,0 +1,2 @@
+ALTER TABLE clans
+    DROP INDEX clans_updated_at_clan_id_index;
@@ -0,0 +1,2 @@
+ALTER TABLE clans
+    ADD INDEX clans_updated_at_clan_id_index (updated_at, clan_id);
@@ -0,0 +1,2 @@
+ALTER TABLE clan_events
+    DROP COLUMN claimed_until;
@@ -0,0 +1,2 @@
+ALTER TABLE clan_events
+    ADD COLUMN claimed_until DATETIME NULL DEFAULT NULL;
@@ -0,0 +1,9 @@
+ALTER TABLE clans
+    DROP INDEX clans_active_name_uindex,
+    DROP INDEX clans_active_tag_uindex,
+    DROP COLUMN active_name,
+    DROP COLUMN active_tag,
+    ADD COLUMN active_name VARCHAR(32) GENERATED ALWAYS AS (IF(status = 'active', LOWER(TRIM(REGEXP_REPLACE(name, '[[:space:]]+', ' '))), NULL)) VIRTUAL,
+    ADD COLUMN active_tag VARCHAR(8) GENERATED ALWAYS AS (IF(status = 'active', LOWER(TRIM(REGEXP_REPLACE(tag, '[[:space:]]+', ' '))), NULL)) VIRTUAL,
+    ADD UNIQUE INDEX clans_active_name_uindex (active_name),
+    ADD UNIQUE INDEX clans_active_tag_uindex (active_tag);
@@ -0,0 +1,53 @@
+import httpx
+import pytest
+from app.api.rest.middlewares import ProcessTimeMiddleware
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+
+# https://docs.pytest.org/en/7.1.x/reference/reference.html#globalvar-pytestmark
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def api() -> FastAPI:
+    api = FastAPI()
+    api.add_middleware(ProcessTimeMiddleware)
+
+    @api.get("/clans/{clan_id}")
+    async def get_clan(clan_id: int):
+        return {"clan_id": clan_id}
+
+    return api
+
+
+def _requests(route: str, status: int) -> float:
+    labels = {"method": "GET", "route": route, "status": str(status)}
+    return REGISTRY.get_sample_value("http_request_duration_seconds_count",
+                                     labels) or 0
+
+
+async def test_should_time_requests(api: FastAPI):
+    before = _requests("/clans/{clan_id}", 200)
+
+    transport = httpx.ASGITransport(app=api)
+    async with httpx.AsyncClient(transport=transport,
+                                 base_url="http://test") as client:
+        response = await client.get("/clans/1")
+
+    assert response.status_code == 200
+    assert float(response.headers["X-Process-Time"]) > 0
+    # labelled by the route's template, not its path
+    assert _requests("/clans/{clan_id}", 200) == before + 1
+
+
+async def test_should_time_unmatched_requests(api: FastAPI):
+    before = _requests("unmatched", 404)
+
+    transport = httpx.ASGITransport(app=api)
+    async with httpx.AsyncClient(transport=transport,
+                                 base_url="http://test") as client:
+        response = await client.get("/nowhere")
+
+    assert response.status_code == 404
+    assert "X-Process-Time" in response.headers
+    assert _requests("unmatched", 404) == before + 1
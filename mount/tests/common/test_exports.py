@@ -0,0 +1,69 @@
+import gzip
+from datetime import datetime
+from typing import Any, AsyncIterator, Mapping
+
+import orjson
+import pytest
+from app.common import exports
+
+# https://docs.pytest.org/en/7.1.x/reference/reference.html#globalvar-pytestmark
+pytestmark = pytest.mark.asyncio
+
+FIELDS = ("clan_id", "name", "description", "created_at")
+
+
+async def _rows(count: int) -> AsyncIterator[Mapping[str, Any]]:
+    for clan_id in range(count):
+        yield {
+            "clan_id": clan_id,
+            "name": f"Exported, {clan_id}",
+            "description": None,
+            "created_at": datetime(2022, 10, 1, 12, 0, 0),
+            "ignored": True,
+        }
+
+
+async def _read(chunks: AsyncIterator[bytes]) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+async def test_should_export_ndjson():
+    data = await _read(exports.ndjson_lines(_rows(2), FIELDS))
+
+    assert [orjson.loads(line) for line in data.splitlines()] == [
+        {"clan_id": 0, "name": "Exported, 0", "description": None,
+         "created_at": "2022-10-01T12:00:00"},
+        {"clan_id": 1, "name": "Exported, 1", "description": None,
+         "created_at": "2022-10-01T12:00:00"},
+    ]
+
+
+async def test_should_export_csv():
+    data = await _read(exports.csv_lines(_rows(1), FIELDS))
+
+    assert data.decode().splitlines() == [
+        "clan_id,name,description,created_at",
+        '0,"Exported, 0",,2022-10-01T12:00:00',
+    ]
+
+
+async def test_should_export_csv_header_without_rows():
+    data = await _read(exports.csv_lines(_rows(0), FIELDS))
+    assert data.decode().splitlines() == ["clan_id,name,description,created_at"]
+
+
+async def test_should_send_exports_in_chunks():
+    chunks = [chunk async for chunk in
+              exports.chunked(exports.ndjson_lines(_rows(5000), FIELDS))]
+
+    assert len(chunks) > 1
+    assert all(len(chunk) >= exports.CHUNK_SIZE for chunk in chunks[:-1])
+
+
+async def test_should_gzip_exports():
+    plain = await _read(exports.chunked(exports.ndjson_lines(_rows(5000), FIELDS)))
+    compressed = await _read(exports.gzipped(
+        exports.chunked(exports.ndjson_lines(_rows(5000), FIELDS))))
+
+    assert gzip.decompress(compressed) == plain
+    assert len(compressed) < len(plain)
@@ -0,0 +1,73 @@
+from typing import Any, AsyncIterator
+
+import pytest
+from app.common import imports
+
+# https://docs.pytest.org/en/7.1.x/reference/reference.html#globalvar-pytestmark
+pytestmark = pytest.mark.asyncio
+
+
+async def _chunks(body: bytes, size: int) -> AsyncIterator[bytes]:
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+async def _records(parse: Any, body: bytes) -> list[tuple[int, Any]]:
+    results = None
+    # however the body is split into chunks, it parses the same
+    for size in (1, 3, len(body) or 1):
+        records = [(line, str(record) if isinstance(record, ValueError) else record)
+                   async for line, record in parse(_chunks(body, size))]
+        assert results is None or records == results
+        results = records
+    return results or []
+
+
+async def test_should_split_lines_keeping_endings():
+    lines = [line async for line in imports.lines(_chunks(b"a\r\nb\n\nc", 2))]
+    assert lines == [b"a\r\n", b"b\n", b"\n", b"c"]
+
+
+async def test_should_parse_ndjson():
+    body = b'{"name": "a"}\r\n\n{"name": "b"}\nnot json\n{"name": "c"}'
+    records = await _records(imports.ndjson_records, body)
+
+    assert [line for line, _ in records] == [1, 3, 4, 5]
+    assert records[0][1] == {"name": "a"}
+    assert records[2][1].startswith("Invalid json")
+    assert records[3][1] == {"name": "c"}
+
+
+async def test_should_parse_csv():
+    body = (b'name,tag,description\r\n'
+            b'First,FST,\r\n'
+            b'\r\n'
+            b'"Second, Clan",SND,"Spans\r\ntwo ""lines"""\r\n'
+            b'Third,TRD,Last line without an ending')
+    records = await _records(imports.csv_records, body)
+
+    assert records == [
+        (2, {"name": "First", "tag": "FST", "description": None}),
+        # numbered by the line it starts on; the line ending inside the
+        # quoted field is kept as it was
+        (4, {"name": "Second, Clan", "tag": "SND",
+             "description": 'Spans\r\ntwo "lines"'}),
+        (6, {"name": "Third", "tag": "TRD",
+             "description": "Last line without an ending"}),
+    ]
+
+
+async def test_should_report_bad_csv_records():
+    body = (b'name,tag\n'
+            b'Too,Many,Fields\n'
+            b'"Stray" quote,BAD\n'
+            b'Fine,FIN\n'
+            b'"Unterminated,UNT\n'
+            b'Swallowed,SWL\n')
+    records = await _records(imports.csv_records, body)
+
+    assert [line for line, _ in records] == [2, 3, 4, 5]
+    assert records[0][1] == "Expected 2 fields, got 3"
+    assert records[1][1].startswith("Invalid csv")
+    assert records[2][1] == {"name": "Fine", "tag": "FIN"}
+    assert records[3][1] == "Invalid csv: unterminated quoted field"
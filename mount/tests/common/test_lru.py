@@ -0,0 +1,53 @@
+import time
+
+from app.common.lru import cache_by_query
+from app.common.lru import LRUCache
+from app.common.lru import MAX_CACHED_QUERY_LENGTH
+
+
+def test_should_evict_least_recently_used():
+    cache: LRUCache[int] = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses, cache.evictions) == (3, 1, 1)
+
+
+def test_should_expire_entries():
+    cache: LRUCache[int] = LRUCache(maxsize=2, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_should_not_cache_when_disabled():
+    cache: LRUCache[int] = LRUCache(maxsize=0, ttl=60)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_should_cache_by_query_unless_long():
+    calls = []
+
+    @cache_by_query
+    def upper(query: str) -> str:
+        calls.append(query)
+        return query.upper()
+
+    long_query = "x" * (MAX_CACHED_QUERY_LENGTH + 1)
+    for _ in range(2):
+        assert upper("select 1") == "SELECT 1"
+        assert upper(long_query) == long_query.upper()
+
+    assert calls == ["select 1", long_query, long_query]
@@ -0,0 +1,51 @@
+import pytest
+from app.common.context import Context
+from app.common.normalization import normalize
+
+# https://docs.pytest.org/en/7.1.x/reference/reference.html#globalvar-pytestmark
+pytestmark = pytest.mark.asyncio
+
+# where python's & mysql's notions of whitespace & lowercase can differ
+NAMES = (
+    "Foo  Bar",
+    " \tTabbed\nName\u3000",
+    "No\xa0Break\u2009Thin",
+    "File\x1cSeparator",
+    "\u0130STANBUL",  # İ
+    "\u039f\u0394\u039f\u03a3 \u03a3\u0391\u03a3",  # ΟΔΟΣ ΣΑΣ
+    "Stra\xdfe \u1e9e",  # Straße ẞ
+    "\u01c5ungla",  # ǅ
+)
+
+INSERT_CLAN = """\
+    INSERT INTO clans (name, tag, description, owner, join_method, status)
+         VALUES (:name, :tag, NULL, :owner, 'closed', 'active')
+"""
+
+SELECT_NORMALIZED = """\
+    SELECT active_name, active_tag FROM clans WHERE clan_id = :clan_id
+"""
+
+
+def test_should_collapse_whitespace_and_lowercase():
+    assert normalize("  Foo \t\n Bar ") == "foo bar"
+    assert normalize("AQC") == normalize("aqc") == "aqc"
+
+
+def test_should_lowercase_one_character_at_a_time():
+    assert normalize("\u0130") == "i"  # not i & a combining dot
+    # not with a final ς
+    assert normalize("\u039f\u0394\u039f\u03a3") == "\u03bf\u03b4\u03bf\u03c3"
+
+
+async def test_should_normalize_like_the_generated_columns(ctx: Context):
+    for idx, name in enumerate(NAMES):
+        tag = f"\xd1 {idx}"
+        clan_id = await ctx.db.execute(INSERT_CLAN, {"name": name,
+                                                     "tag": tag,
+                                                     "owner": 7000 + idx})
+        row = await ctx.db.fetch_one(SELECT_NORMALIZED, {"clan_id": clan_id},
+                                     primary=True)
+        assert row is not None
+        assert row["active_name"] == normalize(name)
+        assert row["active_tag"] == normalize(tag)
@@ -0,0 +1,77 @@
+import asyncio
+import contextvars
+
+import pytest
+from app.common.singleflight import SingleFlight
+
+# https://docs.pytest.org/en/7.1.x/reference/reference.html#globalvar-pytestmark
+pytestmark = pytest.mark.asyncio
+
+
+async def test_should_coalesce_concurrent_calls():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 42
+
+    results = await asyncio.gather(*[flight.do("key", fetch) for _ in range(10)])
+    assert results == [42] * 10
+    assert calls == 1
+    assert len(flight) == 0
+
+
+async def test_should_not_coalesce_different_keys():
+    flight = SingleFlight()
+
+    async def fetch(value: int) -> int:
+        await asyncio.sleep(0.01)
+        return value
+
+    results = await asyncio.gather(flight.do(1, lambda: fetch(1)),
+                                   flight.do(2, lambda: fetch(2)))
+    assert results == [1, 2]
+
+
+async def test_should_share_exceptions():
+    flight = SingleFlight()
+
+    async def fail() -> None:
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(flight.do("key", fail),
+                                   flight.do("key", fail),
+                                   return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(flight) == 0
+
+
+async def test_should_survive_waiter_cancellation():
+    flight = SingleFlight()
+
+    async def fetch() -> int:
+        await asyncio.sleep(0.02)
+        return 42
+
+    first = asyncio.ensure_future(flight.do("key", fetch))
+    second = asyncio.ensure_future(flight.do("key", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == 42
+
+
+async def test_should_not_share_the_first_callers_context():
+    flight = SingleFlight()
+    var: contextvars.ContextVar[str | None] = contextvars.ContextVar("var", default=None)
+
+    async def fetch() -> str | None:
+        await asyncio.sleep(0.01)
+        return var.get()
+
+    var.set("first caller's")
+    assert await flight.do("key", fetch) is None
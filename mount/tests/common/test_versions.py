@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from app.common.versions import is_fresh
+from app.common.versions import Version
+
+VERSION = Version("abc123", datetime(2022, 10, 1, 12, 0, 0, 500))
+
+
+def test_should_match_etag():
+    assert is_fresh({"if-none-match": '"abc123"'}, VERSION)
+    assert is_fresh({"if-none-match": 'W/"abc123", "def456"'}, VERSION)
+    assert is_fresh({"if-none-match": "*"}, VERSION)
+    assert not is_fresh({"if-none-match": '"def456"'}, VERSION)
+
+
+def test_should_compare_modified_since():
+    assert is_fresh({"if-modified-since": "Sat, 01 Oct 2022 12:00:00 GMT"}, VERSION)
+    assert not is_fresh({"if-modified-since": "Sat, 01 Oct 2022 11:59:59 GMT"}, VERSION)
+    assert not is_fresh({"if-modified-since": "yesterday"}, VERSION)
+
+
+def test_should_prefer_etag_to_modified_since():
+    headers = {
+        "if-none-match": '"def456"',
+        "if-modified-since": "Sat, 01 Oct 2022 12:00:00 GMT",
+    }
+    assert not is_fresh(headers, VERSION)
+
+
+def test_should_emit_headers():
+    assert VERSION.headers() == {
+        "ETag": '"abc123"',
+        "Last-Modified": "Sat, 01 Oct 2022 12:00:00 GMT",
+    }
@@ -3,6 +3,7 @@ from typing import AsyncIterator
 import pytest
 from app.common import settings
 from app.common.context import Context
+from app.repositories.clans_cache import clear_local_cache
 from app.services.database import dsn
 from app.services.database import ServiceDatabase
 from app.services.redis import ServiceRedis
@@ -37,17 +38,27 @@ async def db() -> AsyncIterator[ServiceDatabase]:
             port=settings.WRITE_DB_PORT,
             database=settings.WRITE_DB_NAME,
         ),
-        read_dsn=dsn(
-            driver=settings.WRITE_DB_DRIVER,
-            user=settings.READ_DB_USER,
-            password=settings.READ_DB_PASS,
-            host=settings.READ_DB_HOST,
-            port=settings.READ_DB_PORT,
-            database=settings.READ_DB_NAME,
-        ),
+        read_dsns=[
+            dsn(
+                driver=settings.READ_DB_DRIVER,
+                user=settings.READ_DB_USER,
+                password=settings.READ_DB_PASS,
+                host=host,
+                port=port,
+                database=settings.READ_DB_NAME,
+            )
+            for host, port in settings.READ_DB_HOSTS
+        ],
         min_pool_size=settings.MIN_DB_POOL_SIZE,
         max_pool_size=settings.MAX_DB_POOL_SIZE,
         ssl=settings.DB_USE_SSL,
+        read_your_writes_window=settings.DB_READ_YOUR_WRITES_WINDOW,
+        read_timeout=settings.DB_READ_TIMEOUT,
+        replica_max_failures=settings.DB_REPLICA_MAX_FAILURES,
+        replica_eject_seconds=settings.DB_REPLICA_EJECT_SECONDS,
+        replica_health_check_interval=settings.DB_REPLICA_HEALTH_CHECK_INTERVAL,
+        slow_query_threshold=settings.DB_SLOW_QUERY_THRESHOLD,
+        stream_pool_size=settings.DB_STREAM_POOL_SIZE,
     ) as db:
         yield db
 
@@ -58,6 +69,9 @@ async def redis() -> AsyncIterator[ServiceRedis]:
         host=settings.REDIS_HOST,
         port=settings.REDIS_PORT,
     ) as redis:
+        # the test database is recreated each run; cached state must be too
+        await redis.flushdb()
+        clear_local_cache()
         yield redis
 
 
@@ -0,0 +1,61 @@
+from app.repositories.query_builder import ValuesList
+from app.repositories.query_builder import WhereClause
+
+
+def test_should_leave_out_missing_filters():
+    where = (WhereClause()
+             .equals("status", "active")
+             .equals("owner", None)
+             .greater_than("clan_id", 10, param="after"))
+    assert where.conditions == ["status = :status", "clan_id > :after"]
+    assert where.params == {"status": "active", "after": 10}
+    assert str(WhereClause()) == ""
+
+
+def test_should_compile_empty_in_to_false():
+    where = WhereClause().is_in("clan_id", [])
+    assert where.conditions == ["FALSE"]
+    assert where.params == {}
+
+    where = WhereClause().is_in("clan_id", [1, 2], param="id")
+    assert where.conditions == ["clan_id IN (:id_0, :id_1)"]
+    assert where.params == {"id_0": 1, "id_1": 2}
+
+
+def test_should_compile_after_position():
+    where = WhereClause().after_position(("updated_at", "clan_id"), ("t", 5))
+    assert where.conditions == [
+        "updated_at >= :after_0",
+        "(updated_at > :after_0 OR (updated_at = :after_0 AND clan_id > :after_1))",
+    ]
+    assert where.params == {"after_0": "t", "after_1": 5}
+
+    where = WhereClause().after_position(("clan_id",), (5,), param="from")
+    assert where.conditions == ["clan_id > :from_0"]
+    assert where.params == {"from_0": 5}
+
+    assert WhereClause().after_position(("clan_id",), None).conditions == []
+
+
+def test_should_compile_any_of():
+    matches = WhereClause().equals("tag", "ABC").equals("name", "Abc")
+    where = WhereClause().equals("status", "active").any_of(matches)
+    assert str(where) == ("WHERE status = :status\n"
+                          "               AND (tag = :tag OR name = :name)")
+    assert where.params == {"status": "active", "tag": "ABC", "name": "Abc"}
+
+    # nothing to match adds no condition, rather than an empty ()
+    assert WhereClause().any_of(WhereClause()).conditions == []
+
+
+def test_should_compile_values_list():
+    values = ValuesList(("clan_id", "member_count"))
+    values.append({"clan_id": 1, "member_count": 0})
+    values.append({"clan_id": 2, "member_count": 3, "ignored": True})
+
+    assert len(values) == 2
+    assert str(values) == ("(clan_id, member_count)\n"
+                           "                 VALUES (:clan_id_0, :member_count_0),\n"
+                           "                        (:clan_id_1, :member_count_1)")
+    assert values.params == {"clan_id_0": 1, "member_count_0": 0,
+                             "clan_id_1": 2, "member_count_1": 3}
@@ -0,0 +1,213 @@
+import asyncio
+
+import pytest
+from app.common.context import Context
+from app.services import mysql
+from app.services.database import dsn
+from app.services.database import ServiceDatabase
+from prometheus_client import REGISTRY
+
+# https://docs.pytest.org/en/7.1.x/reference/reference.html#globalvar-pytestmark
+pytestmark = pytest.mark.asyncio
+
+INSERT_CLAN = """\
+    INSERT INTO clans (name, tag, description, owner, join_method, status)
+         VALUES (:name, :tag, NULL, :owner, 'closed', 'active')
+"""
+
+SELECT_CLAN = """\
+    SELECT clan_id FROM clans WHERE name = :name
+"""
+
+
+async def test_should_commit_transaction(ctx: Context):
+    params = {"name": "Committed Clan", "tag": "CMC", "owner": 5000}
+
+    async with ctx.db.transaction():
+        await ctx.db.execute(INSERT_CLAN, params)
+
+        # reads inside the transaction see its writes
+        assert await ctx.db.fetch_val(SELECT_CLAN, {"name": params["name"]})
+
+    assert await ctx.db.fetch_val(SELECT_CLAN, {"name": params["name"]})
+
+
+async def test_should_rollback_transaction(ctx: Context):
+    params = {"name": "Rolled Back Clan", "tag": "RBC", "owner": 5001}
+
+    with pytest.raises(RuntimeError):
+        async with ctx.db.transaction():
+            await ctx.db.execute(INSERT_CLAN, params)
+            raise RuntimeError
+
+    assert not await ctx.db.fetch_val(SELECT_CLAN, {"name": params["name"]})
+
+
+async def test_should_run_after_commit_callbacks(ctx: Context):
+    calls = []
+
+    async def callback() -> None:
+        calls.append(1)
+
+    async with ctx.db.transaction():
+        await ctx.db.after_commit(callback)
+        assert calls == []
+
+    assert calls == [1]
+
+    # outside of a transaction it runs right away
+    await ctx.db.after_commit(callback)
+    assert calls == [1, 1]
+
+
+async def test_should_not_run_after_commit_callbacks_on_rollback(ctx: Context):
+    calls = []
+
+    async def callback() -> None:
+        calls.append(1)
+
+    with pytest.raises(RuntimeError):
+        async with ctx.db.transaction():
+            await ctx.db.after_commit(callback)
+            raise RuntimeError
+
+    assert calls == []
+
+
+async def test_should_read_from_primary_after_write(ctx: Context):
+    params = {"name": "Read Your Writes Clan", "tag": "RYW", "owner": 5002}
+    await ctx.db.execute(INSERT_CLAN, params)
+
+    if ctx.db.read_your_writes_window:
+        assert ctx.db._reads_pinned()
+
+    assert await ctx.db.fetch_val(SELECT_CLAN, {"name": params["name"]})
+
+
+async def test_should_fall_back_to_primary_when_replica_is_down(ctx: Context):
+    replica = ctx.db.replicas[0]
+    original_pool = replica.pool
+
+    class UnreachablePool:
+        def connection(self):
+            raise OSError("connection refused")
+
+    replica.pool = UnreachablePool()  # type: ignore
+    try:
+        for _ in range(ctx.db.replica_max_failures):
+            assert await ctx.db.fetch_val("SELECT 1", primary=False) == 1
+
+        # ejected after enough consecutive failures
+        assert ctx.db._pick_replica() is None
+        assert replica.outstanding == 0
+    finally:
+        replica.pool = original_pool
+        replica.record_success()
+
+    assert ctx.db._pick_replica() is not None
+
+
+def _replica_dsn(host: str) -> str:
+    return dsn(driver="mysql", user="user", password="pass",
+               host=host, port=3306, database="clans")
+
+
+async def test_should_balance_reads_to_least_outstanding_replica():
+    # never connected; picking a replica doesn't need its pool
+    db = ServiceDatabase(read_dsns=[_replica_dsn("replica-1"),
+                                    _replica_dsn("replica-2")],
+                         write_dsn=_replica_dsn("primary"),
+                         min_pool_size=1, max_pool_size=1, ssl=False)
+    busy, idle = db.replicas
+    busy.outstanding = 2
+    idle.outstanding = 1
+
+    for _ in range(10):
+        assert db._pick_replica() is idle
+
+    # ties are broken at random
+    idle.outstanding = 2
+    assert {db._pick_replica() for _ in range(100)} == {busy, idle}
+
+    # ejected replicas aren't picked, however idle
+    idle.outstanding = 0
+    for _ in range(db.replica_max_failures):
+        idle.record_failure(db.replica_max_failures, db.replica_eject_seconds)
+    assert db._pick_replica() is busy
+
+
+async def test_should_not_eject_replica_on_read_timeout(ctx: Context):
+    replica = ctx.db.replicas[0]
+    read_timeout = ctx.db.read_timeout
+    ctx.db.read_timeout = 0.1
+    try:
+        for _ in range(ctx.db.replica_max_failures):
+            with pytest.raises(asyncio.TimeoutError):
+                await ctx.db.fetch_val("SELECT SLEEP(1)")
+    finally:
+        ctx.db.read_timeout = read_timeout
+
+    # a slow query isn't an outage, nor retried on the primary
+    assert replica.failures == 0
+    assert ctx.db._pick_replica() is replica
+
+    # & the interrupted queries' connections weren't reused mid-result
+    for _ in range(ctx.db.replica_max_failures):
+        assert await ctx.db.fetch_val("SELECT 2") == 2
+
+
+async def test_should_time_pool_checkouts(ctx: Context):
+    labels = {"pool": "write", "host": ctx.db.write_host}
+
+    def checkouts() -> float:
+        return REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count",
+                                         labels) or 0
+
+    before = checkouts()
+    await ctx.db.fetch_val("SELECT 1", primary=True)
+    assert checkouts() == before + 1
+
+
+async def test_should_stream_beside_other_queries(ctx: Context):
+    query = """\
+        WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < 1000)
+        SELECT n FROM seq
+    """
+    streamed = []
+    async for row in ctx.db.iterate(query, primary=True):
+        streamed.append(row["n"])
+        # the stream holds its own connection, so queries made while it's
+        # open neither wait for it nor interleave with its rows
+        if row["n"] % 100 == 0:
+            assert await ctx.db.fetch_val("SELECT :n", {"n": row["n"]},
+                                          primary=True) == row["n"]
+    assert streamed == list(range(1, 1001))
+
+
+async def test_should_stream_in_transaction(ctx: Context):
+    params = {"name": "Streamed Clan", "tag": "STR", "owner": 5002}
+
+    with pytest.raises(RuntimeError):
+        async with ctx.db.transaction():
+            await ctx.db.execute(INSERT_CLAN, params)
+
+            # streamed off the transaction's connection, so it sees its writes
+            rows = [row async for row in ctx.db.iterate(SELECT_CLAN, {"name": params["name"]})]
+            assert len(rows) == 1
+            raise RuntimeError("roll back")
+
+
+def test_should_stream_from_native_pools():
+    # `databases` buffers whole results; streams get native pools instead
+    db = ServiceDatabase(read_dsns=[_replica_dsn("replica-1")],
+                         write_dsn=_replica_dsn("primary"),
+                         min_pool_size=1, max_pool_size=1, ssl=False)
+    assert isinstance(db.write_stream_pool, mysql.Pool)
+    assert isinstance(db.replicas[0].stream_pool, mysql.Pool)
+
+    native = ServiceDatabase(read_dsns=[],
+                             write_dsn=dsn(driver=mysql.DRIVER, user="user",
+                                           password="pass", host="primary",
+                                           port=3306, database="clans"),
+                             min_pool_size=1, max_pool_size=1, ssl=False)
+    assert native.write_stream_pool is native.write_pool
@@ -0,0 +1,83 @@
+from typing import AsyncIterator
+
+import pytest
+from app.common import settings
+from app.services import mysql
+from app.services.database import dsn
+
+# https://docs.pytest.org/en/7.1.x/reference/reference.html#globalvar-pytestmark
+pytestmark = pytest.mark.asyncio
+
+INSERT_CLAN = """\
+    INSERT INTO clans (name, tag, description, owner, join_method, status)
+         VALUES (:name, :tag, NULL, :owner, 'closed', 'active')
+"""
+
+SELECT_CLAN = """\
+    SELECT clan_id, name, tag FROM clans WHERE name = :name
+"""
+
+
+@pytest.fixture
+async def pool() -> AsyncIterator[mysql.Pool]:
+    pool = mysql.Pool(
+        dsn(
+            driver=mysql.DRIVER,
+            user=settings.WRITE_DB_USER,
+            password=settings.WRITE_DB_PASS,
+            host=settings.WRITE_DB_HOST,
+            port=settings.WRITE_DB_PORT,
+            database=settings.WRITE_DB_NAME,
+        ),
+        min_size=1,
+        max_size=2,
+        ssl=settings.DB_USE_SSL,
+    )
+    await pool.connect()
+    yield pool
+    await pool.disconnect()
+
+
+def test_should_compile_bind_params():
+    compiled = mysql.compile_query(
+        "SELECT * FROM clans WHERE tag LIKE CONCAT(:tag, '%') "
+        "AND created_at > '2022-01-01 00\\:00' AND (owner = :owner OR :owner = 0)")
+
+    assert compiled.sql == (
+        "SELECT * FROM clans WHERE tag LIKE CONCAT(%(tag)s, '%%') "
+        "AND created_at > '2022-01-01 00:00' AND (owner = %(owner)s OR %(owner)s = 0)")
+    assert compiled.params == ("tag", "owner")
+
+
+def test_should_require_every_bind_param():
+    with pytest.raises(ValueError):
+        mysql._bind("SELECT * FROM clans WHERE tag = :tag", {"name": "x"})
+
+
+async def test_should_fetch_rows_as_dicts(pool: mysql.Pool):
+    params = {"name": "Native Clan", "tag": "NTV", "owner": 5003}
+
+    async with pool.connection() as connection:
+        await connection.execute(INSERT_CLAN, params)
+        clan = await connection.fetch_one(SELECT_CLAN, {"name": params["name"]})
+
+    assert clan is not None
+    assert clan["name"] == params["name"]
+    assert clan["tag"] == params["tag"]
+
+
+async def test_should_rollback_to_savepoint(pool: mysql.Pool):
+    outer = {"name": "Native Outer Clan", "tag": "NTO", "owner": 5004}
+    inner = {"name": "Native Inner Clan", "tag": "NTI", "owner": 5005}
+
+    async with pool.connection() as connection:
+        async with connection.transaction():
+            await connection.execute(INSERT_CLAN, outer)
+
+            with pytest.raises(RuntimeError):
+                async with connection.transaction():
+                    await connection.execute(INSERT_CLAN, inner)
+                    raise RuntimeError
+
+        assert await connection.fetch_val(SELECT_CLAN, {"name": outer["name"]})
+        assert not await connection.fetch_val(SELECT_CLAN, {"name": inner["name"]})
@@ -0,0 +1,58 @@
+from app.services import query_stats
+from app.services.query_stats import fingerprint
+from app.services.query_stats import QueryStatsRecorder
+
+
+def test_should_fingerprint_alike_queries_together():
+    a = fingerprint("""\
+        SELECT clan_id FROM clans
+         WHERE clan_id IN (:clan_id_0, :clan_id_1)
+           AND status = 'active'
+    """)
+    b = fingerprint("SELECT clan_id FROM clans WHERE clan_id IN (:clan_id_0) "
+                    "AND status = 'deleted'")
+    assert a == b == ("SELECT clan_id FROM clans WHERE clan_id IN (...) "
+                      "AND status = ?")
+
+
+def test_should_fingerprint_multi_row_inserts_together():
+    a = fingerprint("""\
+        INSERT INTO clan_members (clan_id, user_id)
+             VALUES (:clan_id_0, :user_id_0),
+                    (:clan_id_1, :user_id_1)
+    """)
+    b = fingerprint("INSERT INTO clan_members (clan_id, user_id) "
+                    "VALUES (:clan_id_0, :user_id_0)")
+    assert a == b == ("INSERT INTO clan_members (clan_id, user_id) "
+                      "VALUES (?, ?), ...")
+
+
+def test_should_aggregate_by_fingerprint():
+    stats = QueryStatsRecorder(slow_query_threshold=1)
+    stats.record("SELECT 1 FROM clans WHERE clan_id = :clan_id", {"clan_id": 1}, 0.5)
+    stats.record("SELECT 1 FROM clans WHERE clan_id = :clan_id", {"clan_id": 2}, 2)
+    stats.record("SELECT 1 FROM clan_members", None, 0.1)
+
+    aggregates = stats.snapshot()
+    assert [aggregate.calls for aggregate in aggregates] == [2, 1]
+    assert aggregates[0].total_time == 2.5
+    assert aggregates[0].max_time == 2
+    assert aggregates[0].slow_calls == 1
+
+    stats.reset()
+    assert stats.snapshot() == []
+
+
+def test_should_log_slow_queries_past_the_fingerprint_cap(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(query_stats.logger, "warning", warnings.append)
+    monkeypatch.setattr(QueryStatsRecorder, "MAX_FINGERPRINTS", 1)
+    stats = QueryStatsRecorder(slow_query_threshold=1)
+    stats.record("SELECT 1 FROM clans", None, 0.1)
+    stats.record("SELECT 1 FROM clan_members", None, 2)
+
+    # the second fingerprint isn't aggregated, but is still logged
+    assert [aggregate.fingerprint for aggregate in stats.snapshot()] == \
+        ["SELECT ? FROM clans"]
+    assert len(warnings) == 1
+    assert "SELECT ? FROM clan_members" in warnings[0]
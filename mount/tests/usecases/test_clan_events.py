@@ -0,0 +1,78 @@
+from typing import Sequence
+
+import orjson
+import pytest
+from app.common.context import Context
+from app.common.errors import ServiceError
+from app.models.clans import JoinMethod
+from app.services.broker import InMemoryBroker
+from app.services.broker import Message
+from app.usecases import clan_events
+from app.usecases import clans
+
+# https://docs.pytest.org/en/7.1.x/reference/reference.html#globalvar-pytestmark
+pytestmark = pytest.mark.asyncio
+
+
+async def _drain(ctx: Context) -> list[dict]:
+    broker = InMemoryBroker()
+    while await clan_events.publish_pending(ctx, broker, limit=100,
+                                                timeout=5):
+        pass
+    return [orjson.loads(message.body) | {"routing_key": message.routing_key}
+            for message in broker.messages]
+
+
+async def test_should_publish_clan_lifecycle_events(ctx: Context):
+    data = await clans.create(ctx, "Evented Clan", "EVC", "The", 6000,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = await clans.partial_update(ctx, clan_id, description="Renamed")
+    assert not isinstance(data, ServiceError)
+
+    data = await clans.disband(ctx, clan_id)
+    assert not isinstance(data, ServiceError)
+
+    events = [event for event in await _drain(ctx)
+              if event["clan"]["clan_id"] == clan_id]
+    assert [event["routing_key"] for event in events] == [
+        "clans.created", "clans.updated", "clans.disbanded",
+    ]
+    assert events[1]["clan"]["description"] == "Renamed"
+
+    # published events leave the outbox
+    assert await _drain(ctx) == []
+
+
+async def test_should_not_publish_failed_changes(ctx: Context):
+    data = await clans.create(ctx, "Unevented Clan", "UEC", "The", 6001,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    await _drain(ctx)
+
+    data = await clans.create(ctx, "Unevented Clan", "UEC2", "The", 6002,
+                              JoinMethod.OPEN)
+    assert data == ServiceError.CLANS_NAME_EXISTS
+
+    assert await _drain(ctx) == []
+
+
+async def test_should_retry_events_which_failed_to_publish(ctx: Context):
+    class FailingBroker(InMemoryBroker):
+        async def publish_many(self, messages: Sequence[Message]) -> None:
+            raise ConnectionError
+
+    await _drain(ctx)
+    data = await clans.create(ctx, "Retried Clan", "RTC", "The", 6003,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+
+    with pytest.raises(ConnectionError):
+        await clan_events.publish_pending(ctx, FailingBroker(), limit=100,
+                                          timeout=5)
+
+    # released at once, rather than left claimed until the claim lapses
+    events = await _drain(ctx)
+    assert [event["clan"]["clan_id"] for event in events] == [data["clan_id"]]
@@ -0,0 +1,169 @@
+import pytest
+from app.common.context import Context
+from app.common.errors import ServiceError
+from app.models.clans import JoinMethod
+from app.usecases import clan_members
+from app.usecases import clans
+
+# https://docs.pytest.org/en/7.1.x/reference/reference.html#globalvar-pytestmark
+pytestmark = pytest.mark.asyncio
+
+
+async def test_should_add_owner_as_member(ctx: Context):
+    owner = 3000
+    data = await clans.create(ctx, "Members Clan", "MBC", "The", owner,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = await clan_members.fetch_all(ctx, clan_id)
+    assert not isinstance(data, ServiceError)
+    assert [member["user_id"] for member in data] == [owner]
+
+
+async def test_should_join(ctx: Context):
+    data = await clans.create(ctx, "Joinable Clan", "JNC", "The", 3001,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    user_id = 3002
+    data = await clan_members.join(ctx, clan_id, user_id)
+    assert not isinstance(data, ServiceError)
+    assert data["clan_id"] == clan_id
+    assert data["user_id"] == user_id
+    assert data["joined_at"] is not None
+
+    data = await clan_members.fetch_user_clan(ctx, user_id)
+    assert not isinstance(data, ServiceError)
+    assert data["clan_id"] == clan_id
+
+
+async def test_should_fail_join_closed_clan(ctx: Context):
+    data = await clans.create(ctx, "Closed Clan", "CLC", "The", 3003,
+                              JoinMethod.CLOSED)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = await clan_members.join(ctx, clan_id, 3004)
+    assert isinstance(data, ServiceError)
+    assert data == ServiceError.CLAN_MEMBERS_CLAN_CLOSED
+
+
+async def test_should_fail_join_already_in_clan(ctx: Context):
+    data = await clans.create(ctx, "First Open Clan", "FOC", "The", 3005,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    first_clan_id = data["clan_id"]
+
+    data = await clans.create(ctx, "Second Open Clan", "SOC", "The", 3006,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    second_clan_id = data["clan_id"]
+
+    data = await clan_members.join(ctx, first_clan_id, 3007)
+    assert not isinstance(data, ServiceError)
+
+    data = await clan_members.join(ctx, second_clan_id, 3007)
+    assert isinstance(data, ServiceError)
+    assert data == ServiceError.CLANS_ALREADY_IN_CLAN
+
+    # members can't create clans of their own either
+    data = await clans.create(ctx, "Third Open Clan", "TOC", "The", 3007,
+                              JoinMethod.OPEN)
+    assert isinstance(data, ServiceError)
+    assert data == ServiceError.CLANS_ALREADY_IN_CLAN
+
+
+async def test_should_leave(ctx: Context):
+    data = await clans.create(ctx, "Leavable Clan", "LVC", "The", 3008,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = await clan_members.join(ctx, clan_id, 3009)
+    assert not isinstance(data, ServiceError)
+
+    data = await clan_members.leave(ctx, clan_id, 3009)
+    assert not isinstance(data, ServiceError)
+    assert data["user_id"] == 3009
+
+    data = await clan_members.fetch_user_clan(ctx, 3009)
+    assert isinstance(data, ServiceError)
+    assert data == ServiceError.CLAN_MEMBERS_NOT_FOUND
+
+
+async def test_should_fail_owner_leave(ctx: Context):
+    data = await clans.create(ctx, "Owned Clan", "ONC", "The", 3010,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = await clan_members.leave(ctx, clan_id, 3010)
+    assert isinstance(data, ServiceError)
+    assert data == ServiceError.CLAN_MEMBERS_OWNER_CANNOT_LEAVE
+
+
+async def test_should_kick(ctx: Context):
+    owner = 3011
+    data = await clans.create(ctx, "Kicking Clan", "KKC", "The", owner,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = await clan_members.join(ctx, clan_id, 3012)
+    assert not isinstance(data, ServiceError)
+
+    data = await clan_members.kick(ctx, clan_id, 3012, kicked_by=3012)
+    assert isinstance(data, ServiceError)
+    assert data == ServiceError.CLAN_MEMBERS_NOT_OWNER
+
+    data = await clan_members.kick(ctx, clan_id, 3012, kicked_by=owner)
+    assert not isinstance(data, ServiceError)
+    assert data["user_id"] == 3012
+
+
+async def test_should_fetch_all_paginated(ctx: Context):
+    owner = 3020
+    data = await clans.create(ctx, "Paginated Members Clan", "PMC", "The",
+                              owner, JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    for user_id in (3021, 3022):
+        data = await clan_members.join(ctx, clan_id, user_id)
+        assert not isinstance(data, ServiceError)
+
+    data = await clan_members.fetch_all(ctx, clan_id, after=owner, limit=1)
+    assert not isinstance(data, ServiceError)
+    assert [member["user_id"] for member in data] == [3021]
+
+
+async def test_should_fetch_many(ctx: Context):
+    owner = 3030
+    data = await clans.create(ctx, "Batch Members Clan", "BMC", "The",
+                              owner, JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = await clan_members.fetch_many(ctx, [3031, owner])
+    assert data[0] is None
+    assert data[1] is not None
+    assert data[1]["clan_id"] == clan_id
+
+
+async def test_should_free_members_on_disband(ctx: Context):
+    data = await clans.create(ctx, "Disbanded Members Clan", "DMC", "The",
+                              3040, JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = await clan_members.join(ctx, clan_id, 3041)
+    assert not isinstance(data, ServiceError)
+
+    data = await clans.disband(ctx, clan_id)
+    assert not isinstance(data, ServiceError)
+
+    data = await clan_members.fetch_user_clan(ctx, 3041)
+    assert isinstance(data, ServiceError)
+    assert data == ServiceError.CLAN_MEMBERS_NOT_FOUND
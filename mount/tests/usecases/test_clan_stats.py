@@ -0,0 +1,116 @@
+import orjson
+import pytest
+from app.common.context import Context
+from app.common.errors import ServiceError
+from app.models.clan_stats import ClanStats
+from app.models.clan_stats import LeaderboardSort
+from app.models.clans import JoinMethod
+from app.usecases import clan_members
+from app.usecases import clan_stats
+from app.usecases import clans
+
+# https://docs.pytest.org/en/7.1.x/reference/reference.html#globalvar-pytestmark
+pytestmark = pytest.mark.asyncio
+
+
+async def test_should_initialize_stats(ctx: Context):
+    data = await clans.create(ctx, "Stats Clan", "STC", "The", 4000,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = await clan_stats.fetch_one(ctx, clan_id)
+    assert not isinstance(data, ServiceError)
+    assert data["member_count"] == 1
+    assert data["total_pp"] == 0
+    assert data["ranked_score"] == 0
+
+    assert (orjson.dumps(ClanStats.project(data)) ==
+            orjson.dumps(ClanStats.from_mapping(data).dict()))
+
+
+async def test_should_aggregate_member_stats(ctx: Context):
+    owner = 4001
+    data = await clans.create(ctx, "Aggregate Clan", "AGC", "The", owner,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = await clan_members.join(ctx, clan_id, 4002)
+    assert not isinstance(data, ServiceError)
+
+    data = await clan_stats.update_member_stats(ctx, owner, 1000, 5000)
+    assert not isinstance(data, ServiceError)
+
+    data = await clan_stats.update_member_stats(ctx, 4002, 500, 2000)
+    assert not isinstance(data, ServiceError)
+
+    # updates replace a member's stats, they don't add to them
+    data = await clan_stats.update_member_stats(ctx, 4002, 600, 2500)
+    assert not isinstance(data, ServiceError)
+    assert data["member_count"] == 2
+    assert data["total_pp"] == 1600
+    assert data["avg_pp"] == 800
+    assert data["ranked_score"] == 7500
+
+    data = await clan_members.leave(ctx, clan_id, 4002)
+    assert not isinstance(data, ServiceError)
+
+    data = await clan_stats.fetch_one(ctx, clan_id)
+    assert not isinstance(data, ServiceError)
+    assert data["member_count"] == 1
+    assert data["total_pp"] == 1000
+    assert data["ranked_score"] == 5000
+
+
+async def test_should_fail_update_member_stats_no_member(ctx: Context):
+    data = await clan_stats.update_member_stats(ctx, 4010, 100, 100)
+    assert isinstance(data, ServiceError)
+    assert data == ServiceError.CLAN_MEMBERS_NOT_FOUND
+
+
+async def test_should_rank_leaderboard(ctx: Context):
+    owner = 4020
+    data = await clans.create(ctx, "Leaderboard Clan", "LBC", "The", owner,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    # far more pp than any other clan in the tests
+    data = await clan_stats.update_member_stats(ctx, owner, 10_000_000, 1)
+    assert not isinstance(data, ServiceError)
+
+    data = await clan_stats.fetch_leaderboard(ctx, LeaderboardSort.TOTAL_PP,
+                                              offset=0, limit=1)
+    assert len(data) == 1
+    assert data[0]["rank"] == 1
+    assert data[0]["clan_id"] == clan_id
+    assert data[0]["name"] == "Leaderboard Clan"
+    assert data[0]["total_pp"] == 10_000_000
+
+
+async def test_should_remove_disbanded_from_leaderboard(ctx: Context):
+    owner = 4030
+    data = await clans.create(ctx, "Removed Clan", "RMC", "The", owner,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = await clan_stats.update_member_stats(ctx, owner, 20_000_000, 1)
+    assert not isinstance(data, ServiceError)
+
+    data = await clans.disband(ctx, clan_id)
+    assert not isinstance(data, ServiceError)
+
+    data = await clan_stats.fetch_leaderboard(ctx, LeaderboardSort.TOTAL_PP,
+                                              offset=0, limit=1)
+    assert all(entry["clan_id"] != clan_id for entry in data)
+
+
+async def test_should_rebuild_leaderboards(ctx: Context):
+    data = await clans.create(ctx, "Rebuilt Clan", "RBC", "The", 4040,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+
+    count = await clan_stats.rebuild_leaderboards(ctx)
+    assert count >= 1
@@ -1,7 +1,18 @@
+from datetime import timedelta
+from datetime import timezone
+
+import orjson
 import pytest
+from app.common import settings
 from app.common.context import Context
 from app.common.errors import ServiceError
+from app.models import Status
+from app.models.clan_stats import LeaderboardSort
+from app.models.clans import Clan
 from app.models.clans import JoinMethod
+from app.repositories import clans_cache
+from app.usecases import clan_members
+from app.usecases import clan_stats
 from app.usecases import clans
 
 # https://docs.pytest.org/en/7.1.x/reference/reference.html#globalvar-pytestmark
@@ -148,17 +159,261 @@ async def test_should_fetch_one(ctx: Context):
     assert data["updated_at"] is not None
 
 
+async def test_should_fetch_one_after_update(ctx: Context):
+    data = await clans.create(ctx, "Cached Clan", "CCC", "The", 2020,
+                              JoinMethod.CLOSED)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    # warm the cache
+    data = await clans.fetch_one(ctx, clan_id)
+    assert not isinstance(data, ServiceError)
+    assert data["name"] == "Cached Clan"
+
+    data = await clans.partial_update(ctx, clan_id, name="Cached Clan 2")
+    assert not isinstance(data, ServiceError)
+
+    data = await clans.fetch_one(ctx, clan_id)
+    assert not isinstance(data, ServiceError)
+    assert data["name"] == "Cached Clan 2"
+
+
+async def test_should_project_like_validated_model(ctx: Context):
+    data = await clans.create(ctx, "Projected Clan", "PJC", None, 2024,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    # skip the read-your-writes window, during which reads bypass the cache
+    await ctx.redis.delete(f"clans:id:{clan_id}", f"clans:version:{clan_id}")
+
+    # straight from the database, which fills the cache
+    rows = [data]
+    data = await clans.fetch_one(ctx, clan_id)
+    assert not isinstance(data, ServiceError)
+    assert await ctx.redis.get(f"clans:id:{clan_id}") is not None
+    rows.append(data)
+
+    # then from the cache, deserialized from redis
+    clans_cache.clear_local_cache()
+    data = await clans.fetch_one(ctx, clan_id)
+    assert not isinstance(data, ServiceError)
+    assert data is clans_cache.local_cache.get(f"clans:id:{clan_id}")
+    rows.append(data)
+
+    for row in rows:
+        assert (orjson.dumps(Clan.project(row)) ==
+                orjson.dumps(Clan.from_mapping(row).dict()))
+
+
+async def test_should_fetch_version_once_cached(ctx: Context):
+    data = await clans.create(ctx, "Versioned Clan", "VSC", "The", 2025,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    # skip the read-your-writes window, during which reads bypass the cache
+    await ctx.redis.delete(f"clans:id:{clan_id}", f"clans:version:{clan_id}")
+    assert await clans.fetch_version(ctx, clan_id) is None
+
+    data = await clans.fetch_one(ctx, clan_id)
+    assert not isinstance(data, ServiceError)
+    version = await clans.fetch_version(ctx, clan_id)
+    assert version == clans.version_of(data)
+
+    data = await clans.partial_update(ctx, clan_id, description="Changed")
+    assert not isinstance(data, ServiceError)
+    assert clans.version_of(data).etag != version.etag
+
+
+async def test_should_change_list_version_on_write(ctx: Context):
+    await clans.fetch_list_version(ctx)
+    before = await clans.fetch_list_version(ctx)
+    assert before is not None
+    assert before == await clans.fetch_list_version(ctx)
+    assert before != await clans.fetch_list_version(ctx, limit=10)
+
+    data = await clans.create(ctx, "List Versioned Clan", "LVC", "The", 2026,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+
+    await ctx.redis.delete("clans:list:written")
+    after = await clans.fetch_list_version(ctx)
+    assert after is not None
+    assert after.etag != before.etag
+
+
+async def test_should_search(ctx: Context):
+    clan_ids = {}
+    for name, tag, owner in (("Searchable Foxes", "SRF", 2027),
+                             ("Foxes Searched", "FXS", 2028),
+                             ("Unrelated", "SRCH", 2029)):
+        data = await clans.create(ctx, name, tag, "The", owner, JoinMethod.OPEN)
+        assert not isinstance(data, ServiceError)
+        clan_ids[tag] = data["clan_id"]
+
+    # the exact tag first, then the name prefix, then the substring
+    data = await clans.search(ctx, "srch", offset=0, limit=10)
+    assert [clan["clan_id"] for clan in data][:1] == [clan_ids["SRCH"]]
+
+    data = await clans.search(ctx, "searchable", offset=0, limit=10)
+    assert [clan["clan_id"] for clan in data] == [clan_ids["SRF"]]
+
+    data = await clans.search(ctx, "earch", offset=0, limit=10)
+    found = [clan["clan_id"] for clan in data]
+    assert clan_ids["SRF"] in found and clan_ids["FXS"] in found
+
+    data = await clans.search(ctx, "earch", offset=0, limit=1)
+    assert len(data) == 1
+
+    # shorter than any word in the fulltext index
+    data = await clans.search(ctx, "xs", offset=0, limit=10)
+    assert clan_ids["FXS"] in [clan["clan_id"] for clan in data]
+
+
+async def test_should_fail_create_normalized_duplicate(ctx: Context):
+    data = await clans.create(ctx, "Spaced  Out Clan", "NRM", "The", 2034,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+
+    data = await clans.create(ctx, "Other Clan", "nrm", "The", 2035,
+                              JoinMethod.OPEN)
+    assert data == ServiceError.CLANS_TAG_EXISTS
+
+    data = await clans.create(ctx, "spaced out  clan", "NRM2", "The", 2035,
+                              JoinMethod.OPEN)
+    assert data == ServiceError.CLANS_NAME_EXISTS
+
+
+async def test_should_fetch_one_from_local_cache(ctx: Context):
+    data = await clans.create(ctx, "Local Clan", "LCC", "The", 2023,
+                              JoinMethod.CLOSED)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    # skip the read-your-writes window, during which reads bypass the cache
+    await ctx.redis.delete(f"clans:id:{clan_id}")
+
+    # the first read fills redis, the second fills the local cache
+    for _ in range(2):
+        data = await clans.fetch_one(ctx, clan_id)
+        assert not isinstance(data, ServiceError)
+
+    hits = clans_cache.local_cache.hits
+    data = await clans.fetch_one(ctx, clan_id)
+    assert not isinstance(data, ServiceError)
+    assert clans_cache.local_cache.hits == hits + 1
+
+    # as published by another process's write
+    clans_cache.on_invalidation(f"clans:{clan_id}")
+    assert clans_cache.local_cache.get(f"clans:id:{clan_id}") is None
+
+
+async def test_should_create_after_cached_miss(ctx: Context):
+    # caches a "not found" for the tag, which creating must clear
+    data = await clans.create(ctx, "Negative Clan", "NGC", "The", 2021,
+                              JoinMethod.CLOSED)
+    assert not isinstance(data, ServiceError)
+
+    data = await clans.create(ctx, "Negative Clan 2", "NGC", "The", 2022,
+                              JoinMethod.CLOSED)
+    assert isinstance(data, ServiceError)
+    assert data == ServiceError.CLANS_TAG_EXISTS
+
+
+async def test_should_fetch_one_uncached_in_transaction(ctx: Context):
+    data = await clans.create(ctx, "Rolled Back", "RBK", "The", 8050,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    with pytest.raises(RuntimeError):
+        async with ctx.db.transaction():
+            data = await clans.partial_update(ctx, clan_id, description="Uncommitted")
+            assert not isinstance(data, ServiceError)
+
+            # the transaction sees its own write, not the cached clan
+            data = await clans.fetch_one(ctx, clan_id)
+            assert not isinstance(data, ServiceError)
+            assert data["description"] == "Uncommitted"
+            raise RuntimeError("roll back")
+
+    # nor was the uncommitted clan cached
+    clans_cache.clear_local_cache()
+    data = await clans.fetch_one(ctx, clan_id)
+    assert not isinstance(data, ServiceError)
+    assert data["description"] == "The"
+
+
 async def test_should_fail_fetch_one_no_clan(ctx: Context):
     data = await clans.fetch_one(ctx, 0)
     assert isinstance(data, ServiceError)
     assert data == ServiceError.CLANS_NOT_FOUND
 
 
+async def test_should_fetch_many(ctx: Context):
+    clan_ids = []
+    for i in range(2):
+        data = await clans.create(ctx, f"Batch Clan {i}", f"BTC{i}", "The",
+                                  2040 + i, JoinMethod.OPEN)
+        assert not isinstance(data, ServiceError)
+        clan_ids.append(data["clan_id"])
+
+    # warm the cache for one of them
+    data = await clans.fetch_one(ctx, clan_ids[1])
+    assert not isinstance(data, ServiceError)
+
+    data = await clans.fetch_many(ctx, [clan_ids[1], 0, clan_ids[0], clan_ids[1]])
+    assert [clan["clan_id"] if clan else None for clan in data] == [
+        clan_ids[1], None, clan_ids[0], clan_ids[1],
+    ]
+
+
 async def test_should_fetch_all(ctx: Context):
     data = await clans.fetch_all(ctx)
     assert not isinstance(data, ServiceError)
 
 
+async def test_should_fetch_all_paginated(ctx: Context):
+    clan_ids = []
+    for i in range(3):
+        data = await clans.create(ctx, f"Paginated Clan {i}", f"PGC{i}",
+                                  "The", 2000 + i, JoinMethod.OPEN)
+        assert not isinstance(data, ServiceError)
+        clan_ids.append(data["clan_id"])
+
+    data = await clans.fetch_all(ctx, after=clan_ids[0], limit=1)
+    assert [clan["clan_id"] for clan in data] == [clan_ids[1]]
+
+    data = await clans.fetch_all(ctx, after=clan_ids[0])
+    assert [clan["clan_id"] for clan in data][:2] == clan_ids[1:]
+
+
+async def test_should_fetch_all_filtered(ctx: Context):
+    owner = 2010
+    data = await clans.create(ctx, "Filtered Clan", "FLC", "The", owner,
+                              JoinMethod.BY_REQUEST)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = await clans.fetch_all(ctx, owner=owner)
+    assert [clan["clan_id"] for clan in data] == [clan_id]
+
+    data = await clans.fetch_all(ctx, owner=owner, join_method=JoinMethod.OPEN)
+    assert data == []
+
+
+async def test_should_iterate_all(ctx: Context):
+    owner = 2011
+    data = await clans.create(ctx, "Iterated Clan", "ITC", "The", owner,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = [clan async for clan in clans.iterate_all(ctx, owner=owner)]
+    assert [clan["clan_id"] for clan in data] == [clan_id]
+
+
 async def test_should_partial_update(ctx: Context):
     name = "Hkatsuki Quality Control"
     tag = "HQC"
@@ -338,6 +593,37 @@ async def test_should_fail_partial_update_tag_exists(ctx: Context):
     assert data == ServiceError.CLANS_TAG_EXISTS
 
 
+async def test_should_fail_partial_update_owner_in_clan(ctx: Context):
+    data = await clans.create(ctx, "Owner Clan", "OWC", "The", 2030,
+                              JoinMethod.CLOSED)
+    assert not isinstance(data, ServiceError)
+
+    data = await clans.create(ctx, "Owner Clan 2", "OWC2", "The", 2031,
+                              JoinMethod.CLOSED)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    data = await clans.partial_update(ctx, clan_id, owner=2030)
+    assert isinstance(data, ServiceError)
+    assert data == ServiceError.CLANS_ALREADY_IN_CLAN
+
+
+async def test_should_create_with_disbanded_clans_name(ctx: Context):
+    name = "Reused Clan"
+    tag = "RUC"
+
+    data = await clans.create(ctx, name, tag, "The", 2032, JoinMethod.CLOSED)
+    assert not isinstance(data, ServiceError)
+
+    data = await clans.disband(ctx, data["clan_id"])
+    assert not isinstance(data, ServiceError)
+
+    data = await clans.create(ctx, name, tag, "The", 2033, JoinMethod.CLOSED)
+    assert not isinstance(data, ServiceError)
+    assert data["name"] == name
+    assert data["tag"] == tag
+
+
 async def test_should_disband(ctx: Context):
     name = "Akatsuki Quafghjlity Co"
     tag = "AffQC"
@@ -362,3 +648,179 @@ async def test_should_fail_disband_no_clan(ctx: Context):
     data = await clans.disband(ctx, 0)
     assert isinstance(data, ServiceError)
     assert data == ServiceError.CLANS_NOT_FOUND
+
+
+async def test_should_bulk_create(ctx: Context):
+    rows = [
+        {"name": "Bulk Clan One", "tag": "BLK1", "description": None,
+         "owner": 8000, "join_method": JoinMethod.OPEN},
+        {"name": "Bulk Clan Two", "tag": "BLK2", "description": "The",
+         "owner": 8001, "join_method": JoinMethod.CLOSED},
+        # conflicts with an earlier row of the same batch
+        {"name": "Bulk Clan Three", "tag": "blk1", "description": None,
+         "owner": 8002, "join_method": JoinMethod.OPEN},
+        {"name": "Bulk Clan Four", "tag": "BLK4", "description": None,
+         "owner": 8000, "join_method": JoinMethod.OPEN},
+    ]
+
+    data = await clans.bulk_create(ctx, rows)
+    assert data[2] == ServiceError.CLANS_TAG_EXISTS
+    assert data[3] == ServiceError.CLANS_ALREADY_IN_CLAN
+
+    for row, clan in zip(rows[:2], data[:2]):
+        assert not isinstance(clan, ServiceError)
+        assert clan["name"] == row["name"]
+        assert clan["tag"] == row["tag"]
+        assert clan["owner"] == row["owner"]
+
+        # created as create() would; with its owner as a member
+        fetched = await clans.fetch_one(ctx, clan["clan_id"])
+        assert not isinstance(fetched, ServiceError)
+        user_clan = await clan_members.fetch_user_clan(ctx, row["owner"])
+        assert not isinstance(user_clan, ServiceError)
+        assert user_clan["clan_id"] == fetched["clan_id"]
+
+    # conflicts with clans which already exist
+    data = await clans.bulk_create(ctx, [rows[1] | {"tag": "BLK5",
+                                                    "owner": 8003}])
+    assert data == [ServiceError.CLANS_NAME_EXISTS]
+
+
+async def test_should_bulk_disband(ctx: Context):
+    created = []
+    for idx in range(3):
+        data = await clans.create(ctx, f"Bulk Disband {idx}", f"BDS{idx}",
+                                  None, 8010 + idx, JoinMethod.OPEN)
+        assert not isinstance(data, ServiceError)
+        created.append(data["clan_id"])
+
+    data = await clans.bulk_disband(ctx, [created[0], 0, created[1]])
+    assert data[1] == ServiceError.CLANS_NOT_FOUND
+    assert [clan["clan_id"] for clan in (data[0], data[2])] == created[:2]
+
+    for clan_id in created[:2]:
+        assert await clans.fetch_one(ctx, clan_id) == ServiceError.CLANS_NOT_FOUND
+    assert not isinstance(await clans.fetch_one(ctx, created[2]), ServiceError)
+
+    # members are gone, so the owners can create new clans
+    data = await clans.create(ctx, "Bulk Disband Again", "BDSA", None, 8010,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+
+
+async def test_should_bulk_deactivate(ctx: Context):
+    data = await clans.create(ctx, "Bulk Deactivate", "BDA", None, 8020,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+
+    # top of the leaderboard
+    data = await clan_stats.update_member_stats(ctx, 8020, 30_000_000, 1)
+    assert not isinstance(data, ServiceError)
+
+    data = await clans.bulk_disband(ctx, [clan_id], deactivate=True)
+    assert data[0]["status"] == Status.DEACTIVATED  # type: ignore
+
+    assert await clans.fetch_one(ctx, clan_id) == ServiceError.CLANS_NOT_FOUND
+    # its members & stats are kept
+    member = await clan_members.fetch_many(ctx, [8020])
+    assert member[0] is not None
+    assert not isinstance(await clan_stats.fetch_one(ctx, clan_id), ServiceError)
+
+    # but it's off the leaderboards, even once they're rebuilt or its
+    # members' stats change
+    await clan_stats.rebuild_leaderboards(ctx)
+    data = await clan_stats.update_member_stats(ctx, 8020, 40_000_000, 1)
+    assert not isinstance(data, ServiceError)
+
+    data = await clan_stats.fetch_leaderboard(ctx, LeaderboardSort.TOTAL_PP,
+                                              offset=0, limit=1)
+    assert len(data) == 1 and data[0]["clan_id"] != clan_id
+
+
+async def test_should_iterate_all_since(ctx: Context):
+    owner = 8030
+    data = await clans.create(ctx, "Iterated Since Clan", "ITS", None, owner,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    updated_at = data["updated_at"]
+
+    data = [clan async for clan in clans.iterate_all(ctx, owner=owner,
+                                                     since=updated_at - timedelta(seconds=1))]
+    assert [clan["owner"] for clan in data] == [owner]
+
+    data = [clan async for clan in clans.iterate_all(ctx, owner=owner,
+                                                     since=updated_at)]
+    assert data == []
+
+
+async def test_should_fetch_changes(ctx: Context, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "CLANS_CHANGES_SETTLE_TIME", 0)
+
+    created = []
+    for idx in range(3):
+        data = await clans.create(ctx, f"Changed Clan {idx}", f"CHG{idx}",
+                                  None, 8040 + idx, JoinMethod.OPEN)
+        assert not isinstance(data, ServiceError)
+        created.append(data)
+
+    data = await clans.disband(ctx, created[1]["clan_id"])
+    assert not isinstance(data, ServiceError)
+
+    # out of the settle window (updated_at has whole seconds, so rows from
+    # this second aren't < NOW() yet), & all updated at once
+    await ctx.db.execute("""\
+        UPDATE clans
+           SET updated_at = NOW() - INTERVAL 2 SECOND
+         WHERE owner IN (8040, 8041, 8042)
+    """)
+
+    # paged through 2 at a time from well before the first was created
+    since = created[0]["updated_at"] - timedelta(seconds=10)
+    after_clan_id = None
+    changes = []
+    while page := await clans.fetch_changes(ctx, since, after_clan_id, limit=2):
+        changes += page
+        since, after_clan_id = page[-1]["updated_at"], page[-1]["clan_id"]
+
+    positions = [(clan["updated_at"], clan["clan_id"]) for clan in changes]
+    assert positions == sorted(positions)
+    assert len(set(positions)) == len(positions)
+
+    ours = {clan["clan_id"]: clan for clan in changes
+            if clan["owner"] in (8040, 8041, 8042)}
+    assert ours.keys() == {clan["clan_id"] for clan in created}
+    assert ours[created[1]["clan_id"]]["status"] == Status.DELETED
+
+    # the page boundary fell among equal updated_ats; clan_id broke the tie
+    assert len({clan["updated_at"] for clan in ours.values()}) == 1
+    assert [clan_id for clan_id in ours] == sorted(ours)
+
+
+async def test_should_leave_settling_changes_for_later(ctx: Context,
+                                                       monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "CLANS_CHANGES_SETTLE_TIME", 60)
+
+    data = await clans.create(ctx, "Settling Clan", "STL", None, 8045,
+                              JoinMethod.OPEN)
+    assert not isinstance(data, ServiceError)
+    clan_id = data["clan_id"]
+    since = data["updated_at"] - timedelta(minutes=5)
+
+    # rows may still be committed with an updated_at inside the window
+    changes = await clans.fetch_changes(ctx, since, limit=1000)
+    assert clan_id not in [clan["clan_id"] for clan in changes]
+
+    await ctx.db.execute("""\
+        UPDATE clans
+           SET updated_at = NOW() - INTERVAL 61 SECOND
+         WHERE clan_id = :clan_id
+    """, {"clan_id": clan_id})
+
+    changes = await clans.fetch_changes(ctx, since, limit=1000)
+    assert clan_id in [clan["clan_id"] for clan in changes]
+
+    # an aware since is the same instant, whatever its offset
+    aware = since.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=5)))
+    changes = await clans.fetch_changes(ctx, aware, limit=1000)
+    assert clan_id in [clan["clan_id"] for clan in changes]
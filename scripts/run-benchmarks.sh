@@ -0,0 +1,31 @@
+#!/usr/bin/env bash
+set -eo pipefail
+
+# usage: run-benchmarks.sh [python -m benchmarks args..]
+# e.g.   run-benchmarks.sh run --clans 1000000 --output /srv/root/bench.json
+
+FULL_BENCH_DB_NAME="${WRITE_DB_NAME}_bench"
+
+# unlike the test database, this one is kept between runs; seeding a
+# million clans takes a while, and is skipped when they already exist
+echo "CREATE DATABASE IF NOT EXISTS ${FULL_BENCH_DB_NAME}" | mysql \
+    --user=$WRITE_DB_USER \
+    --password=$WRITE_DB_PASS \
+    --host=$WRITE_DB_HOST \
+    --port=$WRITE_DB_PORT
+
+export WRITE_DB_NAME=$FULL_BENCH_DB_NAME
+export READ_DB_NAME=$FULL_BENCH_DB_NAME
+
+echo "Running database migrations.."
+/scripts/migrate-db.sh up
+
+# slow queries are expected while seeding; don't log every chunk
+export DB_SLOW_QUERY_THRESHOLD=${DB_SLOW_QUERY_THRESHOLD:-10}
+
+export PYTHONDONTWRITEBYTECODE=1
+export PYTHONPATH=$PYTHONPATH:/srv/root
+
+cd /srv/root
+
+exec python -m benchmarks "${@:-run}"